@@ -0,0 +1,154 @@
+"""
+Configuração de logs da aplicação.
+
+- Níveis: LOG_LEVEL (padrão DEBUG em desenvolvimento, INFO em produção).
+- Formatação preguiçosa: use logger.debug("... %s", valor); o texto só é
+  montado se o registro for de fato emitido.
+- Truncamento: argumentos grandes (dicts, listas, textos) são resumidos
+  com no máximo LOG_PAYLOAD_LIMIT caracteres (0 = sem limite).
+- Amostragem por rota: LOG_SAMPLE_RATES="history=0.01,list_briefings=0.1"
+  mantém só uma fração das requisições dessas rotas nos níveis DEBUG/INFO.
+  Avisos e erros são sempre registrados.
+- Saída JSON: LOG_FORMAT=json.
+"""
+import json
+import logging
+import os
+import random
+import reprlib
+import sys
+import time
+
+from flask import g, has_request_context, request
+
+LOGGER_NAME = "autobrief"
+
+
+def get_logger(name=None):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def parse_sample_rates(value):
+    rates = {}
+    for part in (value or "").split(","):
+        if "=" not in part:
+            continue
+        route, rate = part.split("=", 1)
+        try:
+            rates[route.strip()] = max(0.0, min(float(rate), 1.0))
+        except ValueError:
+            continue
+    return rates
+
+
+class PayloadTruncator:
+    """Resume argumentos de log grandes sem serializá-los por inteiro."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._repr = reprlib.Repr()
+        self._repr.maxstring = limit
+        self._repr.maxother = limit
+        self._repr.maxdict = 20
+        self._repr.maxlist = 20
+        self._repr.maxlevel = 4
+
+    def __call__(self, value):
+        if not self.limit:
+            return value
+        if isinstance(value, str):
+            if len(value) <= self.limit:
+                return value
+            return f"{value[:self.limit]}... ({len(value)} caracteres)"
+        if isinstance(value, (int, float, bool)) or value is None:
+            return value
+        if isinstance(value, (dict, list, tuple, set)):
+            text = self._repr.repr(value)
+        else:
+            text = str(value)
+        return text if len(text) <= self.limit else f"{text[:self.limit]}..."
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adiciona a rota aos registros e aplica a amostragem por rota.
+    A decisão de amostragem é tomada uma vez por requisição.
+    """
+
+    def __init__(self, sample_rates):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record):
+        record.route = None
+        if not has_request_context():
+            return True
+        record.route = request.endpoint
+        if record.levelno >= logging.WARNING or not self.sample_rates:
+            return True
+        sampled = g.get("_log_sampled")
+        if sampled is None:
+            rate = self.sample_rates.get(request.endpoint or "", 1.0)
+            sampled = random.random() < rate
+            g._log_sampled = sampled
+        return sampled
+
+
+class TruncatingFormatter(logging.Formatter):
+    def __init__(self, truncate, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.truncate = truncate
+
+    def truncate_args(self, record):
+        if record.args:
+            if isinstance(record.args, dict):
+                record.args = {key: self.truncate(value) for key, value in record.args.items()}
+            else:
+                record.args = tuple(self.truncate(arg) for arg in record.args)
+
+    def format(self, record):
+        self.truncate_args(record)
+        return super().format(record)
+
+
+class JsonFormatter(TruncatingFormatter):
+    def format(self, record):
+        self.truncate_args(record)
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "route", None):
+            payload["route"] = record.route
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def configure_logging(debug=False):
+    """
+    Configura o logger da aplicação a partir das variáveis de ambiente.
+    Pode ser chamada mais de uma vez; a configuração anterior é substituída.
+    """
+    level_name = os.getenv("LOG_LEVEL", "DEBUG" if debug else "INFO").upper()
+    payload_limit = int(os.getenv("LOG_PAYLOAD_LIMIT", "0" if debug else "500"))
+    truncate = PayloadTruncator(payload_limit)
+
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        formatter = JsonFormatter(truncate)
+    else:
+        formatter = TruncatingFormatter(truncate, "%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    # O filtro fica no handler para valer também para os loggers filhos
+    # (autobrief.jobs, autobrief.llm_cache, ...)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    handler.addFilter(RequestContextFilter(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [handler]
+    logger.setLevel(getattr(logging, level_name, logging.INFO))
+    logger.propagate = False
+    return logger
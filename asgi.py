@@ -0,0 +1,239 @@
+"""
+Ponto de entrada ASGI da aplicação (modo assíncrono).
+
+O POST /generate é atendido de forma nativa em asyncio: a chamada à API Groq
+e a inserção no Supabase usam clientes HTTP assíncronos, então um único
+processo consegue manter centenas de gerações em andamento ao mesmo tempo.
+As demais rotas continuam sendo as rotas Flask de main.py, executadas pelo
+adaptador WSGI do a2wsgi, em um pool de threads próprio.
+
+Uso:
+    uvicorn asgi:application --workers 2
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from flask_login import current_user
+
+import main
+from briefing_store import async_save_briefings, parse_client_key
+from clients import get_async_postgrest_client
+from llm_policy import LLMUnavailableError
+from llm_usage import usage_user
+from metrics import REQUEST_SECONDS, server_timing_header
+
+logger = logging.getLogger("autobrief.asgi")
+
+# Threads do adaptador WSGI: cada requisição Flask roda em uma delas, então é
+# o limite de rotas síncronas atendidas ao mesmo tempo por processo
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "32"))
+
+wsgi_application = WSGIMiddleware(main.app, workers=WSGI_THREADS)
+
+
+def build_environ(scope, body=b""):
+    """
+    Monta um environ WSGI mínimo a partir do scope ASGI, suficiente para
+    abrir a sessão Flask e executar o carregamento do usuário.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("127.0.0.1", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        "wsgi.version": (1, 0),
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name == "CONTENT_LENGTH":
+            environ["CONTENT_LENGTH"] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def authenticated_user_id(environ):
+    """
+    Retorna o ID do usuário logado, usando a mesma sessão e o mesmo
+    Flask-Login (incluindo session_protection) das rotas síncronas.
+    """
+    with main.app.request_context(environ):
+        if current_user.is_authenticated:
+            return current_user.id
+    return None
+
+
+async def async_generate_briefing(conversation):
+    """
+    Versão assíncrona de main.generate_briefing.
+
+    Returns:
+        tuple: (briefing, cache_hit)
+    """
+    # O cache (sqlite, redis) e a sessão bloqueiam; vão para uma thread, fora do loop
+    cached = await asyncio.to_thread(main.get_cached_briefing, conversation)
+    if cached is not None:
+        return cached, True
+
+    if main.needs_chunking(conversation, main.briefing_chunking):
+        # O map-reduce de conversas longas usa o pool de trechos de main
+        briefing = await asyncio.to_thread(main.generate_briefing, conversation)
+        return briefing, False
+
+    messages = main.build_briefing_messages(conversation)
+    result = await main.groq_caller.acreate(**main.briefing_request(messages))
+    completion = result.response
+    main.record_llm_call(result, main.BRIEFING_PROMPT, messages)
+    content = completion.choices[0].message.content
+    briefing, model = await async_structure_briefing_output(conversation, content, result.model, messages)
+    await asyncio.to_thread(main.cache_generated_briefing, conversation, briefing, model)
+    return briefing, False
+
+
+async def async_structure_briefing_output(conversation, content, model, messages=None):
+    """
+    Executa main.structure_briefing_steps com as chamadas assíncronas à Groq.
+    """
+    steps = main.structure_briefing_steps(conversation, content, model, messages)
+    try:
+        request_args = next(steps)
+        while True:
+            try:
+                result = await main.groq_caller.acreate(**request_args)
+            except Exception as e:
+                request_args = steps.throw(e)
+            else:
+                request_args = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+async def async_persist_generated_briefing(user_id, conversation, briefing, client_key=None):
+    rows = await async_save_briefings(
+        get_async_postgrest_client(),
+        [main.build_briefing_row(user_id, conversation, briefing, client_key)],
+    )
+    if rows[0]:
+        # A indexação local (SQLite) bloqueia; vai para uma thread
+        await asyncio.to_thread(main.after_briefings_saved, user_id, [rows[0]])
+    return rows[0]
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_json(send, status, payload, headers=(), started=None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    if started is not None:
+        # Mesmas métricas das rotas Flask (ver metrics.instrument_app)
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(elapsed, route="generate", method="POST", status=status)
+        headers = [*headers, (b"server-timing", server_timing_header({}, elapsed).encode("ascii"))]
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def generate_endpoint(scope, receive, send):
+    started = time.perf_counter()
+    body = await read_body(receive)
+    environ = build_environ(scope, body)
+
+    user_id = await asyncio.to_thread(authenticated_user_id, environ)
+    if not user_id:
+        await send({
+            "type": "http.response.start",
+            "status": 302,
+            "headers": [(b"location", b"/login?next=%2Fgenerate"), (b"content-length", b"0")],
+        })
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    try:
+        data = json.loads(body or b"{}")
+        conversation = data.get("conversation", "") if isinstance(data, dict) else ""
+        if not conversation:
+            await send_json(send, 400, {"error": "No conversation provided"}, started=started)
+            return
+
+        with usage_user(user_id):
+            briefing, cache_hit = await async_generate_briefing(conversation)
+        if isinstance(briefing, dict):
+            briefing["texto_original"] = conversation
+
+        client_key = parse_client_key(environ.get("HTTP_IDEMPOTENCY_KEY"))
+        row = await async_persist_generated_briefing(user_id, conversation, briefing, client_key)
+        if not row:
+            await send_json(send, 500, {"error": "Erro ao salvar briefing"}, started=started)
+            return
+        briefing["id"] = row["id"]
+
+        await send_json(send, 200, briefing, headers=[(b"x-cache", b"HIT" if cache_hit else b"MISS")], started=started)
+    except LLMUnavailableError as e:
+        headers = [(b"retry-after", str(e.retry_after).encode("ascii"))] if e.retry_after else []
+        await send_json(send, 503, {"error": str(e)}, headers=headers, started=started)
+    except Exception as e:
+        logger.exception("Erro ao gerar briefing (asgi): %s", e)
+        await send_json(send, 500, {"error": str(e)}, started=started)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def is_native_generate(scope):
+    if scope["path"] != "/generate" or scope["method"] != "POST":
+        return False
+    # Streaming e outras variações continuam no caminho Flask
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return "stream" not in query
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http" and is_native_generate(scope):
+        await generate_endpoint(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
@@ -0,0 +1,84 @@
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+# Briefings gerados são salvos em inserções de até este tamanho, conforme ficam prontos
+BATCH_SAVE_SIZE = int(os.getenv("BATCH_SAVE_SIZE", "10"))
+
+# Campos aceitos como texto da conversa e como identificador de cada item
+TEXT_KEYS = ("conversation", "input_text", "body", "text")
+REF_KEYS = ("ref", "id", "request_id", "title")
+
+# Pool compartilhado por todos os lotes, para limitar as chamadas simultâneas à API
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+    return _executor
+
+
+def _normalize_item(item, index):
+    if isinstance(item, str):
+        return {"index": index, "ref": None, "conversation": item}
+    if isinstance(item, dict):
+        conversation = next((item[key] for key in TEXT_KEYS if item.get(key)), "")
+        ref = next((item[key] for key in REF_KEYS if item.get(key)), None)
+        return {"index": index, "ref": ref, "conversation": conversation}
+    return {"index": index, "ref": None, "conversation": ""}
+
+
+def parse_batch_items(json_data=None, upload=None):
+    """
+    Lê os itens de um lote a partir do corpo JSON ({"conversations": [...]})
+    ou de um arquivo JSONL enviado (um objeto ou string por linha).
+
+    Returns:
+        list: Itens {"index", "ref", "conversation"}
+    """
+    if upload is not None:
+        raw_items = []
+        for line in upload.read().decode("utf-8").splitlines():
+            line = line.strip()
+            if line:
+                raw_items.append(json.loads(line))
+    elif isinstance(json_data, dict):
+        raw_items = json_data.get("conversations") or []
+    elif isinstance(json_data, list):
+        raw_items = json_data
+    else:
+        raw_items = []
+
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"O lote pode ter no máximo {BATCH_MAX_ITEMS} conversas")
+
+    return [_normalize_item(item, index) for index, item in enumerate(raw_items)]
+
+
+def run_batch(items, generate):
+    """
+    Gera os briefings do lote em paralelo, no pool limitado.
+
+    Yields:
+        tuple: (item, briefing, erro) na ordem em que cada geração termina
+    """
+    executor = get_executor()
+    futures = {}
+    for item in items:
+        if not item["conversation"]:
+            yield item, None, "Conversa vazia"
+            continue
+        # Cada geração roda numa cópia do contexto (requisição, usuário do uso do modelo)
+        futures[executor.submit(contextvars.copy_context().run, generate, item["conversation"])] = item
+
+    for future in as_completed(futures):
+        item = futures[future]
+        try:
+            yield item, future.result(), None
+        except Exception as e:
+            yield item, None, str(e)
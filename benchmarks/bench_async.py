@@ -0,0 +1,217 @@
+"""
+Benchmark de carga do POST /generate: modo síncrono (WSGI, pool fixo de
+threads) contra o modo assíncrono (asgi.py), com Groq e Supabase simulados
+localmente por benchmarks/stub_upstreams.py.
+
+Uso:
+    python benchmarks/bench_async.py --requests 300 --concurrency 100 --groq-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_upstreams import start_stub_server  # noqa: E402
+
+BENCH_USER_ID = "bench-user"
+BENCH_USER_AGENT = "autobrief-bench"
+
+
+def bench_environment(stub_url, concurrency=100):
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": stub_url,
+        "SUPABASE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYmVuY2gifQ.YmVuY2g",
+        "GROQ_API_KEY": "bench-key",
+        "GROQ_BASE_URL": stub_url,
+        "FLASK_SECRET_KEY": "bench-secret",
+        "LLM_CACHE_BACKEND": "none",
+        # session_cookie() gera o cookie assinado, sem sessão no servidor
+        "SESSION_BACKEND": "cookie",
+        # O pool para as APIs externas não pode ser o gargalo do modo assíncrono
+        "HTTP_POOL_MAX_CONNECTIONS": str(concurrency),
+        "HTTP_POOL_MAX_KEEPALIVE": str(concurrency),
+    })
+    return env
+
+
+class PooledWSGIServer(WSGIServer):
+    """Servidor WSGI com um número fixo de threads, como um gunicorn gthread."""
+
+    # A fila padrão do socketserver (5) faz o SYN de conexões excedentes
+    # esperar 1 s para ser reenviado, o que distorce o p99
+    request_queue_size = 1024
+
+    def __init__(self, *args, threads=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(mode, port, threads):
+    if mode == "sync":
+        import main
+
+        server = make_server(
+            "127.0.0.1", port, main.app,
+            server_class=lambda *a, **kw: PooledWSGIServer(*a, threads=threads, **kw),
+            handler_class=QuietHandler,
+        )
+        server.serve_forever()
+    else:
+        import uvicorn
+
+        uvicorn.run("asgi:application", host="127.0.0.1", port=port, log_level="warning", app_dir=ROOT)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu na porta {port}")
+
+
+def session_cookie(user_id=BENCH_USER_ID):
+    """
+    Gera um cookie de sessão Flask válido para o usuário do benchmark,
+    compatível com session_protection='strong'.
+    """
+    import main
+
+    with main.app.test_request_context(
+        environ_base={"REMOTE_ADDR": "127.0.0.1"},
+        headers={"User-Agent": BENCH_USER_AGENT},
+    ):
+        identifier = main.login_manager._session_identifier_generator()
+    serializer = main.app.session_interface.get_signing_serializer(main.app)
+    return serializer.dumps({
+        "_user_id": user_id,
+        "_fresh": True,
+        "_id": identifier,
+    })
+
+
+async def drive(port, cookie, total, concurrency):
+    import httpx
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}",
+        headers={"User-Agent": BENCH_USER_AGENT},
+        cookies={"session": cookie},
+        limits=limits,
+        timeout=300,
+    ) as client:
+        async def one(index):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/generate", json={"conversation": f"Conversa de teste {index}"})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": latencies[-1],
+    }
+
+
+def run_mode(mode, env, args, cookie):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port),
+         "--sync-threads", str(args.sync_threads)],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        return asyncio.run(drive(port, cookie, args.requests, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark síncrono x assíncrono do POST /generate")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--groq-latency", type=float, default=0.5)
+    parser.add_argument("--supabase-latency", type=float, default=0.02)
+    parser.add_argument("--sync-threads", type=int, default=8)
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--serve", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.sync_threads)
+        return
+
+    stub, _ = start_stub_server(groq_latency=args.groq_latency, supabase_latency=args.supabase_latency)
+    env = bench_environment(f"http://127.0.0.1:{stub.server_port}", args.concurrency)
+    os.environ.update(env)
+    cookie = session_cookie()
+
+    print(f"\n{args.requests} requisições, concorrência {args.concurrency}, "
+          f"latência Groq {args.groq_latency}s, {args.sync_threads} threads no modo síncrono\n")
+    print(f"{'modo':<8}{'req/s':>10}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}{'erros':>8}")
+    for mode in args.modes.split(","):
+        result = run_mode(mode, env, args, cookie)
+        print(f"{mode:<8}{result['throughput']:>10.1f}{result['p50']:>10.3f}"
+              f"{result['p95']:>10.3f}{result['max']:>10.3f}{result['errors']:>8}")
+
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark da geração de briefings para conversas longas: uma única chamada
+com a conversa inteira contra o map-reduce de briefing_chunks.py, com a
+Groq simulada por benchmarks/stub_upstreams.py.
+
+O stub cobra o tamanho do prompt (--prefill-latency segundos por 1000
+tokens) e recusa prompts acima de --context-tokens, como a API real.
+
+Uso:
+    python benchmarks/bench_chunking.py --sizes 10000 50000 200000 --runs 3
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import replace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async import bench_environment  # noqa: E402
+from stub_upstreams import start_stub_server  # noqa: E402
+
+SPEAKERS = ("Cliente", "Designer")
+SENTENCES = (
+    "Queremos um site novo para a padaria do bairro.",
+    "O público são famílias e moradores entre 25 e 60 anos.",
+    "Gostamos muito do estilo da padariareal.com.br.",
+    "O prazo final seria em 30 dias, com o layout em 10 dias.",
+    "O orçamento total fica em R$ 5.000, com 10% de desconto.",
+    "Podemos usar tons de marrom e bege na identidade.",
+    "Precisamos de uma página de encomendas para festas.",
+    "As fotos dos produtos serão feitas pela nossa equipe.",
+    "Vamos precisar de integração com o WhatsApp.",
+    "Isso, pode seguir assim e me manda a proposta.",
+)
+
+
+def synthetic_conversation(chars, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    minute = 0
+    while total < chars:
+        minute += rng.randint(1, 5)
+        text = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4)))
+        line = f"[{9 + minute // 60 % 12:02d}:{minute % 60:02d}] {SPEAKERS[len(lines) % 2]}: {text}"
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:chars]
+
+
+def run(main, conversation, policy, runs, state):
+    main.briefing_chunking = policy
+    latencies = []
+    errors = 0
+    before = state.requests["groq"]
+    for _ in range(runs):
+        started = time.perf_counter()
+        try:
+            main.generate_briefing(conversation)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    calls = (state.requests["groq"] - before) / runs
+    return statistics.median(latencies), calls, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de conversas longas: chamada única x map-reduce")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000], help="Tamanhos em caracteres")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--groq-latency", type=float, default=0.3, help="Latência base de cada chamada")
+    parser.add_argument("--prefill-latency", type=float, default=0.05, help="Segundos por 1000 tokens de prompt")
+    parser.add_argument("--context-tokens", type=int, default=32768, help="Contexto máximo do modelo simulado")
+    args = parser.parse_args()
+
+    server, state = start_stub_server(
+        groq_latency=args.groq_latency,
+        groq_prefill_latency=args.prefill_latency,
+        groq_context_tokens=args.context_tokens,
+    )
+    os.environ.update(bench_environment(f"http://127.0.0.1:{server.server_port}"))
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    import main as app_main
+    from briefing_chunks import estimate_tokens, split_conversation
+
+    chunked = app_main.briefing_chunking
+    single = replace(chunked, max_input_tokens=10 ** 9)
+
+    print(f"{'caracteres':>10} {'tokens':>7} {'trechos':>7}  {'modo':<16} {'latência':>9} {'chamadas':>9} {'erros':>6}")
+    for size in args.sizes:
+        conversation = synthetic_conversation(size, seed=size)
+        tokens = estimate_tokens(conversation)
+        chunks = len(split_conversation(conversation, chunked.chunk_tokens)) if tokens > chunked.max_input_tokens else 1
+        for name, policy in (("chamada única", single), ("map-reduce", chunked)):
+            latency, calls, errors = run(app_main, conversation, policy, args.runs, state)
+            print(f"{size:>10} {tokens:>7} {chunks:>7}  {name:<16} {latency * 1000:>7.0f}ms {calls:>9.1f} {errors:>6}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark de cold start: mede, em processos novos, o tempo para importar
+main.py e o tempo até a primeira resposta, como numa função serverless
+recém-criada na Vercel. O Supabase é simulado por benchmarks/stub_upstreams.py.
+
+Rotas medidas:
+- /login: não usa APIs externas
+- /briefings: primeira consulta ao Supabase (inclui a criação do cliente)
+
+Uso:
+    python benchmarks/bench_cold_start.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async import BENCH_USER_AGENT, bench_environment, session_cookie  # noqa: E402
+from stub_upstreams import start_stub_server  # noqa: E402
+
+# Executado em um processo novo a cada rodada
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+client = main.app.test_client()
+client.set_cookie("localhost", "session", sys.argv[2])
+response = client.get(sys.argv[1], headers={"User-Agent": sys.argv[3]})
+finished = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "first_response": finished - imported,
+    "status": response.status_code,
+}))
+"""
+
+
+def run_once(path, env, cookie):
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, path, cookie, BENCH_USER_AGENT],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação e da primeira resposta em processos novos")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--paths", default="/login,/briefings")
+    parser.add_argument("--supabase-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub, _ = start_stub_server(supabase_latency=args.supabase_latency)
+    env = bench_environment(f"http://127.0.0.1:{stub.server_port}")
+    env["LOG_LEVEL"] = "WARNING"
+    os.environ.update(env)
+    cookie = session_cookie()
+
+    print(f"\n{args.runs} processos por rota (mediana, em ms)\n")
+    print(f"{'rota':<14}{'import':>10}{'1ª resposta':>14}{'processo':>12}{'status':>8}")
+    for path in args.paths.split(","):
+        results = [run_once(path, env, cookie) for _ in range(args.runs)]
+        print(f"{path:<14}"
+              f"{statistics.median(r['import'] for r in results) * 1000:>10.0f}"
+              f"{statistics.median(r['first_response'] for r in results) * 1000:>14.0f}"
+              f"{statistics.median(r['process'] for r in results) * 1000:>12.0f}"
+              f"{results[-1]['status']:>8}")
+
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Micro-benchmark da decodificação de briefings: custo por linha da
+decodificação antiga (cópia do trecho que ficava em view_briefing) contra
+briefing_model.briefing_from_row, sem e com memorização.
+
+As linhas sintéticas misturam os formatos encontrados no banco: conteudo
+como objeto, como texto JSON e com o briefing_result em texto JSON.
+
+Uso:
+    python benchmarks/bench_decode.py --rows 10000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from briefing_model import briefing_from_row, clear_decode_cache, decode_briefing_row  # noqa: E402
+import briefing_model  # noqa: E402
+from stub_upstreams import STUB_BRIEFING  # noqa: E402
+
+logger = logging.getLogger("autobrief.bench")
+
+
+def legacy_decode(row):
+    """Decodificação como era feita em view_briefing, antes de briefing_model."""
+    briefing = dict(row)
+    logger.debug("Briefing encontrado: %s", briefing)
+    if 'conteudo' in briefing and briefing['conteudo']:
+        conteudo = briefing['conteudo']
+        logger.debug("Conteúdo do briefing: %s", conteudo)
+        if isinstance(conteudo, str):
+            try:
+                conteudo = json.loads(conteudo)
+            except json.JSONDecodeError as e:
+                logger.error("Erro ao decodificar JSON do conteúdo: %s", e)
+                conteudo = {}
+        if isinstance(conteudo, dict):
+            briefing['input_text'] = conteudo.get('input_text', '')
+            briefing['briefing_result'] = conteudo.get('briefing_result', {})
+            if isinstance(briefing['briefing_result'], str):
+                try:
+                    briefing['briefing_result'] = json.loads(briefing['briefing_result'])
+                except json.JSONDecodeError as e:
+                    logger.error("Erro ao decodificar JSON do briefing_result: %s", e)
+                    briefing['briefing_result'] = {}
+    logger.debug("Briefing processado para exibição: %s", briefing)
+    return briefing
+
+
+def synthetic_rows(count):
+    rows = []
+    for index in range(count):
+        result = dict(STUB_BRIEFING, objetivo=f"{STUB_BRIEFING['objetivo']} #{index}")
+        conteudo = {"input_text": f"Conversa de teste {index} " * 20, "briefing_result": result}
+        if index % 3 == 1:
+            conteudo = json.dumps(conteudo, ensure_ascii=False)
+        elif index % 3 == 2:
+            conteudo = dict(conteudo, briefing_result=json.dumps(result, ensure_ascii=False))
+        rows.append({
+            "id": index,
+            "user_id": "bench-user",
+            "titulo": result["objetivo"],
+            "created_at": "2024-05-01T12:00:00+00:00",
+            "conteudo": conteudo,
+        })
+    return rows
+
+
+def per_row(function, rows):
+    started = time.perf_counter()
+    for row in rows:
+        function(row)
+    return (time.perf_counter() - started) / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo de decodificação por linha de briefing")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--log-level", default="INFO", help="nível do logger durante a versão antiga")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, stream=open(os.devnull, "w"))
+    rows = synthetic_rows(args.rows)
+    briefing_model.DECODE_CACHE_SIZE = max(briefing_model.DECODE_CACHE_SIZE, args.rows)
+
+    clear_decode_cache()
+    results = [
+        ("antiga (view_briefing)", per_row(legacy_decode, rows)),
+        ("briefing_model, sem memo", per_row(decode_briefing_row, rows)),
+        ("briefing_from_row, 1ª vez", per_row(briefing_from_row, rows)),
+        ("briefing_from_row, memo", per_row(briefing_from_row, rows)),
+    ]
+
+    print(f"\n{args.rows} linhas sintéticas, logger em {args.log_level}\n")
+    print(f"{'versão':<30}{'µs/linha':>10}")
+    for name, micros in results:
+        print(f"{name:<30}{micros:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
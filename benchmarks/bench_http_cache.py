@@ -0,0 +1,133 @@
+"""
+Benchmark da camada HTTP (http_cache.py): bytes trafegados e tempo de
+resposta do /history de um usuário com 500 briefings. O Supabase é
+simulado por benchmarks/stub_upstreams.py, com os briefings semeados.
+
+Para cada tamanho de página mede:
+- tempo até a página renderizada (mediana e p95), sem cache de leitura;
+- bytes da página sem compressão e com gzip (ou brotli, se instalado);
+- primeira visita (página + estáticos) e visita repetida (If-None-Match
+  na página; os estáticos com impressão digital ficam no cache do
+  navegador e nem são pedidos);
+- o histórico inteiro, seguindo os cursores até a última página.
+
+Uso:
+    python benchmarks/bench_http_cache.py --briefings 500 --runs 20
+"""
+import argparse
+import gzip
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async import BENCH_USER_AGENT, BENCH_USER_ID, bench_environment, session_cookie  # noqa: E402
+from stub_upstreams import start_stub_server  # noqa: E402
+
+STATIC_URL = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+NEXT_CURSOR = re.compile(r'href="[^"]*[?&]after=([^"&]+)"')
+
+
+def fetch(client, path, encoding=None, etag=None):
+    headers = {"User-Agent": BENCH_USER_AGENT}
+    if encoding:
+        headers["Accept-Encoding"] = encoding
+    if etag:
+        headers["If-None-Match"] = etag
+    started = time.perf_counter()
+    response = client.get(path, headers=headers)
+    elapsed = time.perf_counter() - started
+    return response, elapsed
+
+
+def page_sizes(client, path, encoding):
+    """Bytes da primeira visita (página + estáticos) e da visita repetida."""
+    response, _ = fetch(client, path, encoding)
+    first = len(response.data)
+    for url in sorted(set(STATIC_URL.findall(decoded(response)))):
+        first += len(fetch(client, url, encoding)[0].data)
+    repeat, _ = fetch(client, path, encoding, etag=response.headers.get("ETag"))
+    return len(response.data), first, len(repeat.data), repeat.status_code
+
+
+def decoded(response):
+    body = response.data
+    if response.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    elif response.headers.get("Content-Encoding") == "br":
+        from http_cache import brotli
+        body = brotli.decompress(body)
+    return body.decode("utf-8")
+
+
+def walk_history(client, limit, encoding):
+    """Páginas e bytes para percorrer o histórico inteiro."""
+    pages = total = 0
+    path = f"/history?limit={limit}"
+    while path:
+        response, _ = fetch(client, path, encoding)
+        total += len(response.data)
+        pages += 1
+        # Cursor do link "próxima" (ver _pagination.html)
+        match = NEXT_CURSOR.search(decoded(response))
+        path = f"/history?limit={limit}&after={match.group(1)}" if match else None
+    return pages, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes trafegados e tempo do /history com e sem compressão")
+    parser.add_argument("--briefings", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limits", default="20,100")
+    parser.add_argument("--supabase-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub, state = start_stub_server(supabase_latency=args.supabase_latency)
+    state.seed_briefings(BENCH_USER_ID, args.briefings)
+    env = bench_environment(f"http://127.0.0.1:{stub.server_port}")
+    env["LOG_LEVEL"] = "WARNING"
+    # Cada requisição renderiza a partir do Supabase (o cache de leitura é medido em outro lugar)
+    env["READ_CACHE_BACKEND"] = "none"
+    os.environ.update(env)
+
+    import main
+    from http_cache import brotli
+
+    cookie = session_cookie()
+    client = main.app.test_client()
+    client.set_cookie("localhost", "session", cookie)
+    encoding = "br" if brotli is not None else "gzip"
+
+    print(f"\n/history com {args.briefings} briefings, {args.runs} requisições por linha ({encoding})\n")
+    print(f"{'página':<8}{'mediana':>10}{'p95':>8}{'identity':>11}{encoding:>9}"
+          f"{'1ª visita':>12}{f'1ª {encoding}':>11}{'repetida':>10}")
+    for limit in (int(value) for value in args.limits.split(",")):
+        path = f"/history?limit={limit}"
+        fetch(client, path, encoding)
+        times = sorted(fetch(client, path, encoding)[1] for _ in range(args.runs))
+        identity, identity_first, _, _ = page_sizes(client, path, None)
+        compressed, compressed_first, repeat, repeat_status = page_sizes(client, path, encoding)
+        print(f"{limit:<8}"
+              f"{statistics.median(times) * 1000:>8.1f}ms"
+              f"{times[int(len(times) * 0.95) - 1] * 1000:>6.1f}ms"
+              f"{identity:>11}{compressed:>9}"
+              f"{identity_first:>12}{compressed_first:>11}"
+              f"{repeat:>7} ({repeat_status})")
+
+    print("\nHistórico inteiro, seguindo os cursores")
+    print(f"{'página':<8}{'páginas':>9}{'identity':>11}{encoding:>9}")
+    for limit in (int(value) for value in args.limits.split(",")):
+        pages, identity = walk_history(client, limit, None)
+        _, compressed = walk_history(client, limit, encoding)
+        print(f"{limit:<8}{pages:>9}{identity:>11}{compressed:>9}")
+
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
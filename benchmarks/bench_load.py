@@ -0,0 +1,213 @@
+"""
+Suíte de carga de ponta a ponta: a aplicação roda em um processo próprio
+(WSGI com pool de threads, ou asgi.py) contra o Supabase e a Groq
+simulados por benchmarks/stub_upstreams.py, com um usuário semeado para
+cada tamanho de histórico (de 10 a 10.000 briefings). Cada cenário roda em
+cada nível de concorrência e o relatório traz vazão, latência p50/p95/p99
+e chamadas ao Supabase por requisição, para comparar mudanças de
+desempenho sem acesso às APIs reais.
+
+Cenários:
+- generate: POST /generate (chamada à Groq e gravação)
+- history: GET /history, na primeira página e em páginas espalhadas pelo
+  histórico (cursores)
+- briefing: GET /briefing/<id> de briefings aleatórios do usuário
+- delete: POST /delete/<id>, cada briefing excluído uma vez (roda por último)
+
+Uso:
+    python benchmarks/bench_load.py --sizes 10,1000,10000 --concurrency 1,10,50 --requests 200
+    python benchmarks/bench_load.py --scenarios history,briefing --mode async --json resultados.json
+"""
+import argparse
+import asyncio
+import http.cookiejar
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async import BENCH_USER_AGENT, bench_environment, free_port, session_cookie, wait_for_port  # noqa: E402
+from stub_upstreams import start_stub_server  # noqa: E402
+
+from briefing_store import encode_cursor  # noqa: E402
+
+SCENARIOS = ("generate", "history", "briefing", "delete")
+
+# Status de sucesso de cada cenário (a exclusão redireciona para a listagem)
+EXPECTED_STATUS = {"generate": 200, "history": 200, "briefing": 200, "delete": 302}
+
+
+class FixedCookiePolicy(http.cookiejar.DefaultCookiePolicy):
+    """Ignora o Set-Cookie das respostas: as mensagens flash não se acumulam no cookie de sessão."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+def percentile(values, q):
+    """Percentil pelo posto mais próximo; `values` já ordenada."""
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def build_requests(scenario, table, user_id, total, rng):
+    """
+    Requisições de um cenário para o usuário.
+
+    Returns:
+        list: (método, caminho, corpo JSON)
+    """
+    if scenario == "generate":
+        # Conversas novas a cada rodada, para não cair na chave de idempotência
+        run = f"{rng.getrandbits(32):08x}"
+        return [("POST", "/generate", {"conversation": f"Conversa de carga {user_id} {run} {index}"}) for index in range(total)]
+    keys = table.keys(user_id)
+    if not keys:
+        return []
+    if scenario == "history":
+        requests = []
+        for index in range(total):
+            if index % 4 == 0:
+                requests.append(("GET", "/history", None))
+            else:
+                created_at, row_id = rng.choice(keys)
+                cursor = encode_cursor({"created_at": created_at, "id": row_id})
+                requests.append(("GET", f"/history?after={cursor}", None))
+        return requests
+    if scenario == "briefing":
+        return [("GET", f"/briefing/{rng.choice(keys)[1]}", None) for _ in range(total)]
+    return [("POST", f"/delete/{row_id}", None) for _, row_id in rng.sample(keys, min(total, len(keys)))]
+
+
+async def drive(port, cookie, requests, concurrency, expected_status):
+    import httpx
+
+    latencies = []
+    errors = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}",
+        headers={"User-Agent": BENCH_USER_AGENT},
+        cookies={"session": cookie},
+        limits=limits,
+        timeout=300,
+    ) as client:
+        client.cookies.jar.set_policy(FixedCookiePolicy())
+
+        async def one(method, path, payload):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.request(method, path, json=payload)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != expected_status:
+                    errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(*request) for request in requests))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(requests),
+        # Status inesperados e quantas vezes cada um
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(requests) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1],
+    }
+
+
+def start_app(mode, env, threads):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_async.py"),
+         "--serve", mode, "--port", str(port), "--sync-threads", str(threads)],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=None if os.getenv("BENCH_APP_LOGS") else subprocess.DEVNULL,
+    )
+    wait_for_port(port)
+    return process, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de ponta a ponta com Supabase e Groq simulados")
+    parser.add_argument("--sizes", default="10,1000,10000", help="Briefings de cada usuário semeado")
+    parser.add_argument("--concurrency", default="1,10,50", help="Níveis de concorrência")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições por cenário e nível")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--sync-threads", type=int, default=16)
+    parser.add_argument("--groq-latency", type=float, default=0.5)
+    parser.add_argument("--supabase-latency", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    sizes = [int(value) for value in args.sizes.split(",")]
+    levels = [int(value) for value in args.concurrency.split(",")]
+    scenarios = [name for name in SCENARIOS if name in args.scenarios.split(",")]
+    rng = random.Random(args.seed)
+
+    stub, state = start_stub_server(groq_latency=args.groq_latency, supabase_latency=args.supabase_latency)
+    users = {}
+    started = time.perf_counter()
+    for size in sizes:
+        users[size] = f"bench-{size}"
+        state.seed_briefings(users[size], size)
+    print(f"\n{len(state.briefings)} briefings semeados em {time.perf_counter() - started:.1f}s")
+
+    env = bench_environment(f"http://127.0.0.1:{stub.server_port}", max(levels))
+    env["LOG_LEVEL"] = "WARNING"
+    os.environ.update(env)
+    cookies = {size: session_cookie(user_id) for size, user_id in users.items()}
+
+    process, port = start_app(args.mode, env, args.sync_threads)
+    results = []
+    try:
+        # Aquecimento: clientes criados e primeira renderização fora da medição
+        for size in sizes:
+            asyncio.run(drive(port, cookies[size], [("GET", "/history", None)], 1, 200))
+
+        print(f"Modo {args.mode}, Groq {args.groq_latency}s, Supabase {args.supabase_latency}s, "
+              f"{args.requests} requisições por linha (latências em ms)\n")
+        print(f"{'cenário':<10}{'briefings':>10}{'conc.':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+              f"{'max':>9}{'supabase/req':>14}{'erros':>7}")
+        for scenario in scenarios:
+            for size in sizes:
+                for level in levels:
+                    requests = build_requests(scenario, state.briefings, users[size], args.requests, rng)
+                    if not requests:
+                        continue
+                    supabase_before = state.requests["supabase"]
+                    result = asyncio.run(drive(port, cookies[size], requests, level, EXPECTED_STATUS[scenario]))
+                    result.update(
+                        scenario=scenario, briefings=size, concurrency=level,
+                        supabase_per_request=(state.requests["supabase"] - supabase_before) / len(requests),
+                    )
+                    results.append(result)
+                    print(f"{scenario:<10}{size:>10}{level:>7}{result['throughput']:>9.1f}"
+                          f"{result['p50'] * 1000:>9.1f}{result['p95'] * 1000:>9.1f}{result['p99'] * 1000:>9.1f}"
+                          f"{result['max'] * 1000:>9.1f}{result['supabase_per_request']:>14.2f}{sum(result['errors'].values()):>7}")
+    finally:
+        process.terminate()
+        process.wait(10)
+        stub.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "args": vars(args), "results": results}, f, indent=2)
+        print(f"\nResultados gravados em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark da política de chamadas à Groq (llm_policy.py) contra a Groq
+simulada de benchmarks/stub_upstreams.py, em quatro cenários de falha:
+
+- erros 429 em parte das chamadas: sem novas tentativas x com backoff
+- cauda lenta: sem hedging x hedging no p95
+- Groq fora do ar: sem circuit breaker x com circuit breaker
+- modelo principal fora do ar: sem reserva x com modelo reserva
+
+Para cada combinação, mostra a taxa de sucesso, a latência (p50/p95/p99)
+e quantas requisições chegaram à Groq.
+
+Uso:
+    python benchmarks/bench_resilience.py --calls 200 --concurrency 8 --groq-latency 0.1
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_policy import CallPolicy, GroqCaller  # noqa: E402
+from stub_upstreams import start_stub_server  # noqa: E402
+
+PRIMARY_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+FALLBACK_MODEL = "llama-3.1-8b-instant"
+NO_BREAKER = 10 ** 9
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def run_calls(caller, calls, concurrency):
+    def call(_):
+        started = time.perf_counter()
+        try:
+            caller.create(
+                model=PRIMARY_MODEL,
+                messages=[{"role": "user", "content": "Conversa de teste"}],
+                stream=False,
+            )
+            ok = True
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(call, range(calls)))
+
+
+def scenarios(args):
+    base = CallPolicy(
+        attempt_timeout=args.attempt_timeout,
+        deadline=args.attempt_timeout * 3,
+        backoff_base=args.groq_latency / 2,
+        backoff_max=args.groq_latency * 4,
+        breaker_failures=NO_BREAKER,
+    )
+    return [
+        (
+            "erros 429 (30%)",
+            {"groq_error_rate": 0.3, "groq_error_status": 429},
+            [
+                ("sem novas tentativas", replace(base, max_attempts=1)),
+                ("backoff com jitter", base),
+            ],
+        ),
+        (
+            f"cauda lenta (3% em {args.slow_latency:g} s)",
+            {"groq_slow_rate": 0.03, "groq_slow_latency": args.slow_latency},
+            [
+                ("sem hedging", base),
+                ("hedging no p95", replace(base, hedge_after="p95")),
+            ],
+        ),
+        (
+            "Groq fora do ar (503)",
+            {"groq_error_rate": 1.0, "groq_error_status": 503},
+            [
+                ("sem circuit breaker", base),
+                ("circuit breaker", replace(base, breaker_failures=5, breaker_reset=60)),
+            ],
+        ),
+        (
+            "modelo principal fora do ar",
+            {"groq_down_models": {PRIMARY_MODEL}},
+            [
+                ("sem reserva", base),
+                ("modelo reserva", replace(base, fallback_model=FALLBACK_MODEL)),
+            ],
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da política de chamadas à Groq")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--groq-latency", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--attempt-timeout", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=17)
+    args = parser.parse_args()
+    # Os avisos de cada tentativa falha poluiriam a tabela
+    logging.getLogger("autobrief.llm_policy").setLevel(logging.CRITICAL)
+
+    import groq
+    import httpx
+
+    server, state = start_stub_server(groq_latency=args.groq_latency, seed=args.seed)
+    client = groq.Groq(
+        api_key="bench-key",
+        base_url=f"http://127.0.0.1:{server.server_port}",
+        max_retries=0,
+        http_client=httpx.Client(limits=httpx.Limits(max_connections=args.concurrency * 2)),
+    )
+
+    print(f"{'cenário':<32} {'política':<22} {'sucesso':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'req. Groq':>10}")
+    for title, faults, policies in scenarios(args):
+        for name, policy in policies:
+            state.groq_error_rate = faults.get("groq_error_rate", 0.0)
+            state.groq_error_status = faults.get("groq_error_status", 429)
+            state.groq_slow_rate = faults.get("groq_slow_rate", 0.0)
+            state.groq_slow_latency = faults.get("groq_slow_latency", args.slow_latency)
+            state.groq_down_models = set(faults.get("groq_down_models", ()))
+
+            caller = GroqCaller(lambda: client, policy=policy)
+            before = state.requests["groq"]
+            results = run_calls(caller, args.calls, args.concurrency)
+            upstream = state.requests["groq"] - before
+
+            latencies = [seconds for _, seconds in results]
+            success = sum(ok for ok, _ in results) / len(results)
+            print(
+                f"{title:<32} {name:<22} {success:>7.0%} "
+                f"{statistics.median(latencies) * 1000:>6.0f}ms "
+                f"{percentile(latencies, 95) * 1000:>6.0f}ms "
+                f"{percentile(latencies, 99) * 1000:>6.0f}ms "
+                f"{upstream:>10}"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+"""
+Servidores locais que imitam as APIs externas usadas pela aplicação:
+
+- Groq: POST /openai/v1/chat/completions (resposta completa ou streaming)
+- Supabase REST: GET/POST/DELETE /rest/v1/briefings, um subconjunto do
+  PostgREST sobre uma tabela em memória (BriefingTable): filtros eq/in,
+  cursor keyset, ordem, limit, select, upsert com ON CONFLICT DO NOTHING
+  e .single(). As funções RPC respondem vazio. `seed_briefings` cria
+  briefings para um usuário (de 10 a 10.000 por usuário nos benchmarks).
+
+A latência de cada resposta é configurável, para que os benchmarks meçam
+a aplicação e não a rede. A Groq simulada também pode falhar (erros com
+uma taxa, modelos fora do ar) e ter uma cauda lenta, para exercitar a
+política de chamadas (llm_policy.py, benchmarks/bench_resilience.py). Os
+atributos do estado podem ser alterados com o servidor rodando.
+
+Uso:
+    python benchmarks/stub_upstreams.py --port 8900 --groq-latency 0.5 --seed-briefings bench-user:1000
+    python benchmarks/stub_upstreams.py --groq-error-rate 0.3 --groq-error-status 429 \
+        --groq-slow-rate 0.05 --groq-slow-latency 5 --groq-down-model meta-llama/llama-4-maverick-17b-128e-instruct
+"""
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STUB_BRIEFING = {
+    "objetivo": "Criar um site institucional para a padaria",
+    "publico_alvo": "Moradores do bairro entre 25 e 60 anos",
+    "referencias": ["padariareal.com.br"],
+    "prazos": {
+        "prazo_final": "30 dias",
+        "etapas_intermediarias": ["Layout em 10 dias", "Conteúdo em 20 dias"]
+    },
+    "orcamento": {
+        "valor_total": 5000.0,
+        "descontos": 500.0,
+        "valor_final": 4500.0
+    },
+    "observacoes": ["Cliente prefere tons de marrom"]
+}
+
+
+# Filtro keyset de briefing_store._keyset_filter:
+# or=(created_at.lt."c",and(created_at.eq."c",id.lt."i"))
+_KEYSET_FILTER = re.compile(r'^\(created_at\.(lt|gt)\."([^"]*)",and\(created_at\.eq\."[^"]*",id\.(?:lt|gt)\."([^"]*)"\)\)$')
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _parse_filter(value):
+    # "eq.x" -> ("eq", "x"); "in.(a,b)" -> ("in", {"a", "b"})
+    op, _, operand = value.partition(".")
+    if op == "in":
+        operand = {item.strip('"') for item in operand.strip("()").split(",") if item}
+    return op, operand
+
+
+def _matches(row, name, condition):
+    op, operand = condition
+    value = row.get(name)
+    if op == "is":
+        return value is None if operand == "null" else str(value).lower() == operand
+    value = str(value)
+    if op == "in":
+        return value in operand
+    return {
+        "eq": value == operand, "neq": value != operand,
+        "lt": value < operand, "lte": value <= operand,
+        "gt": value > operand, "gte": value >= operand,
+    }.get(op, True)
+
+
+# Parâmetros da URL que não são filtros de coluna
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "on_conflict", "columns"}
+
+
+class BriefingTable:
+    """
+    Tabela briefings em memória, indexada por usuário e ordenada por
+    (created_at, id), como o índice da migração 0002: a página de um
+    usuário com 10.000 briefings custa o mesmo que a de um com 10.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._by_user = {}
+        self._by_key = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def count(self, user_id):
+        return len(self._by_user.get(user_id, ()))
+
+    def keys(self, user_id):
+        """(created_at, id) dos briefings do usuário, do mais antigo ao mais recente."""
+        with self._lock:
+            return list(self._by_user.get(user_id, ()))
+
+    def insert(self, rows, ignore_duplicates=False):
+        """Grava as linhas; com `ignore_duplicates`, as de (user_id, idempotency_key) repetido ficam de fora."""
+        inserted = []
+        with self._lock:
+            for row in rows:
+                key = (row.get("user_id"), row.get("idempotency_key"))
+                if key[1] is not None and key in self._by_key:
+                    if ignore_duplicates:
+                        continue
+                    raise KeyError(key)
+                row = dict(row)
+                row.setdefault("id", next(self._ids))
+                row.setdefault("created_at", _now())
+                self._rows[row["id"]] = row
+                bisect.insort(self._by_user.setdefault(row.get("user_id"), []), (row["created_at"], row["id"]))
+                if key[1] is not None:
+                    self._by_key[key] = row["id"]
+                inserted.append(row)
+        return inserted
+
+    def _scan(self, params):
+        """Linhas que atendem aos filtros, na ordem pedida (gerador; chamar com o lock)."""
+        filters = {
+            name: _parse_filter(values[0]) for name, values in params.items() if name not in _RESERVED_PARAMS
+        }
+        user = filters.pop("user_id", None)
+        id_filter = filters.pop("id", None)
+        if id_filter is not None:
+            op, operand = id_filter
+            wanted = operand if op == "in" else {operand}
+            keys = sorted(
+                (self._rows[int(value)]["created_at"], int(value))
+                for value in wanted if value.isdigit() and int(value) in self._rows
+            )
+        elif user is not None and user[0] == "eq":
+            keys = self._by_user.get(user[1], [])
+        else:
+            keys = sorted(key for user_keys in self._by_user.values() for key in user_keys)
+
+        keyset = _KEYSET_FILTER.match(params.get("or", [""])[0])
+        if keyset:
+            op, created_at, row_id = keyset.groups()
+            cursor = (created_at, int(row_id))
+            keys = keys[:bisect.bisect_left(keys, cursor)] if op == "lt" else keys[bisect.bisect_right(keys, cursor):]
+
+        ascending = params.get("order", ["created_at.desc"])[0].startswith("created_at.asc")
+        for _, row_id in (keys if ascending else reversed(keys)):
+            row = self._rows[row_id]
+            if user is not None and not _matches(row, "user_id", user):
+                continue
+            if all(_matches(row, name, condition) for name, condition in filters.items()):
+                yield row
+
+    def select(self, params):
+        limit = int(params["limit"][0]) if "limit" in params else None
+        with self._lock:
+            return [dict(row) for row in itertools.islice(self._scan(params), limit)]
+
+    def delete(self, params):
+        with self._lock:
+            rows = list(self._scan(params))
+            for row in rows:
+                del self._rows[row["id"]]
+                self._by_user[row.get("user_id")].remove((row["created_at"], row["id"]))
+                self._by_key.pop((row.get("user_id"), row.get("idempotency_key")), None)
+        return rows
+
+
+def project(rows, params):
+    """Aplica o parâmetro `select` (colunas) do PostgREST."""
+    select = params.get("select", ["*"])[0]
+    if select == "*":
+        return rows
+    columns = select.split(",")
+    return [{name: row.get(name) for name in columns} for row in rows]
+
+
+def prompt_token_count(messages):
+    # Mesma estimativa da aplicação (briefing_chunks.CHARS_PER_TOKEN)
+    chars = sum(len(message.get("content") or "") for message in messages or [] if isinstance(message, dict))
+    return int(chars / 3.5)
+
+
+class StubState:
+    def __init__(self, groq_latency=0.5, supabase_latency=0.02, groq_error_rate=0.0, groq_error_status=429,
+                 groq_retry_after=None, groq_slow_rate=0.0, groq_slow_latency=5.0, groq_down_models=(), seed=None,
+                 groq_prefill_latency=0.0, groq_context_tokens=None):
+        self.groq_latency = groq_latency
+        self.supabase_latency = supabase_latency
+        # Falhas simuladas da Groq: fração das requisições que recebe
+        # `groq_error_status` (com Retry-After opcional), fração que demora
+        # `groq_slow_latency` e modelos que sempre respondem 503
+        self.groq_error_rate = groq_error_rate
+        self.groq_error_status = groq_error_status
+        self.groq_retry_after = groq_retry_after
+        self.groq_slow_rate = groq_slow_rate
+        self.groq_slow_latency = groq_slow_latency
+        self.groq_down_models = set(groq_down_models)
+        # Custo do prompt: segundos a mais por 1000 tokens de entrada e
+        # limite de contexto (400 context_length_exceeded acima dele)
+        self.groq_prefill_latency = groq_prefill_latency
+        self.groq_context_tokens = groq_context_tokens
+        self.briefing_content = json.dumps(STUB_BRIEFING, ensure_ascii=False)
+        # Respostas da Groq para as próximas chamadas, em ordem (ex.: JSON
+        # quebrado seguido do complemento); vazia, vale briefing_content
+        self.queued_contents = deque()
+        self.briefings = BriefingTable()
+        self.requests = {"groq": 0, "supabase": 0}
+        self.groq_models = {}
+        # Prompts de sistema já vistos, para simular o cache de prefixo
+        self.seen_prefixes = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count(self, upstream, model=None):
+        with self._lock:
+            self.requests[upstream] += 1
+            if model is not None:
+                self.groq_models[model] = self.groq_models.get(model, 0) + 1
+
+    def next_content(self):
+        with self._lock:
+            return self.queued_contents.popleft() if self.queued_contents else self.briefing_content
+
+    def cached_prefix_tokens(self, messages):
+        """
+        Tokens do início do prompt de sistema que repetem um prompt já
+        visto, como no cache de prefixo da API (informado em
+        usage.prompt_tokens_details.cached_tokens).
+        """
+        system = next((m.get("content") or "" for m in messages or [] if isinstance(m, dict)), "")
+        with self._lock:
+            common = max((len(os.path.commonprefix([system, seen])) for seen in self.seen_prefixes), default=0)
+            self.seen_prefixes.add(system)
+        return int(common / 3.5)
+
+    def seed_briefings(self, user_id, count):
+        """Cria `count` briefings do usuário, um por minuto, terminando agora."""
+        start = datetime.now(timezone.utc) - timedelta(minutes=count)
+        rows = []
+        for i in range(count):
+            briefing = dict(STUB_BRIEFING, objetivo=f"{STUB_BRIEFING['objetivo']} ({i + 1})")
+            rows.append({
+                "user_id": user_id,
+                "titulo": f"Briefing {i + 1}",
+                "conteudo": json.dumps({"conversa": "Cliente: preciso de um site", "briefing": briefing}, ensure_ascii=False),
+                "created_at": (start + timedelta(minutes=i)).isoformat(timespec="microseconds"),
+                "prazo_final": briefing["prazos"]["prazo_final"],
+                "prazo_final_data": None,
+                "valor_final": briefing["orcamento"]["valor_final"],
+                "idempotency_key": f"seed-{user_id}-{i}",
+            })
+        return self.briefings.insert(rows)
+
+    def groq_behavior(self, model):
+        """
+        Decide o que a próxima chamada à Groq recebe.
+
+        Returns:
+            tuple: (status de erro ou None, latência em segundos)
+        """
+        if model in self.groq_down_models:
+            return 503, self.groq_latency / 10
+        with self._lock:
+            failing = self._random.random() < self.groq_error_rate
+            slow = self._random.random() < self.groq_slow_rate
+        if failing:
+            return self.groq_error_status, self.groq_latency / 10
+        return None, self.groq_slow_latency if slow else self.groq_latency
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_rows(self, status, rows):
+        # .single() pede um objeto em vez de lista
+        if "vnd.pgrst.object" in (self.headers.get("Accept") or ""):
+            if len(rows) != 1:
+                self._send_json(406, {"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"})
+            else:
+                self._send_json(status, rows[0])
+        else:
+            self._send_json(status, rows)
+
+    def _supabase(self, method, payload=None):
+        self.state.count("supabase")
+        time.sleep(self.state.supabase_latency)
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        table = self.state.briefings
+        if url.path.startswith("/rest/v1/rpc/"):
+            self._send_json(200, [])
+        elif url.path != "/rest/v1/briefings":
+            # Outras tabelas: leitura vazia e gravação ecoada
+            rows = payload if isinstance(payload, list) else [payload] if payload else []
+            self._send_rows(200 if method == "GET" else 201, [] if method == "GET" else rows)
+        elif method == "GET":
+            self._send_rows(200, project(table.select(params), params))
+        elif method == "DELETE":
+            self._send_rows(200, project(table.delete(params), params))
+        else:
+            rows = payload if isinstance(payload, list) else [payload]
+            ignore = "ignore-duplicates" in (self.headers.get("Prefer") or "")
+            try:
+                inserted = table.insert(rows, ignore_duplicates=ignore)
+            except KeyError:
+                self._send_json(409, {"code": "23505", "message": "duplicate key value violates unique constraint"})
+                return
+            self._send_rows(201, project(inserted, params))
+
+    def do_GET(self):
+        self._read_json()
+        if self.path.startswith("/rest/v1/"):
+            self._supabase("GET")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        self._read_json()
+        if self.path.startswith("/rest/v1/"):
+            self._supabase("DELETE")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        payload = self._read_json() or {}
+        if self.path.startswith("/openai/v1/chat/completions"):
+            model = payload.get("model")
+            self.state.count("groq", model)
+            prompt_tokens = prompt_token_count(payload.get("messages"))
+            error_status, latency = self.state.groq_behavior(model)
+            latency += self.state.groq_prefill_latency * prompt_tokens / 1000
+            if self.state.groq_context_tokens and prompt_tokens > self.state.groq_context_tokens:
+                self._send_error(400, "context_length_exceeded")
+            elif error_status:
+                time.sleep(latency)
+                self._send_error(error_status)
+            elif payload.get("stream"):
+                self._stream_completion(latency)
+            else:
+                time.sleep(latency)
+                cached_tokens = self.state.cached_prefix_tokens(payload.get("messages"))
+                self._send_json(200, self._completion(model, prompt_tokens, cached_tokens))
+        elif self.path.startswith("/rest/v1/"):
+            self._supabase("POST", payload)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _send_error(self, status, code=None):
+        error = {"message": f"stub error {status}", "type": "stub_error", "code": code}
+        body = json.dumps({"error": error}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429 and self.state.groq_retry_after is not None:
+            self.send_header("Retry-After", str(self.state.groq_retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _completion(self, model=None, prompt_tokens=500, cached_tokens=0):
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model or "stub",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.state.next_content()},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 200,
+                "total_tokens": prompt_tokens + 200,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+    def _stream_completion(self, latency):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        content = self.state.next_content()
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        delay = latency / max(len(pieces), 1)
+        for piece in pieces:
+            time.sleep(delay)
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clientes que desistem da resposta (timeout, hedging) não são erro
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_stub_server(port=0, groq_latency=0.5, supabase_latency=0.02, **faults):
+    """
+    Inicia os stubs em uma thread e retorna (servidor, estado).
+    A URL base é http://127.0.0.1:<servidor.server_port>.
+    `faults` são as falhas simuladas da Groq (ver StubState).
+    """
+    state = StubState(groq_latency=groq_latency, supabase_latency=supabase_latency, **faults)
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = StubServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stubs locais das APIs Groq e Supabase")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--groq-latency", type=float, default=0.5)
+    parser.add_argument("--supabase-latency", type=float, default=0.02)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0, help="Fração das chamadas à Groq que falham")
+    parser.add_argument("--groq-error-status", type=int, default=429)
+    parser.add_argument("--groq-retry-after", type=float, default=None, help="Retry-After enviado com o 429")
+    parser.add_argument("--groq-slow-rate", type=float, default=0.0, help="Fração das chamadas com a latência lenta")
+    parser.add_argument("--groq-slow-latency", type=float, default=5.0)
+    parser.add_argument("--groq-down-model", action="append", default=[], help="Modelo que sempre responde 503")
+    parser.add_argument("--groq-prefill-latency", type=float, default=0.0, help="Segundos por 1000 tokens de prompt")
+    parser.add_argument("--groq-context-tokens", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--seed-briefings", action="append", default=[], metavar="USUARIO:QUANTIDADE",
+                        help="Briefings criados para um usuário (pode repetir)")
+    args = parser.parse_args()
+
+    server, state = start_stub_server(
+        args.port, args.groq_latency, args.supabase_latency,
+        groq_error_rate=args.groq_error_rate,
+        groq_error_status=args.groq_error_status,
+        groq_retry_after=args.groq_retry_after,
+        groq_slow_rate=args.groq_slow_rate,
+        groq_slow_latency=args.groq_slow_latency,
+        groq_down_models=args.groq_down_model,
+        seed=args.seed,
+        groq_prefill_latency=args.groq_prefill_latency,
+        groq_context_tokens=args.groq_context_tokens,
+    )
+    for spec in args.seed_briefings:
+        user_id, _, count = spec.rpartition(":")
+        state.seed_briefings(user_id, int(count))
+    print(f"Stubs rodando em http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
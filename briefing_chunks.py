@@ -0,0 +1,173 @@
+"""
+Divisão de conversas longas para a geração de briefings (map-reduce).
+
+Conversas acima de `max_input_tokens` não vão inteiras para o modelo:
+
+1. `split_conversation` separa a conversa em mensagens (linhas que começam
+   com "Nome:", "[10:32] Nome:", "12/03/2024 10:32 - Nome:"...) e agrupa
+   mensagens consecutivas em trechos de até `chunk_tokens`. Uma mensagem
+   maior que o trecho é dividida em parágrafos, depois em frases.
+2. Cada trecho vira um briefing parcial, em paralelo (map).
+3. Os parciais são combinados pelo modelo em um único briefing (reduce); se
+   não couberem juntos em um trecho, são combinados em grupos, em rodadas.
+
+A contagem de tokens é uma estimativa pelo número de caracteres, suficiente
+para respeitar os orçamentos com folga. As chamadas ao modelo ficam em
+main.generate_briefing_chunked.
+"""
+import contextvars
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Média para texto em português nos tokenizadores dos modelos Llama
+CHARS_PER_TOKEN = 3.5
+
+_MESSAGE_START = re.compile(
+    r"^\s*(?:\[[^\]\n]{1,40}\]\s*"                                          # [10:32] ou [12/03 10:32]
+    r"|\d{1,2}[/.-]\d{1,2}(?:[/.-]\d{2,4})?,?\s+\d{1,2}:\d{2}(?::\d{2})?\s*-?\s*)?"  # 12/03/2024 10:32 -
+    r"[^\s:][^:\n]{0,40}:\s"                                                 # Nome:
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+@dataclass(frozen=True)
+class ChunkingPolicy:
+    max_input_tokens: int = 8000
+    chunk_tokens: int = 6000
+    workers: int = 4
+    # Limite de tokens da resposta de cada briefing parcial
+    partial_max_tokens: int = 1000
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def needs_chunking(conversation, policy):
+    return estimate_tokens(conversation) > policy.max_input_tokens
+
+
+def split_messages(conversation):
+    """
+    Separa a conversa em mensagens; linhas sem remetente continuam a
+    mensagem anterior.
+    """
+    messages = []
+    current = []
+    for line in (conversation or "").splitlines():
+        if current and _MESSAGE_START.match(line):
+            messages.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        messages.append("\n".join(current))
+    return messages
+
+
+def _split_oversized(text, max_tokens):
+    """Divide uma mensagem grande demais em parágrafos, frases e, por fim, caracteres."""
+    for pattern in (re.compile(r"\n\s*\n"), _SENTENCE_END):
+        parts = [part for part in pattern.split(text) if part.strip()]
+        if len(parts) > 1:
+            pieces = []
+            for part in parts:
+                pieces.extend(_split_oversized(part, max_tokens) if estimate_tokens(part) > max_tokens else [part])
+            return pieces
+    size = max(int(max_tokens * CHARS_PER_TOKEN), 1)
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def pack(pieces, max_tokens, separator="\n"):
+    """
+    Agrupa pedaços consecutivos em blocos de até `max_tokens`.
+
+    Returns:
+        list: Listas de pedaços, na ordem original
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    separator_tokens = estimate_tokens(separator)
+    for piece in pieces:
+        tokens = estimate_tokens(piece) + separator_tokens
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def split_conversation(conversation, max_tokens):
+    """
+    Divide a conversa em trechos de até `max_tokens`, sem cortar mensagens
+    (a não ser as que sozinhas passam do limite).
+    """
+    pieces = []
+    for message in split_messages(conversation):
+        if estimate_tokens(message) > max_tokens:
+            pieces.extend(_split_oversized(message, max_tokens))
+        else:
+            pieces.append(message)
+    return ["\n".join(group) for group in pack(pieces, max_tokens)]
+
+
+def compact_partial(briefing):
+    """Remove do briefing parcial os campos vazios, que só ocupariam tokens no reduce."""
+    if isinstance(briefing, dict):
+        compact = {key: compact_partial(value) for key, value in briefing.items()}
+        return {key: value for key, value in compact.items() if value not in (None, "", [], {})}
+    if isinstance(briefing, list):
+        return [item for item in (compact_partial(item) for item in briefing) if item not in (None, "", [], {})]
+    return briefing
+
+
+# Pool compartilhado pelas gerações em trechos, para limitar as chamadas
+# simultâneas à API (separado do pool de batch.py, que chama generate_briefing)
+_executor = None
+
+
+def get_executor(workers):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="briefing-chunk")
+    return _executor
+
+
+def map_chunks(chunks, extract, policy):
+    """
+    Executa `extract(índice, trecho)` para cada trecho, em paralelo.
+
+    Returns:
+        list: Resultados na ordem dos trechos
+    """
+    executor = get_executor(policy.workers)
+    # Cada trecho roda numa cópia do contexto (requisição Flask, métricas)
+    futures = [
+        executor.submit(contextvars.copy_context().run, extract, index, chunk)
+        for index, chunk in enumerate(chunks)
+    ]
+    return [future.result() for future in futures]
+
+
+def create_chunking_from_env():
+    """
+    Orçamentos de tokens a partir das variáveis de ambiente:
+
+    BRIEFING_MAX_INPUT_TOKENS: acima disso, a conversa é dividida (8000)
+    BRIEFING_CHUNK_TOKENS: tamanho de cada trecho (6000)
+    BRIEFING_CHUNK_WORKERS: trechos processados em paralelo (4)
+    BRIEFING_PARTIAL_MAX_TOKENS: resposta de cada briefing parcial (1000)
+    """
+    return ChunkingPolicy(
+        max_input_tokens=int(os.getenv("BRIEFING_MAX_INPUT_TOKENS", "8000")),
+        chunk_tokens=int(os.getenv("BRIEFING_CHUNK_TOKENS", "6000")),
+        workers=int(os.getenv("BRIEFING_CHUNK_WORKERS", "4")),
+        partial_max_tokens=int(os.getenv("BRIEFING_PARTIAL_MAX_TOKENS", "1000")),
+    )
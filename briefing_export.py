@@ -0,0 +1,218 @@
+"""
+Exportação do histórico de briefings (/briefings/export).
+
+Os formatos são geradores sobre as linhas de briefing_store.iter_briefings:
+cada briefing é decodificado, escrito e descartado, e a saída sai em
+blocos de até CHUNK_SIZE bytes. A memória não cresce com o tamanho do
+histórico; no zip, só o diretório central (nome, CRC e tamanhos de cada
+arquivo, cerca de 1 KB por briefing) fica até o fim, porque o formato o
+grava depois do último arquivo.
+
+- jsonl: uma linha JSON por briefing (id, título, data, conversa e briefing)
+- csv: uma linha por briefing, com `prazos` e `orcamento` em colunas
+  próprias e as listas unidas por "; "
+- zip: um arquivo Markdown por briefing
+"""
+import csv
+import io
+import json
+import re
+import unicodedata
+import zipfile
+from datetime import datetime
+
+from briefing_model import decode_briefing_row
+
+CHUNK_SIZE = 64 * 1024
+
+CSV_COLUMNS = (
+    "id", "created_at", "titulo", "objetivo", "publico_alvo", "referencias",
+    "prazos_prazo_final", "prazos_etapas_intermediarias",
+    "orcamento_valor_total", "orcamento_descontos", "orcamento_valor_final",
+    "observacoes", "conversa",
+)
+
+LIST_SEPARATOR = "; "
+
+
+def _chunks(pieces, size=CHUNK_SIZE):
+    """Junta os pedaços (bytes) em blocos de até `size` bytes."""
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _record(briefing):
+    return {
+        "id": briefing.id,
+        "titulo": briefing.titulo,
+        "created_at": briefing.created_at,
+        "conversa": briefing.input_text,
+        "briefing": briefing.briefing_result.to_dict(),
+    }
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        line = json.dumps(_record(decode_briefing_row(row)), ensure_ascii=False)
+        yield (line + "\n").encode("utf-8")
+
+
+def csv_row(briefing):
+    result = briefing.briefing_result
+    return (
+        briefing.id,
+        briefing.created_at,
+        briefing.titulo,
+        result.objetivo,
+        result.publico_alvo,
+        LIST_SEPARATOR.join(result.referencias),
+        result.prazos.prazo_final,
+        LIST_SEPARATOR.join(result.prazos.etapas_intermediarias),
+        result.orcamento.valor_total,
+        result.orcamento.descontos,
+        result.orcamento.valor_final,
+        LIST_SEPARATOR.join(result.observacoes),
+        briefing.input_text,
+    )
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para o Excel abrir o arquivo como UTF-8 (acentos)
+    buffer.write("\ufeff")
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow(csv_row(decode_briefing_row(row)))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _money(value):
+    if value is None:
+        return "-"
+    return "R$ " + f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _created_at(value):
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).strftime("%d/%m/%Y %H:%M")
+    except ValueError:
+        return value or "-"
+
+
+def _bullets(items):
+    return "\n".join(f"- {item}" for item in items) if items else "-"
+
+
+def briefing_markdown(briefing):
+    result = briefing.briefing_result
+    prazos = result.prazos
+    orcamento = result.orcamento
+    etapas = "\n".join(f"  - {etapa}" for etapa in prazos.etapas_intermediarias) or "  -"
+    conversa = "\n".join(f"> {line}" if line else ">" for line in briefing.input_text.splitlines()) or "-"
+    return f"""# {briefing.titulo or 'Novo Briefing'}
+
+Criado em {_created_at(briefing.created_at)}
+
+## Objetivo
+
+{result.objetivo or '-'}
+
+## Público-Alvo
+
+{result.publico_alvo or '-'}
+
+## Referências
+
+{_bullets(result.referencias)}
+
+## Prazos
+
+- Prazo final: {prazos.prazo_final or '-'}
+- Etapas intermediárias:
+{etapas}
+
+## Orçamento
+
+- Valor total: {_money(orcamento.valor_total)}
+- Descontos: {_money(orcamento.descontos)}
+- Valor final: {_money(orcamento.valor_final)}
+
+## Observações
+
+{_bullets(result.observacoes)}
+
+## Texto Original
+
+{conversa}
+"""
+
+
+def markdown_filename(briefing):
+    """Nome do arquivo no zip: data, id (único) e o título sem acentos."""
+    title = unicodedata.normalize("NFKD", briefing.titulo or "briefing").encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")[:50] or "briefing"
+    return f"{str(briefing.created_at or '')[:10] or 'sem-data'}-{briefing.id}-{slug}.md"
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Destino do ZipFile que só acumula o que foi escrito desde a última leitura."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_chunks(rows):
+    # Sem seek, o ZipFile grava o tamanho de cada arquivo depois dos dados
+    # (data descriptor), e o arquivo pode sair enquanto é escrito
+    stream = _StreamBuffer()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for row in rows:
+            briefing = decode_briefing_row(row)
+            archive.writestr(markdown_filename(briefing), briefing_markdown(briefing))
+            yield stream.drain()
+    yield stream.drain()
+
+
+EXPORT_FORMATS = {
+    "jsonl": ("application/x-ndjson", "jsonl", jsonl_lines),
+    "csv": ("text/csv; charset=utf-8", "csv", csv_lines),
+    "zip": ("application/zip", "zip", zip_chunks),
+}
+
+
+def export_chunks(rows, export_format):
+    """
+    Blocos de bytes do arquivo exportado.
+
+    Args:
+        rows: Linhas da tabela briefings (iterável, lido uma vez)
+        export_format (str): jsonl, csv ou zip
+    """
+    _, _, writer = EXPORT_FORMATS[export_format]
+    return _chunks(piece for piece in writer(rows) if piece)
@@ -0,0 +1,336 @@
+"""
+Representação tipada dos briefings salvos.
+
+A coluna `conteudo` guarda {"input_text", "briefing_result"}, e linhas
+antigas podem ter o conteúdo (ou o briefing_result) gravado como texto JSON.
+`briefing_from_row` decodifica cada linha uma única vez, normaliza os tipos
+e memoriza o resultado por (id, created_at), já que as linhas salvas não
+são alteradas depois de criadas.
+
+Os objetos retornados são compartilhados entre requisições e, por isso,
+imutáveis (dataclasses congeladas, listas como tuplas).
+
+`summary_columns` extrai do briefing as colunas de resumo (titulo,
+prazo_final, prazo_final_data, valor_final), gravadas junto com a linha
+para que listagens e ordenações não precisem abrir o `conteudo`.
+"""
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+
+DECODE_CACHE_SIZE = 1024
+TITLE_MAX_LENGTH = 50
+
+
+@dataclass(frozen=True, slots=True)
+class Prazos:
+    prazo_final: str = None
+    etapas_intermediarias: tuple = ()
+
+    @property
+    def entrega_final(self):
+        # Nome usado pelos templates mais antigos
+        return self.prazo_final
+
+
+@dataclass(frozen=True, slots=True)
+class Orcamento:
+    valor_total: float = None
+    descontos: float = None
+    valor_final: float = None
+
+
+@dataclass(frozen=True, slots=True)
+class BriefingResult:
+    objetivo: str = None
+    publico_alvo: str = None
+    referencias: tuple = ()
+    prazos: Prazos = field(default_factory=Prazos)
+    orcamento: Orcamento = field(default_factory=Orcamento)
+    observacoes: tuple = ()
+
+    def to_dict(self):
+        return asdict(self, dict_factory=_dict_factory)
+
+
+@dataclass(frozen=True, slots=True)
+class Briefing:
+    id: int
+    user_id: str = None
+    titulo: str = None
+    created_at: str = None
+    input_text: str = ""
+    briefing_result: BriefingResult = field(default_factory=BriefingResult)
+
+    def to_dict(self):
+        return asdict(self, dict_factory=_dict_factory)
+
+
+def _dict_factory(items):
+    return {key: list(value) if isinstance(value, tuple) else value for key, value in items}
+
+
+def _load_json(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return {}
+    return value
+
+
+def _text(value):
+    if value is None:
+        return None
+    text = (value if isinstance(value, str) else str(value)).strip()
+    return text or None
+
+
+def _texts(value):
+    if isinstance(value, list):
+        texts = [_text(item) for item in value]
+        return tuple([text for text in texts if text])
+    text = _text(value)
+    return (text,) if text else ()
+
+
+_AMOUNT_PATTERN = re.compile(
+    r"^(?:r\$|brl)?\s*(?P<number>[-+]?\d[\d.,]*)\s*"
+    r"(?P<scale>mil|mi|milh(?:ão|ões|ao|oes))?\s*(?:de\s+)?(?:reais|real|brl)?$"
+)
+_PERCENT_PATTERN = re.compile(r"^(?P<number>[-+]?\d[\d.,]*)\s*%$")
+_THOUSANDS_DOTS = re.compile(r"^\d{1,3}(\.\d{3})+$")
+_SCALES = {"mil": 1_000}
+
+
+def _decimal(text):
+    """
+    Número com separadores no formato brasileiro ou americano. Sem vírgula,
+    pontos só são decimais se não formarem grupos de milhar ("5.000").
+    """
+    text = text.lstrip("+")
+    if "," in text and "." in text:
+        # O separador que aparece por último é o decimal
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif "," in text:
+        text = text.replace(",", "") if text.count(",") > 1 else text.replace(",", ".")
+    elif _THOUSANDS_DOTS.match(text.lstrip("-")):
+        text = text.replace(".", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _number(value):
+    """
+    Converte valores em reais para float. Valores que não são um único
+    montante ("a combinar", "5.000 a 8.000") ficam None.
+
+    >>> [_number(v) for v in (5000, "5000.50", "R$ 5.000,50", "R$ 5.000", "R$ 1.500.000")]
+    [5000.0, 5000.5, 5000.5, 5000.0, 1500000.0]
+    >>> [_number(v) for v in ("5.000 reais", "R$ 2,5 mil", "R$ 1,2 milhão", "10%", "a combinar")]
+    [5000.0, 2500.0, 1200000.0, None, None]
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _AMOUNT_PATTERN.match(str(value).strip().lower())
+    if not match:
+        return None
+    number = _decimal(match.group("number"))
+    scale = match.group("scale")
+    if number is None or not scale:
+        return number
+    return number * _SCALES.get(scale, 1_000_000)
+
+
+def _percent(value):
+    """
+    Percentual escrito como texto ("10%"), ou None.
+
+    >>> _percent("10%"), _percent("12,5 %"), _percent("R$ 10")
+    (10.0, 12.5, None)
+    """
+    match = _PERCENT_PATTERN.match(str(value).strip()) if isinstance(value, str) else None
+    return _decimal(match.group("number")) if match else None
+
+
+def _discount(value, valor_total):
+    """
+    Desconto em reais; um percentual ("10%") é aplicado ao valor total.
+
+    >>> _discount("10%", 5000.0), _discount("R$ 500", 5000.0), _discount("10%", None)
+    (500.0, 500.0, None)
+    """
+    percent = _percent(value)
+    if percent is None:
+        return _number(value)
+    if valor_total is None:
+        return None
+    return round(valor_total * percent / 100, 2)
+
+
+def _section(value, key):
+    """
+    Seção do briefing (prazos, orcamento) como dicionário. Um valor solto,
+    inclusive texto que não é JSON ("30 dias", "R$ 5.000"), vira `key`.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return value if isinstance(value, dict) else {key: value}
+
+
+def parse_briefing_result(data):
+    """
+    Normaliza o dicionário gerado pelo modelo em um BriefingResult.
+    Aceita o dicionário ou o texto JSON.
+    """
+    data = _load_json(data)
+    if not isinstance(data, dict):
+        return BriefingResult()
+
+    prazos = _section(data.get("prazos"), "prazo_final")
+    orcamento = _section(data.get("orcamento"), "valor_total")
+
+    valor_total = _number(orcamento.get("valor_total"))
+    return BriefingResult(
+        objetivo=_text(data.get("objetivo")),
+        publico_alvo=_text(data.get("publico_alvo")),
+        referencias=_texts(data.get("referencias")),
+        prazos=Prazos(
+            prazo_final=_text(prazos.get("prazo_final") or prazos.get("entrega_final")),
+            etapas_intermediarias=_texts(prazos.get("etapas_intermediarias")),
+        ),
+        orcamento=Orcamento(
+            valor_total=valor_total,
+            descontos=_discount(orcamento.get("descontos"), valor_total),
+            valor_final=_number(orcamento.get("valor_final")),
+        ),
+        observacoes=_texts(data.get("observacoes")),
+    )
+
+
+_DATE_PATTERNS = (
+    (re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"), ("year", "month", "day")),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), ("day", "month", "year")),
+)
+_RELATIVE_PATTERN = re.compile(r"\b(\d{1,4})\s*(dias?|semanas?|m[eê]s(?:es)?)\b", re.IGNORECASE)
+_RELATIVE_DAYS = {"d": 1, "s": 7, "m": 30}
+
+
+def parse_deadline(text, reference=None):
+    """
+    Converte o prazo final em data, quando possível: datas explícitas
+    (31/12/2024, 2024-12-31) ou prazos relativos ("30 dias", "2 semanas",
+    "3 meses"), contados a partir de `reference` (data de criação).
+    """
+    if not text:
+        return None
+    for pattern, order in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            parts = dict(zip(order, map(int, match.groups())))
+            try:
+                return date(parts["year"], parts["month"], parts["day"])
+            except ValueError:
+                return None
+    match = _RELATIVE_PATTERN.search(text)
+    if match:
+        reference = reference or datetime.now(timezone.utc).date()
+        return reference + timedelta(days=int(match.group(1)) * _RELATIVE_DAYS[match.group(2)[0].lower()])
+    return None
+
+
+def _reference_date(created_at):
+    if isinstance(created_at, str):
+        try:
+            return datetime.fromisoformat(created_at.replace("Z", "+00:00")).date()
+        except ValueError:
+            return None
+    if isinstance(created_at, datetime):
+        return created_at.date()
+    return None
+
+
+def summary_columns(input_text, briefing_result, created_at=None):
+    """
+    Colunas de resumo de um briefing, extraídas na gravação.
+
+    Returns:
+        dict: titulo, prazo_final, prazo_final_data (ISO) e valor_final
+    """
+    result = briefing_result if isinstance(briefing_result, BriefingResult) else parse_briefing_result(briefing_result)
+    input_text = input_text or ""
+
+    # O objetivo vira o título; sem ele, as primeiras palavras da conversa
+    titulo = result.objetivo
+    if not titulo:
+        titulo = input_text[:TITLE_MAX_LENGTH] + "..." if len(input_text) > TITLE_MAX_LENGTH else input_text
+
+    deadline = parse_deadline(result.prazos.prazo_final, _reference_date(created_at))
+    return {
+        "titulo": titulo or None,
+        "prazo_final": result.prazos.prazo_final,
+        "prazo_final_data": deadline.isoformat() if deadline else None,
+        "valor_final": result.orcamento.valor_final,
+    }
+
+
+def decode_briefing_row(row):
+    """
+    Converte uma linha da tabela briefings em Briefing, sem memorização.
+    """
+    conteudo = _load_json(row.get("conteudo"))
+    if not isinstance(conteudo, dict):
+        conteudo = {}
+    return Briefing(
+        id=row.get("id"),
+        user_id=row.get("user_id"),
+        titulo=row.get("titulo"),
+        created_at=row.get("created_at"),
+        input_text=conteudo.get("input_text") or "",
+        briefing_result=parse_briefing_result(conteudo.get("briefing_result")),
+    )
+
+
+_decoded = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def briefing_from_row(row):
+    """
+    Versão memorizada de `decode_briefing_row`, por (id, created_at).
+    Linhas sem id (ainda não salvas) não são memorizadas.
+    """
+    if row.get("id") is None:
+        return decode_briefing_row(row)
+
+    key = (row["id"], row.get("created_at"))
+    with _decoded_lock:
+        briefing = _decoded.get(key)
+        if briefing is not None:
+            _decoded.move_to_end(key)
+            return briefing
+
+    briefing = decode_briefing_row(row)
+    with _decoded_lock:
+        _decoded[key] = briefing
+        while len(_decoded) > DECODE_CACHE_SIZE:
+            _decoded.popitem(last=False)
+    return briefing
+
+
+def clear_decode_cache():
+    with _decoded_lock:
+        _decoded.clear()
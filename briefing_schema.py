@@ -0,0 +1,343 @@
+"""
+Saída estruturada do modelo.
+
+- BRIEFING_SCHEMA (JSON Schema) descreve o briefing. É enviado à API no modo
+  json_schema e compilado aqui (`compile_schema`) em uma função de validação
+  que devolve os caminhos dos campos ausentes ou inválidos
+  ("prazos.prazo_final").
+- `extract_json` encontra o objeto na resposta, mesmo entre marcadores
+  markdown ou com texto em volta, e `repair_json` corrige o JSON quase
+  válido: vírgulas sobrando, aspas tipográficas, quebras de linha dentro de
+  strings, True/False/None e resposta cortada no meio (max_tokens).
+- `parse_model_output` junta as duas etapas e ajusta tipos simples (texto no
+  lugar de lista, prazo como texto), para que só os campos realmente
+  ausentes precisem ser pedidos de novo ao modelo (ver
+  main.structure_briefing_output).
+"""
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+_TEXT = {"type": "string", "minLength": 1}
+_TEXTS = {"type": "array"}
+_AMOUNT = {"type": ["number", "string"]}
+
+BRIEFING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "objetivo": _TEXT,
+        "publico_alvo": _TEXT,
+        "referencias": _TEXTS,
+        "prazos": {
+            "type": "object",
+            "properties": {
+                "prazo_final": _TEXT,
+                "etapas_intermediarias": _TEXTS,
+            },
+            "required": ["prazo_final", "etapas_intermediarias"],
+        },
+        "orcamento": {
+            "type": "object",
+            "properties": {
+                "valor_total": _AMOUNT,
+                "descontos": _AMOUNT,
+                "valor_final": _AMOUNT,
+            },
+            "required": ["valor_total", "descontos", "valor_final"],
+        },
+        "observacoes": _TEXTS,
+    },
+    "required": ["objetivo", "publico_alvo", "referencias", "prazos", "orcamento", "observacoes"],
+}
+
+# Listas que o modelo às vezes devolve como um único texto
+LIST_FIELDS = ("referencias", "observacoes", "prazos.etapas_intermediarias")
+MAX_REPAIR_CUTS = 20
+
+_PYTHON_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+
+
+def compile_schema(schema, path=""):
+    """
+    Compila o subconjunto de JSON Schema usado em BRIEFING_SCHEMA (type,
+    properties, required, minLength) em uma função `validar(valor)` que
+    retorna a lista de caminhos inválidos. O esquema é percorrido uma única
+    vez, na compilação.
+    """
+    names = schema.get("type")
+    names = [names] if isinstance(names, str) else list(names or [])
+    types = tuple(python_type for name in names for python_type in _PYTHON_TYPES[name])
+    accepts_bool = "boolean" in names
+    min_length = schema.get("minLength")
+    properties = {
+        name: compile_schema(subschema, f"{path}.{name}" if path else name)
+        for name, subschema in schema.get("properties", {}).items()
+    }
+    required = tuple(schema.get("required", ()))
+
+    def validate(value):
+        if types and (not isinstance(value, types) or (isinstance(value, bool) and not accepts_bool)):
+            return [path]
+        if min_length is not None and isinstance(value, str) and len(value.strip()) < min_length:
+            return [path]
+        if not isinstance(value, dict):
+            return []
+        errors = []
+        for name in required:
+            if value.get(name) is None:
+                errors.append(f"{path}.{name}" if path else name)
+        for name, validate_property in properties.items():
+            if value.get(name) is not None:
+                errors.extend(validate_property(value[name]))
+        return errors
+
+    return validate
+
+
+validate_briefing = compile_schema(BRIEFING_SCHEMA)
+
+
+def response_format(mode=None):
+    """
+    Parâmetro `response_format` da API para o modo de saída estruturada
+    (GROQ_RESPONSE_FORMAT): json_object (padrão), json_schema ou off.
+    """
+    mode = (mode or os.getenv("GROQ_RESPONSE_FORMAT", "json_object")).lower()
+    if mode == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "briefing", "schema": BRIEFING_SCHEMA}}
+    if mode == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _close(text):
+    """
+    Percorre o texto fora das strings normalizando o que o JSON não aceita e
+    fecha listas e objetos deixados abertos.
+
+    Returns:
+        tuple: (texto fechado, posição onde começa a string que o texto
+        deixou aberta, ou None)
+    """
+    out = []
+    stack = []
+    in_string = False
+    string_start = None
+    closers = ('"',)
+    escape = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char in closers:
+                in_string = False
+                char = '"'
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\t":
+                char = "\\t"
+            out.append(char)
+        elif char in ('"', "“", "”", "„"):
+            in_string = True
+            string_start = index
+            closers = ('"',) if char == '"' else ("”", "“", '"')
+            out.append('"')
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+        elif char in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+        elif char.isalpha():
+            word = re.match(r"\w+", text[index:]).group(0)
+            out.append(_LITERALS.get(word, word))
+            index += len(word)
+            continue
+        else:
+            out.append(char)
+        index += 1
+
+    if in_string:
+        return None, string_start
+    _strip_trailing_comma(out)
+    if out and out[-1].rstrip().endswith(":"):
+        out.append("null")
+    out.extend(reversed(stack))
+    return "".join(out), None
+
+
+def _strip_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text):
+    """
+    Tenta decodificar um JSON quase válido. Se o texto foi cortado no meio
+    de um membro, descarta o membro incompleto (até a vírgula anterior).
+    Uma string cortada nunca é aproveitada: o valor fica null (e o campo é
+    pedido de novo ao modelo) ou, se era a chave, o membro sai inteiro.
+
+    >>> repair_json('{"objetivo": "Site", "prazos": {"prazo_final": "30 di')
+    {'objetivo': 'Site', 'prazos': {'prazo_final': None}}
+    >>> repair_json('{"objetivo": "Site", "referencias": ["a", "b"], "publ')
+    {'objetivo': 'Site', 'referencias': ['a', 'b']}
+
+    Raises:
+        ValueError: se não houver como recuperar um objeto
+    """
+    for _ in range(MAX_REPAIR_CUTS):
+        closed, string_start = _close(text)
+        if string_start is not None:
+            text = text[:string_start]
+            continue
+        try:
+            return json.loads(closed)
+        except ValueError:
+            cut = text.rfind(",")
+            if cut <= 0:
+                break
+            text = text[:cut]
+    raise ValueError("Não foi possível reparar o JSON da resposta")
+
+
+def extract_json(text):
+    """
+    Encontra o objeto JSON na resposta do modelo.
+
+    Returns:
+        tuple: (objeto, reparado), onde `reparado` indica que o texto não
+        era um JSON válido como veio
+
+    Raises:
+        ValueError: se não houver objeto na resposta
+
+    >>> extract_json('{"objetivo": "Site", "publico_alvo": "Padarias",} Obrigado!')
+    ({'objetivo': 'Site', 'publico_alvo': 'Padarias'}, True)
+    """
+    text = text or ""
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value, False
+    except ValueError:
+        pass
+
+    fenced = _FENCE.search(text)
+    candidate = fenced.group(1) if fenced else text
+    start = candidate.find("{")
+    if start == -1:
+        raise ValueError("Nenhum objeto JSON na resposta")
+    end = candidate.rfind("}")
+    if end > start:
+        try:
+            value = json.loads(candidate[start:end + 1])
+            if isinstance(value, dict):
+                return value, True
+        except ValueError:
+            pass
+
+    # Até o último "}" (texto depois do objeto) ou até o fim (resposta
+    # cortada): vale a leitura que recuperar mais campos e, no empate, a
+    # que termina no último "}" (ordem fixa, sem depender do hash das strings)
+    repaired = []
+    bodies = (candidate[start:end + 1] if end > start else candidate[start:], candidate[start:])
+    for body in dict.fromkeys(bodies):
+        try:
+            value = repair_json(body)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            repaired.append(value)
+    if not repaired:
+        raise ValueError("A resposta não é um objeto JSON")
+    return max(repaired, key=len), True
+
+
+def _coerce(briefing):
+    """Ajusta tipos simples sem pedir nada ao modelo. Retorna se mudou algo."""
+    changed = False
+    if isinstance(briefing.get("prazos"), str):
+        briefing["prazos"] = {"prazo_final": briefing["prazos"], "etapas_intermediarias": []}
+        changed = True
+    if isinstance(briefing.get("orcamento"), (int, float, str)) and not isinstance(briefing.get("orcamento"), bool):
+        briefing["orcamento"] = {"valor_total": briefing["orcamento"], "descontos": 0, "valor_final": briefing["orcamento"]}
+        changed = True
+    for path in LIST_FIELDS:
+        parent, name = _parent(briefing, path)
+        if isinstance(parent, dict) and isinstance(parent.get(name), str):
+            parent[name] = [parent[name]] if parent[name].strip() else []
+            changed = True
+    return changed
+
+
+def _parent(data, path):
+    *parents, name = path.split(".")
+    for key in parents:
+        data = data.get(key) if isinstance(data, dict) else None
+    return data, name
+
+
+@dataclass
+class StructuredOutput:
+    briefing: dict = None
+    missing: list = field(default_factory=list)
+    repaired: bool = False
+
+
+def parse_model_output(content):
+    """
+    Extrai, repara e valida o briefing de uma resposta do modelo.
+    `briefing` é None quando nada pôde ser aproveitado.
+    """
+    try:
+        briefing, repaired = extract_json(content)
+    except ValueError:
+        return StructuredOutput()
+    repaired = _coerce(briefing) or repaired
+    return StructuredOutput(briefing, validate_briefing(briefing), repaired)
+
+
+def merge_fields(briefing, patch, paths):
+    """
+    Copia para o briefing os campos `paths` da resposta parcial do modelo,
+    aceitando a estrutura aninhada ({"prazos": {"prazo_final": ...}}) ou o
+    caminho como chave ({"prazos.prazo_final": ...}).
+    """
+    for path in paths:
+        if path in patch:
+            value = patch[path]
+        else:
+            source, name = _parent(patch, path)
+            if not isinstance(source, dict) or name not in source:
+                continue
+            value = source[name]
+        *parents, name = path.split(".")
+        target = briefing
+        for key in parents:
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            target = target[key]
+        target[name] = value
+    _coerce(briefing)
+    return briefing
@@ -0,0 +1,193 @@
+"""
+Busca textual no histórico de briefings de cada usuário (/briefings/search).
+
+Dois backends com a mesma interface:
+
+- SupabaseSearchBackend: função `search_briefings` no Postgres, chamada via
+  RPC (ver migrations/0004_briefings_search.sql). Ranking, trecho destacado
+  e paginação são feitos no banco, sobre o índice GIN de `search_vector`.
+- SQLiteSearchBackend: índice FTS5 em um arquivo local, para
+  desenvolvimento e testes sem a migração aplicada. É alimentado pela
+  aplicação a cada briefing salvo (`index_briefings`) e pode ser
+  reconstruído com `python manage.py reindex-search`.
+
+Os trechos destacados chegam com os termos entre ⟦ ⟧; `highlight_html`
+escapa o texto e troca os marcadores por <mark>.
+"""
+import os
+import re
+import sqlite3
+import threading
+
+from markupsafe import Markup, escape
+
+from briefing_model import decode_briefing_row
+
+HIGHLIGHT_START = "⟦"
+HIGHLIGHT_STOP = "⟧"
+MAX_QUERY_LENGTH = 200
+MAX_PAGE = 50
+
+# Colunas de cada resultado, as mesmas das listagens mais o ranking e o trecho
+RESULT_FIELDS = ("id", "titulo", "created_at", "prazo_final", "prazo_final_data", "valor_final", "rank", "headline")
+
+
+def highlight_html(text):
+    """
+    Converte um trecho destacado em HTML seguro: o texto é escapado e os
+    marcadores ⟦ ⟧ viram <mark>.
+    """
+    if not text:
+        return Markup("")
+    html = str(escape(text))
+    return Markup(html.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>"))
+
+
+def normalize_query(text):
+    return " ".join((text or "").split())[:MAX_QUERY_LENGTH]
+
+
+class SupabaseSearchBackend:
+    """Busca pela função search_briefings do Postgres (RPC do PostgREST)."""
+
+    def __init__(self, client_factory):
+        self.client_factory = client_factory
+
+    def search(self, user_id, query, limit, offset):
+        response = self.client_factory().rpc("search_briefings", {
+            "p_user_id": user_id,
+            "p_query": query,
+            "p_limit": limit,
+            "p_offset": offset,
+        }).execute()
+        return response.data or []
+
+    def index_briefings(self, rows):
+        # search_vector é uma coluna gerada: o Postgres indexa na gravação
+        pass
+
+    def remove_briefings(self, user_id, ids):
+        pass
+
+
+def _search_fields(row):
+    briefing = decode_briefing_row(row)
+    result = briefing.briefing_result
+    return (
+        briefing.titulo or "",
+        result.objetivo or "",
+        result.publico_alvo or "",
+        " ".join(result.observacoes),
+        briefing.input_text,
+    )
+
+
+class SQLiteSearchBackend:
+    """Índice FTS5 local, com o rowid igual ao id do briefing."""
+
+    # Pesos do bm25 por coluna, na ordem da tabela (menor pontuação = melhor)
+    WEIGHTS = (10.0, 10.0, 4.0, 4.0, 1.0)
+
+    def __init__(self, path):
+        # O arquivo só é aberto no primeiro uso
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS briefings_fts USING fts5("
+                " titulo, objetivo, publico_alvo, observacoes, input_text,"
+                " user_id UNINDEXED, created_at UNINDEXED, prazo_final UNINDEXED,"
+                " prazo_final_data UNINDEXED, valor_final UNINDEXED,"
+                " tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            self._local.conn = conn
+        return conn
+
+    def index_briefings(self, rows):
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            for row in rows:
+                conn.execute("DELETE FROM briefings_fts WHERE rowid = ?", (row["id"],))
+                conn.execute(
+                    "INSERT INTO briefings_fts (rowid, titulo, objetivo, publico_alvo, observacoes, input_text,"
+                    " user_id, created_at, prazo_final, prazo_final_data, valor_final)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row["id"], *_search_fields(row), str(row.get("user_id")), row.get("created_at"),
+                     row.get("prazo_final"), row.get("prazo_final_data"), row.get("valor_final")),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove_briefings(self, user_id, ids):
+        conn = self._connect()
+        conn.executemany(
+            "DELETE FROM briefings_fts WHERE rowid = ? AND user_id = ?",
+            [(int(briefing_id), str(user_id)) for briefing_id in ids],
+        )
+
+    @staticmethod
+    def match_expression(query):
+        # Cada palavra vira um termo entre aspas (todas obrigatórias), para
+        # que a sintaxe do FTS5 (NEAR, *, :, ^) não seja interpretada
+        terms = re.findall(r"\w+", query)
+        return " ".join(f'"{term}"' for term in terms)
+
+    def search(self, user_id, query, limit, offset):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        rows = self._connect().execute(
+            f"SELECT rowid, titulo, created_at, prazo_final, prazo_final_data, valor_final,"
+            f" -bm25(briefings_fts, {', '.join(map(str, self.WEIGHTS))}) AS score,"
+            f" snippet(briefings_fts, -1, ?, ?, ' … ', 24)"
+            f" FROM briefings_fts WHERE briefings_fts MATCH ? AND user_id = ?"
+            f" ORDER BY score DESC, created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+            (HIGHLIGHT_START, HIGHLIGHT_STOP, expression, str(user_id), limit, offset),
+        ).fetchall()
+        return [dict(zip(RESULT_FIELDS, row)) for row in rows]
+
+
+def search_briefings(backend, user_id, query, page=1, limit=20):
+    """
+    Busca uma página de resultados, do mais relevante para o menos relevante.
+
+    Returns:
+        dict: {"results": [...], "query": str, "page": int,
+               "next_page": int|None, "prev_page": int|None}
+    """
+    query = normalize_query(query)
+    page = max(1, min(page, MAX_PAGE))
+    if not query:
+        return {"results": [], "query": query, "page": 1, "next_page": None, "prev_page": None}
+
+    # Uma linha extra para saber se existe a próxima página
+    rows = backend.search(user_id, query, limit + 1, (page - 1) * limit)
+    has_more = len(rows) > limit
+    return {
+        "results": rows[:limit],
+        "query": query,
+        "page": page,
+        "next_page": page + 1 if has_more and page < MAX_PAGE else None,
+        "prev_page": page - 1 if page > 1 else None,
+    }
+
+
+def create_search_from_env(client_factory):
+    """
+    Cria o backend de busca a partir das variáveis de ambiente:
+
+    SEARCH_BACKEND: supabase (padrão) ou sqlite
+    SEARCH_DB_PATH: arquivo do índice sqlite
+    """
+    backend_name = os.getenv("SEARCH_BACKEND", "supabase").lower()
+    if backend_name == "sqlite":
+        return SQLiteSearchBackend(os.getenv("SEARCH_DB_PATH", "search.sqlite3"))
+    return SupabaseSearchBackend(client_factory)
@@ -0,0 +1,292 @@
+import base64
+import hashlib
+import json
+
+from briefing_model import BriefingResult, parse_briefing_result
+from llm_cache import normalize_conversation
+
+# Colunas necessárias para as telas de listagem (/briefings e /history).
+# O campo `conteudo` (com a conversa original inteira) fica de fora; prazo e
+# valor vêm das colunas de resumo gravadas junto com o briefing.
+LIST_COLUMNS = "id,titulo,created_at,prazo_final,prazo_final_data,valor_final"
+
+# Colunas da tela de detalhe; `select *` traria também o search_vector
+DETAIL_COLUMNS = "id,user_id,titulo,conteudo,created_at,prazo_final,prazo_final_data,valor_final"
+
+# Colunas devolvidas pela gravação (o INSERT também evita trazer o search_vector)
+SAVED_COLUMNS = DETAIL_COLUMNS + ",idempotency_key"
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Exportação do histórico inteiro: linhas por consulta (o PostgREST do
+# Supabase devolve no máximo 1000 por padrão) e colunas lidas
+EXPORT_BATCH_SIZE = 500
+EXPORT_COLUMNS = "id,titulo,conteudo,created_at"
+
+# Exclusão em lote: ids por requisição e por comando DELETE (o filtro
+# `id=in.(...)` vai na URL, então cada comando leva no máximo DELETE_BATCH_SIZE)
+MAX_DELETE_IDS = 500
+DELETE_BATCH_SIZE = 200
+
+
+def encode_cursor(row):
+    """
+    Codifica a posição de um briefing na ordenação (created_at, id) como um
+    token opaco, seguro para uso em URLs.
+    """
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decodifica um token gerado por `encode_cursor`.
+
+    Returns:
+        tuple: (created_at, id), ou None se o token for inválido
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(created_at), row_id
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _quote(value):
+    # Valores com ":", "." ou "+" (timestamps) precisam de aspas nos filtros do PostgREST
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def _keyset_filter(query, cursor, op):
+    # O postgrest-py não tem helper para `or`, então o parâmetro é montado aqui:
+    # created_at < c OR (created_at = c AND id < i)
+    created_at, row_id = cursor
+    query.params = query.params.add(
+        "or",
+        f"(created_at.{op}.{_quote(created_at)},"
+        f"and(created_at.eq.{_quote(created_at)},id.{op}.{_quote(row_id)}))"
+    )
+    return query
+
+
+def _keyset_order(query, desc):
+    # Um único parâmetro `order` com as duas colunas do cursor
+    direction = "desc" if desc else "asc"
+    query.params = query.params.add("order", f"created_at.{direction},id.{direction}")
+    return query
+
+
+def list_briefings_page(client, user_id, after=None, before=None, limit=DEFAULT_PAGE_SIZE, columns=LIST_COLUMNS):
+    """
+    Busca uma página de briefings do usuário usando paginação por cursor
+    (keyset) sobre (created_at, id), do mais recente para o mais antigo.
+
+    Args:
+        client: Cliente Supabase
+        user_id (str): ID do usuário dono dos briefings
+        after (str): Cursor da última linha da página anterior (avançar)
+        before (str): Cursor da primeira linha da página seguinte (voltar)
+        limit (int): Quantidade máxima de briefings na página
+        columns (str): Colunas selecionadas
+
+    Returns:
+        dict: {"briefings": [...], "next_cursor": str|None, "prev_cursor": str|None}
+    """
+    limit = parse_page_size(limit)
+    after_cursor = decode_cursor(after)
+    before_cursor = decode_cursor(before) if not after_cursor else None
+    backwards = before_cursor is not None
+
+    query = client.table("briefings").select(columns).eq("user_id", user_id)
+    if after_cursor:
+        query = _keyset_filter(query, after_cursor, "lt")
+    elif backwards:
+        query = _keyset_filter(query, before_cursor, "gt")
+
+    # Busca uma linha extra para saber se existe outra página na mesma direção
+    query = _keyset_order(query, desc=not backwards)
+    rows = query.limit(limit + 1).execute().data or []
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = None
+    prev_cursor = None
+    if rows:
+        if backwards:
+            next_cursor = encode_cursor(rows[-1])
+            prev_cursor = encode_cursor(rows[0]) if has_more else None
+        else:
+            next_cursor = encode_cursor(rows[-1]) if has_more else None
+            prev_cursor = encode_cursor(rows[0]) if after_cursor else None
+
+    return {
+        "briefings": rows,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+def iter_briefings(client, user_id, batch_size=EXPORT_BATCH_SIZE, columns=EXPORT_COLUMNS):
+    """
+    Percorre todos os briefings do usuário, do mais antigo ao mais recente,
+    em consultas de `batch_size` linhas com paginação por cursor (keyset)
+    sobre (created_at, id): só uma página fica em memória por vez, e cada
+    consulta usa o índice da listagem, qualquer que seja a profundidade.
+
+    `columns` precisa incluir id e created_at (o cursor).
+    """
+    cursor = None
+    while True:
+        query = client.table("briefings").select(columns).eq("user_id", user_id)
+        if cursor:
+            query = _keyset_filter(query, cursor, "gt")
+        rows = _keyset_order(query, desc=False).limit(batch_size).execute().data or []
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+def parse_briefing_ids(values):
+    """
+    Converte os ids recebidos (formulário ou JSON) em inteiros únicos, na
+    ordem recebida. Valores inválidos são ignorados.
+    """
+    ids = []
+    for value in values or []:
+        try:
+            briefing_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if briefing_id not in ids:
+            ids.append(briefing_id)
+    return ids
+
+
+def delete_briefings(client, user_id, ids):
+    """
+    Exclui os briefings do usuário com um único comando filtrado por id e
+    user_id, sem consulta prévia: a verificação de dono é o próprio filtro.
+    Só o id das linhas excluídas volta na resposta.
+
+    Returns:
+        list: ids efetivamente excluídos (ids de outros usuários ou
+        inexistentes ficam de fora)
+    """
+    deleted = []
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        batch = ids[start:start + DELETE_BATCH_SIZE]
+        query = client.table("briefings").delete().eq("user_id", user_id).in_("id", batch)
+        query.params = query.params.add("select", "id")
+        rows = query.execute().data or []
+        deleted.extend(row["id"] for row in rows)
+    return deleted
+
+
+def idempotency_key(conversation, briefing_result, client_key=None):
+    """
+    Chave de idempotência gravada com o briefing (única por usuário).
+
+    Com `client_key` (cabeçalho Idempotency-Key), a chave é derivada dele:
+    a mesma requisição repetida, ou o "Salvar" da mesma geração, cai na
+    mesma linha. Sem ele, a chave é o hash do conteúdo: a conversa
+    normalizada e o briefing normalizado por briefing_model, que ignora
+    campos extras como `id` e `texto_original`.
+    """
+    if client_key:
+        material = "client\0" + client_key
+    else:
+        if not isinstance(briefing_result, BriefingResult):
+            briefing_result = parse_briefing_result(briefing_result)
+        material = "content\0" + json.dumps(
+            {
+                "conversation": normalize_conversation(conversation),
+                "briefing": briefing_result.to_dict(),
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def parse_client_key(value):
+    """
+    Valida a chave enviada pelo cliente; chaves vazias ou longas demais são ignoradas.
+    """
+    value = (value or "").strip()
+    if not value or len(value) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return None
+    return value
+
+
+def _unique_by_key(rows):
+    # Um INSERT ... ON CONFLICT não pode tocar a mesma chave duas vezes
+    unique = {}
+    for row in rows:
+        unique.setdefault(row["idempotency_key"], row)
+    return unique
+
+
+def _insert_query(client, rows):
+    query = client.table("briefings").upsert(rows, on_conflict="user_id,idempotency_key", ignore_duplicates=True)
+    query.params = query.params.add("select", SAVED_COLUMNS)
+    return query
+
+
+def _existing_query(client, user_id, keys):
+    return client.table("briefings").select(SAVED_COLUMNS).eq("user_id", user_id).in_("idempotency_key", keys)
+
+
+def _align(rows, saved):
+    return [saved.get(row["idempotency_key"]) for row in rows]
+
+
+def save_briefings(client, rows):
+    """
+    Grava briefings de um mesmo usuário sem duplicar: linhas cuja chave de
+    idempotência já existe não são regravadas (ON CONFLICT DO NOTHING), e a
+    linha existente é buscada pela chave, numa leitura só para as repetidas.
+
+    Args:
+        rows (list): Linhas montadas com `idempotency_key`
+
+    Returns:
+        list: A linha gravada (ou a já existente) para cada item, na mesma ordem
+    """
+    unique = _unique_by_key(rows)
+    inserted = _insert_query(client, list(unique.values())).execute().data or []
+    saved = {row["idempotency_key"]: row for row in inserted}
+    missing = [key for key in unique if key not in saved]
+    if missing:
+        existing = _existing_query(client, rows[0]["user_id"], missing).execute().data or []
+        saved.update((row["idempotency_key"], row) for row in existing)
+    return _align(rows, saved)
+
+
+async def async_save_briefings(client, rows):
+    """Versão assíncrona de `save_briefings`, para o cliente PostgREST assíncrono."""
+    unique = _unique_by_key(rows)
+    inserted = (await _insert_query(client, list(unique.values())).execute()).data or []
+    saved = {row["idempotency_key"]: row for row in inserted}
+    missing = [key for key in unique if key not in saved]
+    if missing:
+        existing = (await _existing_query(client, rows[0]["user_id"], missing).execute()).data or []
+        saved.update((row["idempotency_key"], row) for row in existing)
+    return _align(rows, saved)
@@ -0,0 +1,84 @@
+import json
+
+
+class BriefingFieldParser:
+    """
+    Parser incremental para o JSON do briefing retornado pelo modelo.
+
+    Recebe os pedaços de texto conforme chegam do streaming e devolve cada
+    campo de primeiro nível (`objetivo`, `publico_alvo`, `prazos`, ...) assim
+    que o valor dele estiver completo.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+
+    def feed(self, chunk):
+        """
+        Adiciona um pedaço de texto ao buffer.
+
+        Returns:
+            list: Pares (campo, valor) que ficaram completos com este pedaço
+        """
+        self.buffer += chunk
+        completed = []
+
+        while self._pos < len(self.buffer) and not self.done:
+            char = self.buffer[self._pos]
+
+            if not self._started:
+                # Ignorar qualquer texto (ex.: marcadores markdown) antes do objeto
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._close_member(self._pos))
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                completed.extend(self._close_member(self._pos))
+                self._member_start = self._pos + 1
+
+            self._pos += 1
+
+        return completed
+
+    def _close_member(self, end):
+        segment = self.buffer[self._member_start:end].strip()
+        if not segment:
+            return []
+        try:
+            member = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            return []
+        self.fields.update(member)
+        return list(member.items())
+
+
+def sse_event(event, data):
+    """
+    Formata um evento Server-Sent Events com payload JSON.
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
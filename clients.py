@@ -0,0 +1,295 @@
+import os
+import threading
+import time
+
+from metrics import gauge_lines, record_upstream_call, registry
+
+# Configuração do pool HTTP compartilhado pelos clientes das APIs externas.
+# Todos os valores podem ser sobrescritos por variáveis de ambiente.
+# httpx, groq e supabase só são importados quando um cliente é criado, para
+# não pesar no tempo de inicialização do processo.
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", "10"))
+
+_lock = threading.Lock()
+_groq_client = None
+_supabase_client = None
+_supabase_transport = None
+_async_groq_client = None
+_async_postgrest_client = None
+
+
+class UpstreamStats:
+    """
+    Contadores de reaproveitamento de conexões para uma API externa.
+
+    Cada requisição conta em `requests`; só as que abriram uma conexão TCP
+    nova (e fizeram o handshake TLS) contam em `connections`/`tls_handshakes`.
+    O tempo até a resposta de cada chamada vai para metrics.record_upstream_call.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._trace
+        request.extensions["autobrief_started"] = time.perf_counter()
+
+    def on_response(self, response):
+        started = response.request.extensions.get("autobrief_started")
+        if started is not None:
+            record_upstream_call(self.name, time.perf_counter() - started)
+
+    def _trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    async def on_request_async(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._trace_async
+        request.extensions["autobrief_started"] = time.perf_counter()
+
+    async def on_response_async(self, response):
+        self.on_response(response)
+
+    async def _trace_async(self, event_name, info):
+        self._trace(event_name, info)
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": reused,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else None,
+            }
+
+
+upstream_stats = {
+    "groq": UpstreamStats("groq"),
+    "supabase": UpstreamStats("supabase"),
+}
+
+
+def connection_stats():
+    """
+    Retorna as estatísticas de reaproveitamento de conexões por API externa.
+    """
+    return {name: stats.snapshot() for name, stats in upstream_stats.items()}
+
+
+def _connection_metrics():
+    snapshots = connection_stats()
+    lines = []
+    for field, documentation in (
+        ("requests", "Requisições feitas às APIs externas"),
+        ("connections", "Conexões TCP abertas para as APIs externas"),
+        ("tls_handshakes", "Handshakes TLS com as APIs externas"),
+    ):
+        lines.extend(gauge_lines(
+            f"autobrief_upstream_{field}_total",
+            documentation,
+            [({"upstream": name}, snapshot[field]) for name, snapshot in snapshots.items()],
+            metric_type="counter",
+        ))
+    return lines
+
+
+registry.add_collector(_connection_metrics)
+
+
+def _pool_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout(read_timeout):
+    import httpx
+
+    return httpx.Timeout(read_timeout, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def create_http_client(upstream, read_timeout, client_class=None, **kwargs):
+    """
+    Cria um cliente httpx com pool, keep-alive e timeouts configurados,
+    registrando as estatísticas de conexão em `upstream_stats[upstream]`.
+    """
+    import httpx
+
+    client_class = client_class or httpx.Client
+    stats = upstream_stats[upstream]
+    if issubclass(client_class, httpx.AsyncClient):
+        hooks = {"request": [stats.on_request_async], "response": [stats.on_response_async]}
+    else:
+        hooks = {"request": [stats.on_request], "response": [stats.on_response]}
+    return client_class(
+        limits=_pool_limits(),
+        timeout=_timeout(read_timeout),
+        event_hooks=hooks,
+        **kwargs,
+    )
+
+
+def get_groq_client():
+    """
+    Retorna o cliente Groq do processo, criado na primeira chamada e
+    compartilhado entre threads.
+    """
+    global _groq_client
+    if _groq_client is None:
+        with _lock:
+            if _groq_client is None:
+                import groq
+
+                groq_api_key = os.getenv("GROQ_API_KEY")
+                if not groq_api_key:
+                    raise ValueError("GROQ_API_KEY environment variable is not set")
+
+                _groq_client = groq.Groq(
+                    api_key=groq_api_key,
+                    timeout=_timeout(GROQ_READ_TIMEOUT),
+                    # Novas tentativas ficam com a política de llm_policy.py
+                    max_retries=0,
+                    http_client=create_http_client("groq", GROQ_READ_TIMEOUT),
+                )
+    return _groq_client
+
+
+def get_supabase_client():
+    """
+    Retorna o cliente Supabase do processo, com as chamadas REST passando por
+    um pool httpx compartilhado.
+    """
+    global _supabase_client
+    if _supabase_client is None:
+        with _lock:
+            if _supabase_client is None:
+                _supabase_client = _create_supabase_client()
+    return _supabase_client
+
+
+def _create_supabase_client():
+    import httpx
+    from postgrest import SyncPostgrestClient
+    from postgrest.utils import SyncClient
+    from supabase import Client
+    from supabase.lib.client_options import ClientOptions
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    if not supabase_url or not supabase_key:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+
+    # O pool de conexões fica no transporte, que é compartilhado por todas as
+    # sessões PostgREST criadas ao longo da vida do processo
+    global _supabase_transport
+    _supabase_transport = httpx.HTTPTransport(limits=_pool_limits())
+
+    class PooledPostgrestClient(SyncPostgrestClient):
+        def create_session(self, base_url, headers, timeout):
+            return create_http_client(
+                "supabase",
+                SUPABASE_READ_TIMEOUT,
+                client_class=SyncClient,
+                base_url=base_url,
+                headers=headers,
+                transport=_supabase_transport,
+            )
+
+    class PooledSupabaseClient(Client):
+        # O cliente Supabase recria o PostgREST a cada evento de autenticação;
+        # sobrescrever a fábrica mantém o pool configurado nesses casos também.
+        @staticmethod
+        def _init_postgrest_client(rest_url, headers, schema, timeout=SUPABASE_READ_TIMEOUT):
+            return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+
+    options = ClientOptions(postgrest_client_timeout=SUPABASE_READ_TIMEOUT)
+    return PooledSupabaseClient(supabase_url, supabase_key, options=options)
+
+
+def get_async_groq_client():
+    """
+    Versão assíncrona de `get_groq_client`, usada no modo ASGI (asgi.py).
+    Deve ser usada sempre a partir do mesmo event loop.
+    """
+    global _async_groq_client
+    if _async_groq_client is None:
+        with _lock:
+            if _async_groq_client is None:
+                import groq
+                import httpx
+
+                groq_api_key = os.getenv("GROQ_API_KEY")
+                if not groq_api_key:
+                    raise ValueError("GROQ_API_KEY environment variable is not set")
+
+                _async_groq_client = groq.AsyncGroq(
+                    api_key=groq_api_key,
+                    timeout=_timeout(GROQ_READ_TIMEOUT),
+                    # Novas tentativas ficam com a política de llm_policy.py
+                    max_retries=0,
+                    http_client=create_http_client("groq", GROQ_READ_TIMEOUT, client_class=httpx.AsyncClient),
+                )
+    return _async_groq_client
+
+
+def get_async_postgrest_client():
+    """
+    Cliente PostgREST assíncrono para a API REST do Supabase, usado no modo
+    ASGI. Autentica com a mesma chave do cliente síncrono.
+    """
+    global _async_postgrest_client
+    if _async_postgrest_client is None:
+        with _lock:
+            if _async_postgrest_client is None:
+                from postgrest import AsyncPostgrestClient
+                from postgrest.utils import AsyncClient
+
+                supabase_url = os.getenv("SUPABASE_URL")
+                supabase_key = os.getenv("SUPABASE_KEY")
+                if not supabase_url or not supabase_key:
+                    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+
+                class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+                    def create_session(self, base_url, headers, timeout):
+                        return create_http_client(
+                            "supabase",
+                            SUPABASE_READ_TIMEOUT,
+                            client_class=AsyncClient,
+                            base_url=base_url,
+                            headers=headers,
+                        )
+
+                client = PooledAsyncPostgrestClient(
+                    f"{supabase_url.rstrip('/')}/rest/v1",
+                    headers={
+                        "apiKey": supabase_key,
+                        "Authorization": f"Bearer {supabase_key}",
+                        "Accept": "application/json",
+                        "Content-Type": "application/json",
+                    },
+                )
+                _async_postgrest_client = client
+    return _async_postgrest_client
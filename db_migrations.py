@@ -0,0 +1,209 @@
+"""
+Migrações versionadas do banco (pasta migrations/).
+
+Cada arquivo `NNNN_nome.sql` é aplicado uma única vez, em ordem, dentro de
+uma transação, e registrado em `schema_migrations` com o checksum do
+conteúdo. Um arquivo já aplicado que foi alterado interrompe a execução.
+
+A conexão é direta com o Postgres (DATABASE_URL, a "connection string" do
+projeto Supabase), porque a API REST não executa DDL. Requer o pacote
+`psycopg`; `pgserver` é usado apenas pelo banco local de verificação.
+"""
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+FILENAME_PATTERN = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    sql: str
+
+    @property
+    def checksum(self):
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME_PATTERN.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            migrations.append(Migration(match.group(1), match.group(2), f.read()))
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"Versões de migração repetidas em {directory}")
+    return migrations
+
+
+def connect(database_url=None):
+    try:
+        import psycopg
+    except ImportError:
+        raise MigrationError("Instale o pacote psycopg para executar migrações: pip install 'psycopg[binary]'")
+
+    database_url = database_url or os.getenv("DATABASE_URL")
+    if not database_url:
+        raise MigrationError("Defina DATABASE_URL com a connection string do Postgres")
+    # Cada migração abre a própria transação (conn.transaction())
+    return psycopg.connect(database_url, autocommit=True)
+
+
+def ensure_migrations_table(conn):
+    with conn.transaction():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
+            )
+        """)
+
+
+def applied_migrations(conn):
+    """
+    Returns:
+        dict: {versão: checksum} das migrações já aplicadas
+    """
+    ensure_migrations_table(conn)
+    rows = conn.execute("SELECT version, checksum FROM schema_migrations").fetchall()
+    return dict(rows)
+
+
+def pending_migrations(conn, migrations=None):
+    migrations = load_migrations() if migrations is None else migrations
+    applied = applied_migrations(conn)
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is not None and checksum != migration.checksum:
+            raise MigrationError(
+                f"A migração {migration.version}_{migration.name} foi alterada depois de aplicada; "
+                "crie uma nova migração em vez de editar a antiga"
+            )
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def migrate(conn, migrations=None, log=print):
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação.
+
+    Returns:
+        list: Migrações aplicadas nesta execução
+    """
+    pending = pending_migrations(conn, migrations)
+    for migration in pending:
+        log(f"Aplicando {migration.version}_{migration.name}...")
+        with conn.transaction():
+            conn.execute(migration.sql)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum),
+            )
+    return pending
+
+
+# Consultas quentes da aplicação, como o PostgREST as executa
+# (ver briefing_store.list_briefings_page, as rotas de detalhe/exclusão e a
+# função search_briefings). O terceiro item indica se o índice precisa
+# entregar as linhas já ordenadas; a busca ordena pelo ranking.
+HOT_QUERIES = (
+    (
+        "listagem, primeira página",
+        "SELECT id, titulo, created_at FROM briefings WHERE user_id = %(user_id)s "
+        "ORDER BY created_at DESC, id DESC LIMIT 21",
+        True,
+    ),
+    (
+        "listagem, página seguinte",
+        "SELECT id, titulo, created_at FROM briefings WHERE user_id = %(user_id)s "
+        "AND (created_at < %(created_at)s OR (created_at = %(created_at)s AND id < %(id)s)) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21",
+        True,
+    ),
+    (
+        "detalhe por id",
+        "SELECT * FROM briefings WHERE id = %(id)s AND user_id = %(user_id)s",
+        True,
+    ),
+    (
+        "busca textual",
+        "SELECT id FROM briefings WHERE user_id = %(user_id)s "
+        "AND search_vector @@ websearch_to_tsquery('portuguese', %(query)s) "
+        "ORDER BY ts_rank_cd(search_vector, websearch_to_tsquery('portuguese', %(query)s)) DESC LIMIT 21",
+        False,
+    ),
+)
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def explain_hot_queries(conn, params):
+    """
+    Executa EXPLAIN nas consultas quentes e indica as que fazem leitura
+    sequencial da tabela briefings ou, nas listagens, precisam ordenar as
+    linhas (Sort): a paginação só é barata se o índice já entrega a ordem.
+
+    O planejador prefere leitura sequencial em tabelas pequenas mesmo com
+    índice; por isso a verificação desliga enable_seqscan: se ainda assim
+    houver Seq Scan, nenhum índice atende à consulta.
+
+    Returns:
+        list: [(descrição, ok, nós do plano)]
+    """
+    results = []
+    with conn.transaction():
+        conn.execute("SET LOCAL enable_seqscan = off")
+        for label, sql, ordered in HOT_QUERIES:
+            plan = conn.execute("EXPLAIN (FORMAT JSON) " + sql, params).fetchone()[0][0]["Plan"]
+            nodes = [
+                f"{node['Node Type']}" + (f" ({node['Index Name']})" if node.get("Index Name") else "")
+                for node in _plan_nodes(plan)
+            ]
+            slow = any(
+                (ordered and node["Node Type"] == "Sort")
+                or (node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "briefings")
+                for node in _plan_nodes(plan)
+            )
+            results.append((label, not slow, nodes))
+    return results
+
+
+# Objetos do Supabase referenciados pelas migrações (auth.users, auth.uid()),
+# criados apenas no banco local de verificação
+SUPABASE_AUTH_SHIM = """
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (id UUID PRIMARY KEY);
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS $$
+    SELECT NULLIF(current_setting('request.jwt.claim.sub', true), '')::uuid
+$$;
+"""
+
+
+def start_local_postgres(directory):
+    """
+    Inicia um Postgres local descartável (pacote pgserver) em `directory`
+    e retorna a URL de conexão.
+    """
+    try:
+        import pgserver
+    except ImportError:
+        raise MigrationError("Instale o pacote pgserver para usar o banco local: pip install pgserver")
+
+    server = pgserver.get_server(directory, cleanup_mode="stop")
+    return server.get_uri()
@@ -0,0 +1,223 @@
+"""
+Compressão e cabeçalhos de cache das respostas HTTP.
+
+- Compressão: respostas HTML, JSON, CSS, JS, SVG e texto acima de
+  COMPRESS_MIN_SIZE bytes saem com brotli (se o pacote `brotli` estiver
+  instalado e o navegador aceitar) ou gzip. Respostas streaming (SSE,
+  NDJSON) não são comprimidas, para não segurar os eventos em buffer.
+  Os arquivos estáticos são comprimidos uma vez por versão e reaproveitados.
+- Estáticos com impressão digital: url_for('static', filename='css/style.css')
+  gera /static/css/style.<hash>.css, com o hash do conteúdo do arquivo.
+  Essas URLs são servidas com `Cache-Control: public, max-age=31536000,
+  immutable`: o navegador não pede o arquivo de novo até o próximo deploy
+  que o altere, quando a URL muda. URLs sem hash continuam funcionando,
+  com revalidação (no-cache + ETag).
+- Páginas: respostas sem Cache-Control próprio recebem `private, no-cache`
+  quando há usuário logado (nunca ficam em caches compartilhados) e
+  `no-cache` nas demais; `Vary: Accept-Encoding` vai em toda resposta
+  comprimível e o Flask acrescenta `Vary: Cookie` quando a sessão é lida.
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+
+from flask import request, session
+
+from metrics import timed
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_FINGERPRINTED = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{12})(?P<ext>\.[A-Za-z0-9]+)$")
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def folder_digest(*folders):
+    """
+    Hash do conteúdo de todos os arquivos das pastas (caminho e bytes, em
+    ordem), igual em todos os processos do mesmo deploy.
+    """
+    digest = hashlib.sha256()
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, folder).encode("utf-8") + b"\0")
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class StaticFingerprints:
+    """
+    Hash do conteúdo de cada arquivo estático, calculado no primeiro uso e
+    recalculado se o arquivo mudar (mtime), e as versões comprimidas.
+    """
+
+    def __init__(self, folder, max_compressed=256):
+        self.folder = folder
+        self.max_compressed = max_compressed
+        self._digests = {}
+        self._compressed = {}
+        self._lock = threading.Lock()
+
+    def digest(self, filename):
+        path = os.path.join(self.folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._digests.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = _digest(f.read())
+        with self._lock:
+            self._digests[filename] = (mtime, digest)
+        return digest
+
+    def url_filename(self, filename):
+        digest = self.digest(filename)
+        if digest is None:
+            return filename
+        stem, ext = os.path.splitext(filename)
+        return f"{stem}.{digest}{ext}"
+
+    def resolve(self, filename):
+        """
+        Nome real do arquivo de uma URL com hash.
+
+        Returns:
+            tuple: (nome do arquivo, hash confere com o conteúdo atual)
+        """
+        match = _FINGERPRINTED.match(filename)
+        if match:
+            original = match.group("stem") + match.group("ext")
+            digest = self.digest(original)
+            if digest is not None:
+                return original, digest == match.group("digest")
+        return filename, False
+
+    def compressed(self, key, load, encoding, level):
+        """Versão comprimida de um estático; `load()` só é chamado na primeira vez."""
+        with self._lock:
+            body = self._compressed.get((key, encoding))
+        if body is None:
+            body = compress(load(), encoding, level)
+            with self._lock:
+                if len(self._compressed) >= self.max_compressed:
+                    self._compressed.clear()
+                self._compressed[(key, encoding)] = body
+        return body
+
+
+def choose_encoding(accept_encoding):
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def init_http_cache(app, min_size=1024, gzip_level=6, brotli_level=5, static_brotli_level=11):
+    """
+    Registra a compressão, os estáticos com impressão digital e os
+    cabeçalhos de cache na aplicação. Deve ser chamado depois de
+    metrics.instrument_app, para que o tempo de compressão (fase
+    `compress`) entre no Server-Timing.
+    """
+    fingerprints = StaticFingerprints(app.static_folder)
+    static_view = app.view_functions["static"]
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = fingerprints.url_filename(values["filename"])
+
+    def static(filename):
+        original, fingerprinted = fingerprints.resolve(filename)
+        response = static_view(filename=original)
+        # Arquivo de outra versão (deploy anterior) é servido, mas sem cache longo
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if fingerprinted else "public, no-cache"
+        return response
+
+    app.view_functions["static"] = static
+
+    @app.after_request
+    def compress_and_cache(response):
+        if "Cache-Control" not in response.headers:
+            if "_user_id" in session:
+                response.headers["Cache-Control"] = "private, no-cache"
+                response.vary.add("Cookie")
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+
+        # Os estáticos chegam como arquivo (streamed), mas têm tamanho conhecido
+        static = request.endpoint == "static"
+        if response.mimetype not in COMPRESSIBLE_TYPES or (response.is_streamed and not static):
+            return response
+        response.vary.add("Accept-Encoding")
+        if response.status_code != 200 or "Content-Encoding" in response.headers:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        response.direct_passthrough = False
+        size = response.content_length
+        if size is None:
+            size = len(response.get_data())
+        if size < min_size:
+            return response
+
+        with timed("compress"):
+            if static:
+                level = static_brotli_level if encoding == "br" else 9
+                body = fingerprints.compressed((request.path, response.get_etag()[0]), response.get_data, encoding, level)
+            else:
+                body = compress(response.get_data(), encoding, brotli_level if encoding == "br" else gzip_level)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        # O ETag forte identifica os bytes; comprimido, passa a fraco (como
+        # no nginx) e continua valendo para a revalidação dos estáticos
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return fingerprints
+
+
+def init_http_cache_from_env(app):
+    """
+    COMPRESS_MIN_SIZE: tamanho mínimo, em bytes, para comprimir (1024)
+    COMPRESS_LEVEL: nível do gzip nas respostas dinâmicas (6)
+    COMPRESS_BROTLI_LEVEL: qualidade do brotli nas respostas dinâmicas (5)
+    """
+    return init_http_cache(
+        app,
+        min_size=int(os.getenv("COMPRESS_MIN_SIZE", "1024")),
+        gzip_level=int(os.getenv("COMPRESS_LEVEL", "6")),
+        brotli_level=int(os.getenv("COMPRESS_BROTLI_LEVEL", "5")),
+    )
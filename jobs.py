@@ -0,0 +1,379 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger("autobrief.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+JOB_FIELDS = (
+    "id", "kind", "user_id", "payload", "status", "attempts",
+    "result", "error", "created_at", "updated_at", "run_after",
+)
+
+
+def new_job(kind, user_id, payload):
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "user_id": user_id,
+        "payload": payload,
+        "status": QUEUED,
+        "attempts": 0,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "run_after": now,
+    }
+
+
+class MemoryJobStore:
+    """Fila em memória do processo. Os jobs se perdem ao reiniciar."""
+
+    def __init__(self, max_finished=1000):
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def ready_users(self, now):
+        with self._lock:
+            return {
+                job["user_id"] for job in self._jobs.values()
+                if job["status"] == QUEUED and job["run_after"] <= now
+            }
+
+    def running_count(self, user_id):
+        with self._lock:
+            return sum(
+                1 for job in self._jobs.values()
+                if job["user_id"] == user_id and job["status"] == RUNNING
+            )
+
+    def claim(self, user_id, now):
+        with self._lock:
+            ready = [
+                job for job in self._jobs.values()
+                if job["user_id"] == user_id and job["status"] == QUEUED and job["run_after"] <= now
+            ]
+            if not ready:
+                return None
+            job = min(ready, key=lambda item: item["created_at"])
+            job.update(status=RUNNING, attempts=job["attempts"] + 1, updated_at=now)
+            return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields, updated_at=time.time())
+            if job["status"] in FINISHED_STATUSES:
+                # Manter apenas os jobs finalizados mais recentes
+                self._finished[job_id] = True
+                while len(self._finished) > self.max_finished:
+                    old_id, _ = self._finished.popitem(last=False)
+                    self._jobs.pop(old_id, None)
+
+
+class SQLiteJobStore:
+    """Fila persistente em SQLite, para desenvolvimento local."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " user_id TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " run_after REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after, user_id)")
+        # Jobs que estavam rodando quando o processo parou voltam para a fila
+        conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def add(self, job):
+        row = dict(job)
+        row["payload"] = json.dumps(job["payload"], ensure_ascii=False)
+        row["result"] = json.dumps(job["result"], ensure_ascii=False) if job["result"] is not None else None
+        self._connect().execute(
+            f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({', '.join('?' for _ in JOB_FIELDS)})",
+            [row[field] for field in JOB_FIELDS],
+        )
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def ready_users(self, now):
+        rows = self._connect().execute(
+            "SELECT DISTINCT user_id FROM jobs WHERE status = ? AND run_after <= ?", (QUEUED, now)
+        ).fetchall()
+        return {row["user_id"] for row in rows}
+
+    def running_count(self, user_id):
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS total FROM jobs WHERE user_id = ? AND status = ?", (user_id, RUNNING)
+        ).fetchone()
+        return row["total"]
+
+    def claim(self, user_id, now):
+        conn = self._connect()
+        with self._lock:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE user_id = ? AND status = ? AND run_after <= ?"
+                " ORDER BY created_at LIMIT 1",
+                (user_id, QUEUED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?"
+                " WHERE id = ? AND status = ?",
+                (RUNNING, now, row["id"], QUEUED),
+            )
+            if cursor.rowcount != 1:
+                return None
+        return self.get(row["id"])
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id]
+        )
+
+
+class JobQueue:
+    """
+    Fila de jobs com um pool fixo de threads de trabalho.
+
+    - Concorrência limitada: no máximo `workers` jobs rodando ao mesmo tempo,
+      e no máximo `per_user_limit` por usuário.
+    - Justiça entre usuários: a cada vaga, o próximo job vem do usuário com
+      jobs prontos que foi atendido há mais tempo (round-robin).
+    - Retentativas com backoff exponencial e jitter até `max_attempts`, só
+      para erros em que `retryable(erro)` é verdadeiro (transitórios, como
+      falhas de conexão e timeouts); os demais falham na primeira tentativa.
+    """
+
+    def __init__(self, store, workers=4, per_user_limit=2, max_attempts=3, backoff=2.0, poll_interval=1.0,
+                 retryable=None):
+        self.store = store
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.retryable = retryable or is_transient_error
+        self._handlers = {}
+        self._last_served = {}
+        self._threads = []
+        self._condition = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._started = False
+        self._stopping = False
+
+    def register(self, kind, handler):
+        """
+        Registra a função que executa jobs do tipo `kind`.
+        A função recebe (payload, user_id) e retorna um resultado serializável em JSON.
+        """
+        self._handlers[kind] = handler
+
+    def start(self):
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._started = False
+
+    def submit(self, kind, user_id, payload):
+        """
+        Enfileira um job e retorna o registro criado.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+        job = new_job(kind, user_id, payload)
+        self.store.add(job)
+        self.start()
+        with self._condition:
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """
+        Espera até `timeout` segundos o job terminar e retorna o estado atual.
+        """
+        deadline = time.time() + timeout
+        job = self.store.get(job_id)
+        while job and job["status"] not in FINISHED_STATUSES and time.time() < deadline:
+            with self._condition:
+                self._condition.wait(min(self.poll_interval, max(deadline - time.time(), 0)))
+            job = self.store.get(job_id)
+        return job
+
+    def _next_job(self):
+        with self._claim_lock:
+            now = time.time()
+            users = [
+                user_id for user_id in self.store.ready_users(now)
+                if self.store.running_count(user_id) < self.per_user_limit
+            ]
+            for user_id in sorted(users, key=lambda user: self._last_served.get(user, 0)):
+                job = self.store.claim(user_id, now)
+                if job:
+                    self._last_served[user_id] = now
+                    return job
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+            job = self._next_job()
+            if job is None:
+                with self._condition:
+                    if self._stopping:
+                        return
+                    self._condition.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        try:
+            handler = self._handlers.get(job["kind"])
+            if handler is None:
+                # Job gravado por outra versão da aplicação: não há o que tentar de novo
+                raise ValueError(f"Tipo de job desconhecido: {job['kind']}")
+            result = handler(job["payload"], job["user_id"])
+            self.store.update(job["id"], status=SUCCEEDED, result=result, error=None)
+        except Exception as e:
+            logger.exception("Erro ao executar job %s (tentativa %s): %s", job['id'], job['attempts'], e)
+            if job["attempts"] < self.max_attempts and self.retryable(e):
+                delay = self.backoff * (2 ** (job["attempts"] - 1))
+                delay = delay * random.uniform(0.5, 1.5)
+                self.store.update(job["id"], status=QUEUED, error=str(e), run_after=time.time() + delay)
+            else:
+                self.store.update(job["id"], status=FAILED, error=str(e))
+        with self._condition:
+            self._condition.notify_all()
+
+
+def is_transient_error(error):
+    """
+    Critério padrão de retentativa: falhas de conexão e timeouts.
+    """
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def create_job_queue_from_env(production=False, retryable=None):
+    """
+    Cria a fila a partir das variáveis de ambiente:
+
+    JOB_STORE: memory (padrão) ou sqlite
+    JOB_DB_PATH: arquivo do store sqlite
+    JOB_WORKERS, JOB_PER_USER_LIMIT, JOB_MAX_ATTEMPTS, JOB_BACKOFF
+
+    O store em memória é de um processo só: com mais de uma instância (ou
+    em funções serverless, que congelam entre requisições), a consulta de
+    um job cai em outra instância e os workers param junto com a função.
+    Em produção ele é recusado e a fila fica desativada (retorna None);
+    use JOB_STORE=sqlite em um processo de longa duração.
+    """
+    backend = os.getenv("JOB_STORE", "memory").lower()
+    if backend == "sqlite":
+        store = SQLiteJobStore(os.getenv("JOB_DB_PATH", "jobs.sqlite3"))
+    elif production:
+        logger.warning("JOB_STORE=%s não é compartilhado entre instâncias; fila de jobs desativada em produção", backend)
+        return None
+    else:
+        store = MemoryJobStore()
+    return JobQueue(
+        store,
+        workers=int(os.getenv("JOB_WORKERS", "4")),
+        per_user_limit=int(os.getenv("JOB_PER_USER_LIMIT", "2")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+        backoff=float(os.getenv("JOB_BACKOFF", "2")),
+        retryable=retryable,
+    )
+
+
+def job_to_dict(job):
+    """
+    Representação pública de um job, usada nas respostas da API.
+    """
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
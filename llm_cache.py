@@ -0,0 +1,293 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger("autobrief.llm_cache")
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def normalize_conversation(text):
+    """
+    Normaliza o texto da conversa para que colagens quase idênticas
+    (espaços extras, quebras de linha diferentes, NBSP) gerem a mesma chave.
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\u00a0", " ")
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(conversation, model, prompt_version, params):
+    """
+    Chave endereçada por conteúdo: hash da conversa normalizada mais modelo,
+    versão do prompt e parâmetros de amostragem.
+    """
+    material = json.dumps(
+        {
+            "conversation": normalize_conversation(conversation),
+            "model": model,
+            "prompt_version": prompt_version,
+            "params": params,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """
+    LRU em memória, com TTL, limite de entradas e, opcionalmente, limite de
+    memória (`max_bytes`, somando o tamanho dos valores guardados).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        _, value = self._data.pop(key)
+        self.bytes -= len(value)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time() + self.ttl, value)
+            self.bytes += len(value)
+            while len(self._data) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def sweep(self):
+        """Remove as entradas expiradas (normalmente só saem quando lidas). Retorna quantas."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._data.items() if expires_at < now]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """Cache compartilhado entre processos em um arquivo SQLite local."""
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + self.ttl, now),
+        )
+        # Remover expirados e as entradas menos usadas acima do limite
+        conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def sweep(self):
+        return self._connect().execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def clear(self):
+        self._connect().execute("DELETE FROM llm_cache")
+
+
+class RedisBackend:
+    """Cache compartilhado em um servidor compatível com Redis."""
+
+    def __init__(self, url, ttl=DEFAULT_TTL, prefix="autobrief:llm:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class ResultCache:
+    """
+    Cache de resultados do LLM com contadores de acerto/erro.
+
+    Os valores são guardados serializados em JSON, então cada leitura devolve
+    uma cópia nova que pode ser modificada livremente pelo chamador.
+
+    Com `backend_factory`, o backend só é criado no primeiro uso.
+    """
+
+    def __init__(self, backend=None, backend_factory=None):
+        self._backend = backend
+        self._backend_factory = backend_factory
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend_factory is not None:
+            with self._lock:
+                if self._backend_factory is not None:
+                    self._backend = self._backend_factory()
+                    self._backend_factory = None
+        return self._backend
+
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, key):
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Erro ao ler cache do LLM: %s", e)
+            self._count("errors")
+            return None
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(value)
+
+    def set(self, key, value):
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, json.dumps(value, ensure_ascii=False))
+        except Exception as e:
+            logger.warning("Erro ao gravar cache do LLM: %s", e)
+            self._count("errors")
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def create_cache_from_env():
+    """
+    Cria o cache a partir das variáveis de ambiente:
+
+    LLM_CACHE_BACKEND: memory (padrão), sqlite, redis ou none
+    LLM_CACHE_TTL: validade das entradas em segundos
+    LLM_CACHE_MAX_ENTRIES: limite de entradas (memory e sqlite)
+    LLM_CACHE_PATH: arquivo do backend sqlite
+    LLM_CACHE_URL: URL do backend redis
+
+    O backend (arquivo SQLite, conexão Redis) só é aberto no primeiro uso.
+    """
+    backend_name = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL))
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+    if backend_name == "none":
+        return ResultCache(None)
+
+    def build_backend():
+        try:
+            if backend_name == "sqlite":
+                return SQLiteBackend(os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3"), ttl=ttl, max_entries=max_entries)
+            if backend_name == "redis":
+                return RedisBackend(os.getenv("LLM_CACHE_URL", "redis://localhost:6379/0"), ttl=ttl)
+            return MemoryBackend(max_entries=max_entries, ttl=ttl)
+        except Exception as e:
+            logger.warning("Erro ao configurar cache do LLM (%s), usando memória: %s", backend_name, e)
+            return MemoryBackend(max_entries=max_entries, ttl=ttl)
+
+    return ResultCache(backend_factory=build_backend)
@@ -0,0 +1,559 @@
+"""
+Política de chamadas à API Groq.
+
+Cada chamada ao modelo passa por:
+
+- Prazo por tentativa (`attempt_timeout`) e prazo total (`deadline`): uma
+  resposta lenta vira timeout e nova tentativa, em vez de prender o usuário
+  pelo timeout de leitura do cliente HTTP.
+- Novas tentativas com backoff exponencial e jitter para erros transitórios
+  (timeout, falha de conexão, 408, 409, 429 e 5xx). O Retry-After do 429 é
+  respeitado; se ele passa do prazo total, a chamada desiste na hora. Erros
+  do pedido (400, 401, 404, 422...) não são repetidos.
+- Requisição "hedged" opcional: se a resposta demora mais que o p95 recente
+  do modelo (ou um limite fixo), uma segunda requisição idêntica é enviada e
+  vale a que terminar primeiro.
+- Circuit breaker por modelo: depois de `breaker_failures` falhas
+  transitórias seguidas, as chamadas falham na hora durante `breaker_reset`
+  segundos; depois disso, uma única chamada de teste decide se o circuito
+  volta a fechar.
+- Modelo reserva opcional (menor e mais rápido), usado quando o principal
+  esgota as tentativas ou está com o circuito aberto. Com reserva, o
+  principal usa o prazo total menos um prazo de tentativa, que fica para a
+  reserva.
+
+Quando nenhum modelo responde, `LLMUnavailableError` é levantado; as rotas
+respondem 503 com Retry-After. O retry embutido do SDK da Groq fica
+desligado (max_retries=0 em clients.py) para as tentativas não se
+multiplicarem.
+
+Em streaming, só a abertura do stream é repetida: depois do primeiro token,
+uma falha chega ao navegador como evento de erro.
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from metrics import LLM_ATTEMPTS, LLM_FALLBACKS, LLM_HEDGES, gauge_lines, registry
+
+logger = logging.getLogger("autobrief.llm_policy")
+
+RETRYABLE_STATUS = frozenset((408, 409, 429))
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WORKERS = int(os.getenv("GROQ_HEDGE_WORKERS", "32"))
+
+
+class LLMUnavailableError(Exception):
+    """Nenhum modelo respondeu dentro do prazo (ou todos com o circuito aberto)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, model, retry_after):
+        super().__init__(f"Circuito aberto para o modelo {model}")
+        self.model = model
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    attempt_timeout: float = 20.0
+    deadline: float = 45.0
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    # None (desligado), um percentil ("p95") ou um limite fixo em segundos
+    hedge_after: object = None
+    fallback_model: str = None
+    breaker_failures: int = 5
+    breaker_reset: float = 30.0
+
+
+def parse_hedge_after(value):
+    value = (value or "").strip().lower()
+    if value in ("", "0", "off", "none"):
+        return None
+    if re.fullmatch(r"p\d{1,2}", value):
+        return value
+    return float(value)
+
+
+@dataclass
+class CallResult:
+    response: object
+    model: str
+    attempts: int
+    # Tempo total da chamada, com novas tentativas e modelo reserva (em
+    # streaming, só até a abertura do stream)
+    seconds: float = 0.0
+
+
+class CircuitBreaker:
+    """
+    Circuito fechado (chamadas liberadas), aberto (falha na hora) ou
+    meio-aberto (uma chamada de teste por vez).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self):
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(self.reset_timeout - (self.clock() - self._opened_at), 0.0)
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            # Falhas de chamadas que começaram antes da abertura não prolongam o circuito aberto
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                logger.warning("Circuito aberto após %s falhas seguidas", self._failures)
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+
+    def release(self):
+        # A chamada terminou sem dizer nada sobre a saúde da API (erro do pedido)
+        with self._lock:
+            self._probing = False
+
+
+class LatencyTracker:
+    """Janela das últimas latências bem-sucedidas de um modelo."""
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent, min_samples=HEDGE_MIN_SAMPLES):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+        return ordered[index]
+
+
+def is_retryable(error):
+    """
+    Erros transitórios, que valem uma nova tentativa: timeout, falha de
+    conexão, 408, 409, 429 e 5xx.
+    """
+    if isinstance(error, TimeoutError):
+        return True
+    import groq
+
+    if isinstance(error, groq.APIConnectionError):
+        # Inclui groq.APITimeoutError
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def _outcome(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return str(status)
+    if isinstance(error, TimeoutError) or type(error).__name__ == "APITimeoutError":
+        return "timeout"
+    return "connection_error"
+
+
+def retry_after_seconds(error):
+    """
+    Espera pedida pela API (cabeçalhos retry-after-ms ou retry-after, em
+    segundos), ou None.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+class GroqCaller:
+    """
+    Executa chat.completions.create com a política de chamadas.
+
+    `client_factory` e `async_client_factory` retornam os clientes Groq
+    (ver clients.get_groq_client e clients.get_async_groq_client). O estado
+    (circuitos e latências) é por processo e compartilhado pelos dois modos.
+    """
+
+    def __init__(self, client_factory, async_client_factory=None, policy=None):
+        self.client_factory = client_factory
+        self.async_client_factory = async_client_factory
+        self.policy = policy or CallPolicy()
+        self._breakers = {}
+        self._latencies = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def breaker(self, model):
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(self.policy.breaker_failures, self.policy.breaker_reset)
+            return breaker
+
+    def latency(self, model):
+        with self._lock:
+            tracker = self._latencies.get(model)
+            if tracker is None:
+                tracker = self._latencies[model] = LatencyTracker()
+            return tracker
+
+    def breaker_states(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {model: breaker.state for model, breaker in breakers.items()}
+
+    def hedge_delay(self, model):
+        """Tempo de espera antes da requisição extra, ou None (sem hedging)."""
+        hedge_after = self.policy.hedge_after
+        if hedge_after is None:
+            return None
+        if isinstance(hedge_after, str):
+            return self.latency(model).percentile(int(hedge_after[1:]))
+        return float(hedge_after)
+
+    def backoff_delay(self, attempt, error=None):
+        # "Full jitter": uniforme entre zero e o teto exponencial
+        ceiling = min(self.policy.backoff_max, self.policy.backoff_base * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        retry_after = retry_after_seconds(error) if error is not None else None
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _plan(self, kwargs):
+        model = kwargs.pop("model")
+        models = [model]
+        if self.policy.fallback_model and self.policy.fallback_model != model:
+            models.append(self.policy.fallback_model)
+        return models
+
+    def _budget(self, models, index, deadline):
+        # Com reserva, o principal deixa um prazo de tentativa para ela
+        if index < len(models) - 1:
+            return deadline - min(self.policy.attempt_timeout, self.policy.deadline / 2)
+        return deadline
+
+    def _unavailable(self, models, errors):
+        retry_after = max(
+            (getattr(error, "retry_after", None) or retry_after_seconds(error) or 0 for error in errors),
+            default=0,
+        )
+        error = LLMUnavailableError(
+            "A API Groq está indisponível no momento; tente novamente em instantes",
+            retry_after=math.ceil(retry_after) or None,
+        )
+        logger.error("Modelos indisponíveis (%s): %s", ", ".join(models), errors[-1] if errors else "")
+        return error
+
+    def _retry_or_raise(self, model, attempt, error, deadline):
+        """
+        Registra a falha de uma tentativa e retorna a espera até a próxima,
+        ou None se não há próxima.
+        """
+        if not is_retryable(error):
+            self.breaker(model).release()
+            LLM_ATTEMPTS.inc(model=model, outcome="error")
+            raise error
+        self.breaker(model).record_failure()
+        LLM_ATTEMPTS.inc(model=model, outcome=_outcome(error))
+        logger.warning("Tentativa %s do modelo %s falhou: %s", attempt, model, error)
+        if attempt >= self.policy.max_attempts:
+            return None
+        delay = self.backoff_delay(attempt, error)
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    # Modo síncrono
+
+    def create(self, hedge=True, **kwargs):
+        """
+        Chama chat.completions.create com os mesmos argumentos, aplicando a
+        política. `hedge=False` desliga a requisição extra (streaming).
+
+        Returns:
+            CallResult: resposta, modelo que respondeu e número de tentativas
+        """
+        started = time.monotonic()
+        deadline = started + self.policy.deadline
+        models = self._plan(kwargs)
+        errors = []
+        for index, model in enumerate(models):
+            if index:
+                LLM_FALLBACKS.inc(model=models[0], fallback=model)
+                logger.warning("Usando o modelo reserva %s", model)
+            try:
+                result = self._call_model(model, kwargs, self._budget(models, index, deadline), hedge)
+                result.seconds = time.monotonic() - started
+                return result
+            except (CircuitOpenError, TimeoutError) as e:
+                errors.append(e)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                errors.append(e)
+        raise self._unavailable(models, errors) from errors[-1]
+
+    def _call_model(self, model, kwargs, deadline, hedge):
+        breaker = self.breaker(model)
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Prazo esgotado para o modelo {model}")
+            if not breaker.allow():
+                LLM_ATTEMPTS.inc(model=model, outcome="circuit_open")
+                raise CircuitOpenError(model, breaker.retry_after())
+
+            timeout = min(self.policy.attempt_timeout, remaining)
+            hedge_delay = self.hedge_delay(model) if hedge and breaker.state == CircuitBreaker.CLOSED else None
+            started = time.monotonic()
+            try:
+                if hedge_delay is not None and hedge_delay < timeout:
+                    response = self._hedged_request(model, kwargs, timeout, hedge_delay)
+                else:
+                    response = self._request(model, kwargs, timeout)
+            except Exception as e:
+                delay = self._retry_or_raise(model, attempt, e, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            LLM_ATTEMPTS.inc(model=model, outcome="ok")
+            if not kwargs.get("stream"):
+                self.latency(model).observe(time.monotonic() - started)
+            return CallResult(response, model, attempt)
+
+    def _request(self, model, kwargs, timeout):
+        return self.client_factory().chat.completions.create(model=model, timeout=timeout, **kwargs)
+
+    def _submit(self, model, kwargs, timeout):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        # Cada thread roda numa cópia do contexto (requisição Flask, métricas)
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._request, model, kwargs, timeout)
+
+    def _hedged_request(self, model, kwargs, timeout, hedge_delay):
+        started = time.monotonic()
+        primary = self._submit(model, kwargs, timeout)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        # A requisição que perder não é cancelada: termina no próprio timeout
+        hedged = self._submit(model, kwargs, timeout - hedge_delay)
+        pending = {primary, hedged}
+        error = None
+        while pending:
+            remaining = started + timeout - time.monotonic()
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    LLM_HEDGES.inc(model=model, winner="hedge" if future is hedged else "primary")
+                    return future.result()
+                error = future.exception()
+        LLM_HEDGES.inc(model=model, winner="none")
+        raise error or TimeoutError(f"Tempo esgotado na tentativa do modelo {model}")
+
+    # Modo assíncrono (asgi.py)
+
+    async def acreate(self, hedge=True, **kwargs):
+        """Versão assíncrona de `create`."""
+        started = time.monotonic()
+        deadline = started + self.policy.deadline
+        models = self._plan(kwargs)
+        errors = []
+        for index, model in enumerate(models):
+            if index:
+                LLM_FALLBACKS.inc(model=models[0], fallback=model)
+                logger.warning("Usando o modelo reserva %s", model)
+            try:
+                result = await self._acall_model(model, kwargs, self._budget(models, index, deadline), hedge)
+                result.seconds = time.monotonic() - started
+                return result
+            except (CircuitOpenError, TimeoutError) as e:
+                errors.append(e)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                errors.append(e)
+        raise self._unavailable(models, errors) from errors[-1]
+
+    async def _acall_model(self, model, kwargs, deadline, hedge):
+        breaker = self.breaker(model)
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Prazo esgotado para o modelo {model}")
+            if not breaker.allow():
+                LLM_ATTEMPTS.inc(model=model, outcome="circuit_open")
+                raise CircuitOpenError(model, breaker.retry_after())
+
+            timeout = min(self.policy.attempt_timeout, remaining)
+            hedge_delay = self.hedge_delay(model) if hedge and breaker.state == CircuitBreaker.CLOSED else None
+            started = time.monotonic()
+            try:
+                if hedge_delay is not None and hedge_delay < timeout:
+                    response = await self._ahedged_request(model, kwargs, timeout, hedge_delay)
+                else:
+                    response = await asyncio.wait_for(self._arequest(model, kwargs, timeout), timeout)
+            except Exception as e:
+                delay = self._retry_or_raise(model, attempt, e, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            LLM_ATTEMPTS.inc(model=model, outcome="ok")
+            if not kwargs.get("stream"):
+                self.latency(model).observe(time.monotonic() - started)
+            return CallResult(response, model, attempt)
+
+    async def _arequest(self, model, kwargs, timeout):
+        return await self.async_client_factory().chat.completions.create(model=model, timeout=timeout, **kwargs)
+
+    async def _ahedged_request(self, model, kwargs, timeout, hedge_delay):
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._arequest(model, kwargs, timeout))
+        done, _ = await asyncio.wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        hedged = asyncio.ensure_future(self._arequest(model, kwargs, timeout - hedge_delay))
+        pending = {primary, hedged}
+        error = None
+        try:
+            while pending:
+                remaining = started + timeout - time.monotonic()
+                done, pending = await asyncio.wait(pending, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.inc(model=model, winner="hedge" if task is hedged else "primary")
+                        return task.result()
+                    error = task.exception()
+        finally:
+            # No modo assíncrono a requisição perdedora é cancelada
+            for task in pending:
+                task.cancel()
+        LLM_HEDGES.inc(model=model, winner="none")
+        raise error or TimeoutError(f"Tempo esgotado na tentativa do modelo {model}")
+
+
+def create_policy_from_env():
+    """
+    Lê a política das variáveis de ambiente:
+
+    GROQ_ATTEMPT_TIMEOUT: prazo de cada tentativa, em segundos (20)
+    GROQ_DEADLINE: prazo total da chamada, com tentativas e reserva (45)
+    GROQ_MAX_ATTEMPTS: tentativas por modelo (3)
+    GROQ_BACKOFF_BASE, GROQ_BACKOFF_MAX: backoff exponencial (0.5, 8)
+    GROQ_HEDGE_AFTER: desligado (padrão), percentil ("p95") ou segundos
+    GROQ_FALLBACK_MODEL: modelo reserva (desligado por padrão)
+    GROQ_BREAKER_FAILURES, GROQ_BREAKER_RESET: circuit breaker (5, 30)
+    """
+    return CallPolicy(
+        attempt_timeout=float(os.getenv("GROQ_ATTEMPT_TIMEOUT", "20")),
+        deadline=float(os.getenv("GROQ_DEADLINE", "45")),
+        max_attempts=max(int(os.getenv("GROQ_MAX_ATTEMPTS", "3")), 1),
+        backoff_base=float(os.getenv("GROQ_BACKOFF_BASE", "0.5")),
+        backoff_max=float(os.getenv("GROQ_BACKOFF_MAX", "8")),
+        hedge_after=parse_hedge_after(os.getenv("GROQ_HEDGE_AFTER")),
+        fallback_model=os.getenv("GROQ_FALLBACK_MODEL") or None,
+        breaker_failures=int(os.getenv("GROQ_BREAKER_FAILURES", "5")),
+        breaker_reset=float(os.getenv("GROQ_BREAKER_RESET", "30")),
+    )
+
+
+def create_caller_from_env(client_factory, async_client_factory=None):
+    caller = GroqCaller(client_factory, async_client_factory, create_policy_from_env())
+
+    def breaker_metrics():
+        states = (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN)
+        return gauge_lines(
+            "autobrief_llm_circuit_state",
+            "Estado do circuit breaker por modelo (0 fechado, 1 meio-aberto, 2 aberto)",
+            [({"model": model}, states.index(state)) for model, state in caller.breaker_states().items()],
+        )
+
+    registry.add_collector(breaker_metrics)
+    return caller
@@ -0,0 +1,333 @@
+"""
+Contagem de tokens e uso do modelo por usuário e por dia.
+
+- TokenCounter conta tokens localmente. Com o tiktoken instalado, usa o
+  tokenizador BPE de TOKEN_ENCODING (o200k_base, o mais próximo do
+  vocabulário dos modelos Llama 3/4); sem ele, a estimativa por caracteres
+  de briefing_chunks. Mede os prompts registrados (prompts.py) e as
+  chamadas em que a API não informa o uso (streaming sem x_groq.usage).
+- UsageRecorder soma em memória as chamadas de cada (usuário, dia, modelo,
+  prompt) e grava os totais em segundo plano, a cada LLM_USAGE_FLUSH_INTERVAL
+  segundos: uma escrita por intervalo, e não uma por chamada ao modelo.
+- Dois backends com a mesma interface: Supabase (tabela llm_usage_daily,
+  somada pela função record_llm_usage via RPC; ver
+  migrations/0006_llm_usage.sql) e SQLite local, para desenvolvimento.
+
+Chamadas sem usuário (fora de uma requisição autenticada ou de um job)
+aparecem só nas métricas de /metrics.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import sqlite3
+import statistics
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from datetime import date, datetime, timedelta, timezone
+
+from briefing_chunks import estimate_tokens
+
+logger = logging.getLogger("autobrief.llm_usage")
+
+USAGE_FIELDS = (
+    "calls", "prompt_tokens", "completion_tokens", "cached_tokens",
+    "estimated_calls", "seconds", "max_seconds", "max_prompt_tokens",
+)
+
+
+class TokenCounter:
+    # Tokens de marcação de cada mensagem no formato de chat (papel e separadores)
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, encoding=None):
+        # O vocabulário só é carregado na primeira contagem: o tiktoken pode
+        # precisar baixá-lo, o que não pode acontecer na importação (cold start)
+        self.encoding = encoding
+        self._encoding = None
+        self._loaded = not encoding
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        """Vocabulário em uso; "estimate" enquanto nenhum foi carregado."""
+        return self.encoding if self._encoding is not None else "estimate"
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding)
+            except ImportError:
+                logger.info("tiktoken não instalado; contando tokens pela estimativa por caracteres")
+            except Exception as e:
+                # Sem acesso para baixar o vocabulário, por exemplo
+                logger.warning("Tokenizador %s indisponível (%s); usando a estimativa por caracteres", self.encoding, e)
+            self._loaded = True
+
+    def count(self, text):
+        if not text:
+            return 0
+        if not self._loaded:
+            self._load()
+        if self._encoding is None:
+            return estimate_tokens(text)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def count_messages(self, messages):
+        return sum(self.count(message.get("content")) + self.MESSAGE_OVERHEAD for message in messages or ())
+
+
+def create_token_counter_from_env():
+    """
+    TOKEN_ENCODING: vocabulário do tiktoken (o200k_base), ou "estimate"
+    para contar só pela estimativa por caracteres
+    """
+    encoding = os.getenv("TOKEN_ENCODING", "o200k_base")
+    return TokenCounter(None if encoding == "estimate" else encoding)
+
+
+# Usuário a quem as chamadas ao modelo são atribuídas fora de uma requisição
+# Flask (jobs, modo ASGI)
+_usage_user = contextvars.ContextVar("llm_usage_user", default=None)
+
+
+@contextmanager
+def usage_user(user_id):
+    token = _usage_user.set(user_id)
+    try:
+        yield
+    finally:
+        _usage_user.reset(token)
+
+
+def current_usage_user():
+    return _usage_user.get()
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    # Chamadas sem o uso informado pela API, contadas pelo TokenCounter
+    estimated_calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    max_prompt_tokens: int = 0
+
+    def add(self, other):
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.estimated_calls += other.estimated_calls
+        self.seconds += other.seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+        self.max_prompt_tokens = max(self.max_prompt_tokens, other.max_prompt_tokens)
+
+
+class UsageRecorder:
+    """
+    Acumula o uso por (usuário, dia, modelo, prompt) e grava no `store` em
+    uma thread de fundo. Se a gravação falhar, os totais voltam para a fila
+    e vão na próxima.
+    """
+
+    def __init__(self, store, flush_interval=10.0, max_pending=1000):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, user_id, model, prompt, prompt_tokens, completion_tokens, cached_tokens=0,
+               seconds=0.0, estimated=False, day=None):
+        if self.store is None or not user_id:
+            return
+        day = day or datetime.now(timezone.utc).date()
+        call = UsageTotals(
+            calls=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            estimated_calls=int(estimated),
+            seconds=seconds,
+            max_seconds=seconds,
+            max_prompt_tokens=prompt_tokens,
+        )
+        key = (str(user_id), day.isoformat(), model, prompt or "")
+        with self._lock:
+            self._pending.setdefault(key, UsageTotals()).add(call)
+            pending = len(self._pending)
+        self._start()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-usage", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Grava os totais acumulados. Retorna o número de linhas gravadas."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            rows = [
+                {"user_id": user_id, "day": day, "model": model, "prompt": prompt, **asdict(totals)}
+                for (user_id, day, model, prompt), totals in pending.items()
+            ]
+            try:
+                self.store.add(rows)
+            except Exception as e:
+                logger.warning("Erro ao gravar o uso do modelo (%s linhas): %s", len(rows), e)
+                with self._lock:
+                    for key, totals in pending.items():
+                        self._pending.setdefault(key, UsageTotals()).add(totals)
+                return 0
+            return len(rows)
+
+
+class SupabaseUsageStore:
+    """Tabela llm_usage_daily, somada no banco pela função record_llm_usage (RPC)."""
+
+    def __init__(self, client_factory):
+        self.client_factory = client_factory
+
+    def add(self, rows):
+        self.client_factory().rpc("record_llm_usage", {"p_rows": rows}).execute()
+
+    def daily(self, since, user_id=None):
+        query = self.client_factory().table("llm_usage_daily").select("*").gte("day", since.isoformat())
+        if user_id:
+            query = query.eq("user_id", user_id)
+        return query.order("day").execute().data or []
+
+
+class SQLiteUsageStore:
+    """Mesma tabela em um arquivo SQLite local (LLM_USAGE_BACKEND=sqlite)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_usage_daily ("
+                " user_id TEXT NOT NULL, day TEXT NOT NULL, model TEXT NOT NULL, prompt TEXT NOT NULL,"
+                " calls INTEGER NOT NULL, prompt_tokens INTEGER NOT NULL, completion_tokens INTEGER NOT NULL,"
+                " cached_tokens INTEGER NOT NULL, estimated_calls INTEGER NOT NULL,"
+                " seconds REAL NOT NULL, max_seconds REAL NOT NULL, max_prompt_tokens INTEGER NOT NULL,"
+                " PRIMARY KEY (user_id, day, model, prompt))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, rows):
+        columns = ("user_id", "day", "model", "prompt") + USAGE_FIELDS
+        updates = ", ".join(
+            f"{name} = MAX({name}, excluded.{name})" if name.startswith("max_") else f"{name} = {name} + excluded.{name}"
+            for name in USAGE_FIELDS
+        )
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO llm_usage_daily ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                f" ON CONFLICT (user_id, day, model, prompt) DO UPDATE SET {updates}",
+                [tuple(row[name] for name in columns) for row in rows],
+            )
+
+    def daily(self, since, user_id=None):
+        sql = "SELECT * FROM llm_usage_daily WHERE day >= ?"
+        params = [since.isoformat()]
+        if user_id:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        return [dict(row) for row in self._connect().execute(sql + " ORDER BY day", params)]
+
+
+def create_usage_from_env(client_factory):
+    """
+    Cria o registro de uso a partir das variáveis de ambiente:
+
+    LLM_USAGE_BACKEND: supabase (padrão), sqlite ou none
+    LLM_USAGE_DB_PATH: arquivo do backend sqlite
+    LLM_USAGE_FLUSH_INTERVAL: segundos entre as gravações (10)
+    """
+    backend_name = os.getenv("LLM_USAGE_BACKEND", "supabase").lower()
+    if backend_name == "none":
+        store = None
+    elif backend_name == "sqlite":
+        store = SQLiteUsageStore(os.getenv("LLM_USAGE_DB_PATH", "usage.sqlite3"))
+    else:
+        store = SupabaseUsageStore(client_factory)
+    return UsageRecorder(store, flush_interval=float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "10")))
+
+
+def summarize_usage(rows):
+    """
+    Soma as linhas de llm_usage_daily por (usuário, dia).
+
+    Returns:
+        dict: {(user_id, dia): UsageTotals}
+    """
+    names = {field.name for field in fields(UsageTotals)}
+    totals = {}
+    for row in rows:
+        values = UsageTotals(**{name: row.get(name) or 0 for name in names})
+        totals.setdefault((row["user_id"], str(row["day"])), UsageTotals()).add(values)
+    return totals
+
+
+def usage_outliers(totals, factor=3.0):
+    """
+    (usuário, dia) cujo custo ou latência passa de `factor` vezes a mediana
+    de todos: tokens no dia, tokens de prompt por chamada ou tempo médio
+    por chamada.
+
+    Returns:
+        dict: {(user_id, dia): [motivos]}
+    """
+    if not totals:
+        return {}
+    measures = {
+        "tokens no dia": lambda t: t.prompt_tokens + t.completion_tokens,
+        "prompt por chamada": lambda t: t.prompt_tokens / t.calls if t.calls else 0,
+        "tempo por chamada": lambda t: t.seconds / t.calls if t.calls else 0,
+    }
+    outliers = {}
+    for reason, measure in measures.items():
+        median = statistics.median(measure(t) for t in totals.values())
+        if median <= 0:
+            continue
+        for key, t in totals.items():
+            if measure(t) > factor * median:
+                outliers.setdefault(key, []).append(reason)
+    return outliers
+
+
+def usage_since(days):
+    return date.today() - timedelta(days=days - 1)
@@ -1,15 +1,37 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, make_response, stream_with_context, g, has_request_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from supabase import create_client, Client
-import groq
 import os
+import time
 from dotenv import load_dotenv
 import json
 from datetime import datetime, timedelta
-import requests
+from briefing_store import list_briefings_page, parse_page_size, delete_briefings, parse_briefing_ids, DEFAULT_PAGE_SIZE, DETAIL_COLUMNS, MAX_DELETE_IDS
+from briefing_store import idempotency_key, parse_client_key, save_briefings, iter_briefings
+from briefing_export import EXPORT_FORMATS, export_chunks
+from briefing_stream import BriefingFieldParser, sse_event
+from briefing_schema import merge_fields, parse_model_output, response_format
+from briefing_chunks import compact_partial, create_chunking_from_env, estimate_tokens, map_chunks, needs_chunking, pack, split_conversation
+from llm_cache import cache_key, create_cache_from_env
+from read_cache import create_read_cache_from_env, etag_for
+from clients import get_async_groq_client, get_groq_client, get_supabase_client, connection_stats
+from llm_policy import LLMUnavailableError, create_caller_from_env, is_retryable
+from jobs import create_job_queue_from_env, job_to_dict
+from batch import BATCH_SAVE_SIZE, parse_batch_items, run_batch
+from briefing_model import briefing_from_row, summary_columns
+from briefing_search import create_search_from_env, highlight_html, search_briefings
+from app_logging import configure_logging, get_logger
+from http_cache import folder_digest, init_http_cache_from_env
+from sessions import create_auth_cache_from_env, init_sessions_from_env, regenerate_session
+from metrics import instrument_app, registry, gauge_lines, record_llm_usage, record_structured_output, timed, usage_tokens
+from prompts import create_prompt_registry
+from llm_usage import create_token_counter_from_env, create_usage_from_env, current_usage_user, usage_user
 
 load_dotenv()
 
+# Logs: detalhados em desenvolvimento, enxutos em produção (ver app_logging.py)
+configure_logging(debug=os.getenv('ENVIRONMENT') != 'production')
+logger = get_logger()
+
 # Validar variáveis de ambiente necessárias
 required_env_vars = ['SUPABASE_URL', 'SUPABASE_KEY', 'GROQ_API_KEY']
 missing_vars = [var for var in required_env_vars if not os.getenv(var)]
@@ -27,7 +49,20 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.session_protection = 'strong'
 
-print(f"Login manager configurado com: login_view={login_manager.login_view}, session_protection={login_manager.session_protection}")
+# Cookie de sessão compacto ou sessão no servidor, e identificador da
+# sessão calculado uma vez por IP e User-Agent (ver sessions.py)
+session_interface = init_sessions_from_env(app, login_manager)
+
+# Usuário do Supabase por access token (ver sessions.AuthUserCache)
+auth_user_cache = create_auth_cache_from_env()
+
+# Tempo por rota e por fase (Server-Timing e /metrics)
+instrument_app(app)
+
+# Compressão, estáticos com impressão digital e Cache-Control (ver http_cache.py)
+init_http_cache_from_env(app)
+
+logger.debug("Login manager configurado com: login_view=%s, session_protection=%s", login_manager.login_view, login_manager.session_protection)
 
 # Adicionar filtro para formatar datas
 @app.template_filter('format_date')
@@ -41,36 +76,24 @@ def format_date(value):
             return value
     return value.strftime('%d/%m/%Y %H:%M')
 
-# Initialize Supabase client
-try:
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
-    
-    if not supabase_url or not supabase_key:
-        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
-    
-    supabase: Client = create_client(supabase_url, supabase_key)
-    print("Supabase client initialized successfully")
-except Exception as e:
-    print(f"Error initializing Supabase client: {str(e)}")
-    raise
+# O cliente Supabase é criado na primeira vez que uma rota precisa dele
+# (get_supabase_client, em clients.py); importar este módulo não abre conexões.
+# A verificação do schema fica em `python manage.py check-db`.
+supabase_url = os.getenv("SUPABASE_URL")
 
 # Detectar ambiente
 IS_PRODUCTION = os.getenv('ENVIRONMENT') == 'production'
 BASE_URL = 'https://autobriefapi.vercel.app' if IS_PRODUCTION else 'http://localhost:5000'
 
-# Configuração do Supabase Auth
-supabase_auth = supabase.auth
-
 # Configuração do Google OAuth
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 GOOGLE_REDIRECT_URI = os.getenv('GOOGLE_REDIRECT_URI', f'{BASE_URL}/auth/callback')
 
-print(f"Ambiente: {'Produção' if IS_PRODUCTION else 'Desenvolvimento'}")
-print(f"URL base: {BASE_URL}")
-print(f"Supabase URL: {supabase_url}")
-print(f"Google Redirect URI: {GOOGLE_REDIRECT_URI}")
+logger.debug("Ambiente: %s", 'Produção' if IS_PRODUCTION else 'Desenvolvimento')
+logger.debug("URL base: %s", BASE_URL)
+logger.debug("Supabase URL: %s", supabase_url)
+logger.debug("Google Redirect URI: %s", GOOGLE_REDIRECT_URI)
 
 # Configuração do Groq
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
@@ -97,6 +120,9 @@ def from_json(value):
             return value
     return value
 
+# Trechos destacados da busca (ver briefing_search.highlight_html)
+app.add_template_filter(highlight_html, 'highlight')
+
 class User(UserMixin):
     def __init__(self, id, email=None):
         self.id = id
@@ -114,57 +140,44 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    try:
-        # Verificar se o user_id está na sessão
-        if 'user_id' in session and session['user_id'] == user_id:
-            # Criar um usuário com o ID da sessão
-            return User(session['user_id'])
-        
-        # Se não estiver na sessão, tentar criar com o ID fornecido
-        if isinstance(user_id, str):
-            return User(user_id)
-    except Exception as e:
-        print(f"Error loading user: {str(e)}")
+    # O ID vem da sessão assinada; o email é lido da sessão só quando usado
+    if isinstance(user_id, str):
+        return User(user_id)
     return None
 
 @app.route('/')
 def index():
     try:
-        print("Accessing index route")
-        print(f"Environment variables present: SUPABASE_URL={bool(os.getenv('SUPABASE_URL'))}, SUPABASE_KEY={bool(os.getenv('SUPABASE_KEY'))}, GROQ_API_KEY={bool(os.getenv('GROQ_API_KEY'))}")
+        logger.debug("Accessing index route")
+        logger.debug("Environment variables present: SUPABASE_URL=%s, SUPABASE_KEY=%s, GROQ_API_KEY=%s", bool(os.getenv('SUPABASE_URL')), bool(os.getenv('SUPABASE_KEY')), bool(os.getenv('GROQ_API_KEY')))
         return render_template('index.html')
     except Exception as e:
-        print(f"Error in index route: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in index route: %s", e)
         return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
 @app.route('/login')
 def login():
-    print("Acessando rota de login")
-    print(f"Session antes do login: {session}")
-    print(f"Secret key configurada: {app.config['SECRET_KEY'] is not None}")
+    logger.debug("Acessando rota de login")
     
     # Verificar se há um token na URL (fragmento)
     if request.args.get('access_token'):
-        print("Token encontrado na URL")
+        logger.debug("Token encontrado na URL")
         return redirect(url_for('auth_callback', access_token=request.args.get('access_token')))
     
-    print("Renderizando página de login")
+    logger.debug("Renderizando página de login")
     return render_template('login.html')
 
 @app.route('/auth/google')
 def google_login():
     try:
-        print("Iniciando login com Google")
+        logger.debug("Iniciando login com Google")
         # Usar a URL de redirecionamento configurada
         redirect_url = GOOGLE_REDIRECT_URI
         
-        print(f"Redirect URL: {redirect_url}")
-        print(f"Supabase URL: {supabase_url}")
-        print(f"Session antes do login Google: {session}")
+        logger.debug("Redirect URL: %s", redirect_url)
+        logger.debug("Supabase URL: %s", supabase_url)
         
-        auth_url = supabase.auth.sign_in_with_oauth({
+        auth_url = get_supabase_client().auth.sign_in_with_oauth({
             "provider": "google",
             "options": {
                 "redirect_to": redirect_url,
@@ -174,111 +187,409 @@ def google_login():
                 }
             }
         })
-        print(f"URL de autenticação gerada: {auth_url.url}")
+        logger.debug("URL de autenticação gerada: %s", auth_url.url)
         return redirect(auth_url.url)
     except Exception as e:
-        print(f"Error during Google login: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error during Google login: %s", e)
         flash(f"Error during Google login: {str(e)}")
         return redirect(url_for('login'))
 
 @app.route('/auth/callback')
 def auth_callback():
     try:
-        print("\n=== Iniciando callback de autenticação ===")
-        print(f"Request args: {dict(request.args)}")
-        print(f"Request URL: {request.url}")
-        print(f"Request path: {request.path}")
-        print(f"Request base_url: {request.base_url}")
-        print(f"Session antes do callback: {session}")
+        logger.debug("=== Iniciando callback de autenticação ===")
+        logger.debug("Request args: %s", dict(request.args))
+        logger.debug("Request URL: %s", request.url)
+        logger.debug("Request path: %s", request.path)
+        logger.debug("Request base_url: %s", request.base_url)
         
         # Get the access token from the URL
         access_token = request.args.get('access_token')
         
         # Se não houver token nos argumentos, verificar se há um hash na URL
         if not access_token and '#' in request.url:
-            print("Token não encontrado nos argumentos, mas há um hash na URL")
-            print(f"URL completa: {request.url}")
+            logger.debug("Token não encontrado nos argumentos, mas há um hash na URL")
+            logger.debug("URL completa: %s", request.url)
             
             # O token está no fragmento da URL (após o #)
             # O Flask não consegue acessar o fragmento diretamente, então precisamos
             # usar um template para extrair o token com JavaScript
             return render_template('auth_callback.html')
         
-        print(f"Access token recebido: {access_token[:10] if access_token else 'None'}")
+        logger.debug("Access token recebido: %s", access_token[:10] if access_token else 'None')
         
         if not access_token:
-            print("Nenhum access token fornecido")
+            logger.warning("Nenhum access token fornecido")
             flash("No access token provided")
             return redirect(url_for('login'))
         
-        # Use the access token to get the user
+        # Use the access token to get the user; o mesmo token não volta ao
+        # Supabase enquanto estiver no cache
         try:
-            print("Tentando obter dados do usuário com o token")
-            user_data = supabase.auth.get_user(access_token)
-            print(f"Resposta do Supabase: {user_data}")
+            logger.debug("Tentando obter dados do usuário com o token")
+            
+            def load_auth_user():
+                user_data = get_supabase_client().auth.get_user(access_token)
+                if user_data and user_data.user:
+                    return {"id": str(user_data.user.id), "email": user_data.user.email}  # Garantir que o ID é uma string
+                return None
             
-            if user_data and user_data.user:
-                print("Dados do usuário obtidos com sucesso")
-                # Armazenar o email e ID na sessão
-                session['user_email'] = user_data.user.email
-                session['user_id'] = str(user_data.user.id)  # Garantir que o ID é uma string
+            auth_user = auth_user_cache.get_user(access_token, load_auth_user)
+            
+            if auth_user:
+                logger.debug("Dados do usuário obtidos com sucesso")
+                # Sessão nova a cada login: um id anterior não vira sessão autenticada
+                regenerate_session()
+                # Armazenar o email na sessão (o ID fica na chave do Flask-Login)
+                session['user_email'] = auth_user["email"]
                 
-                print(f"Email do usuário: {user_data.user.email}")
-                print(f"ID do usuário: {user_data.user.id}")
-                print(f"Session após armazenar dados: {session}")
+                logger.debug("ID do usuário: %s", auth_user["id"])
                 
                 # Criar o usuário com o ID e email
-                user = User(str(user_data.user.id), user_data.user.email)  # Garantir que o ID é uma string
+                user = User(auth_user["id"], auth_user["email"])
                 login_user(user)
                 
-                # Forçar a sessão a ser salva
-                session.modified = True
-                
-                print(f"Session após login: {session}")
-                print(f"Usuário autenticado: {current_user.is_authenticated}")
-                print(f"ID do usuário atual: {current_user.id}")
-                print("=== Fim do callback de autenticação ===\n")
+                logger.debug("Usuário autenticado: %s", current_user.is_authenticated)
+                logger.debug("ID do usuário atual: %s", current_user.id)
+                logger.debug("=== Fim do callback de autenticação ===")
                 
                 return redirect(url_for('index'))
             else:
-                print("Dados do usuário não encontrados na resposta")
+                logger.warning("Dados do usuário não encontrados na resposta")
                 flash("Failed to get user data")
                 return redirect(url_for('login'))
         except Exception as e:
-            print(f"Erro ao obter dados do usuário: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erro ao obter dados do usuário: %s", e)
             flash(f"Error getting user data: {str(e)}")
             return redirect(url_for('login'))
     except Exception as e:
-        print(f"Erro no callback de autenticação: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro no callback de autenticação: %s", e)
         flash(f"Error processing access token: {str(e)}")
         return redirect(url_for('login'))
 
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    print(f"User authenticated: {current_user.is_authenticated}")
-    print(f"User ID: {current_user.id}")
-    print(f"User email: {current_user.email}")
-    print(f"Session: {session}")
+    logger.debug("User authenticated: %s", current_user.is_authenticated)
+    logger.debug("User ID: %s", current_user.id)
+    logger.debug("User email: %s", current_user.email)
     return render_template('dashboard.html')
 
 @app.route('/logout')
 @login_required
 def logout():
     try:
-        supabase.auth.sign_out()
+        get_supabase_client().auth.sign_out()
+        # Limpa também o que não é do Flask-Login (user_email) e troca o id
+        regenerate_session()
         logout_user()
         return redirect(url_for('index'))
     except Exception as e:
         flash(f"Error during logout: {str(e)}")
         return redirect(url_for('index'))
 
+@app.route('/stats/upstreams')
+@login_required
+def upstream_stats():
+    # Reaproveitamento de conexões por API externa (Groq, Supabase)
+    return jsonify(connection_stats())
+
+@app.route('/metrics')
+def metrics():
+    # Formato de texto do Prometheus; protegido por token se METRICS_TOKEN estiver definido
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Configuração da geração de briefings
+BRIEFING_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+BRIEFING_SAMPLING = {
+    "temperature": 0.7,
+    "max_tokens": 2000,
+    "top_p": 1
+}
+
+# Prompts versionados, compilados uma vez na importação (ver prompts.py), e
+# uso do modelo por usuário e por dia (ver llm_usage.py)
+token_counter = create_token_counter_from_env()
+prompt_registry = create_prompt_registry(token_counter)
+registry.add_collector(prompt_registry.collect)
+BRIEFING_PROMPT = prompt_registry.get("briefing")
+CHUNK_PROMPT = prompt_registry.get("briefing_chunk")
+MERGE_PROMPT = prompt_registry.get("briefing_merge")
+MISSING_FIELDS_PROMPT = prompt_registry.get("missing_fields")
+usage_recorder = create_usage_from_env(get_supabase_client)
+
+# Conversas longas (ver briefing_chunks): um briefing parcial por trecho e
+# depois a combinação dos parciais
+briefing_chunking = create_chunking_from_env()
+
+# Saída estruturada (ver briefing_schema): modo JSON da API, reparo local do
+# JSON e novo pedido só dos campos que faltarem. O streaming não usa o modo
+# JSON da API e depende do reparo local.
+BRIEFING_RESPONSE_FORMAT = response_format()
+BRIEFING_OUTPUT_OPTIONS = {"response_format": BRIEFING_RESPONSE_FORMAT} if BRIEFING_RESPONSE_FORMAT else {}
+MISSING_FIELDS_MAX_TOKENS = 800
+
+# Cache de resultados do LLM (ver llm_cache.create_cache_from_env)
+briefing_cache = create_cache_from_env()
+
+def briefing_cache_metrics():
+    stats = briefing_cache.stats()
+    return gauge_lines(
+        "autobrief_llm_cache_lookups_total",
+        "Consultas ao cache de resultados do LLM",
+        [({"result": result}, stats[key]) for result, key in (("hit", "hits"), ("miss", "misses"), ("error", "errors"))],
+        metric_type="counter"
+    )
+
+registry.add_collector(briefing_cache_metrics)
+
+# Chamadas à Groq com prazos, novas tentativas, hedging, circuit breaker e
+# modelo reserva (ver llm_policy.create_policy_from_env)
+groq_caller = create_caller_from_env(get_groq_client, get_async_groq_client)
+
+def briefing_cache_key(conversation):
+    return cache_key(conversation, BRIEFING_MODEL, BRIEFING_PROMPT.tag, BRIEFING_SAMPLING)
+
+def cache_generated_briefing(conversation, briefing, model):
+    # Respostas do modelo reserva não vão para o cache: a próxima chamada
+    # tenta de novo o modelo principal
+    if model == BRIEFING_MODEL:
+        briefing_cache.set(briefing_cache_key(conversation), briefing)
+
+def get_cached_briefing(conversation):
+    """
+    Retorna o briefing em cache para a conversa, ou None.
+    """
+    with timed("cache"):
+        briefing = briefing_cache.get(briefing_cache_key(conversation))
+    if has_request_context():
+        g.llm_cache_status = 'HIT' if briefing is not None else 'MISS'
+    return briefing
+
+def build_briefing_messages(conversation):
+    return [
+        {
+            "role": "system",
+            "content": BRIEFING_PROMPT.text
+        },
+        {
+            "role": "user",
+            "content": conversation
+        }
+    ]
+
+def build_missing_fields_messages(messages, briefing, missing):
+    return messages + [
+        {
+            "role": "assistant",
+            "content": json.dumps(briefing, ensure_ascii=False)
+        },
+        {
+            "role": "user",
+            "content": MISSING_FIELDS_PROMPT.format(fields=", ".join(missing))
+        }
+    ]
+
+def briefing_request(messages, **options):
+    """
+    Argumentos de chat.completions.create para gerar (ou completar) um
+    briefing, sem streaming e no modo JSON da API.
+    """
+    return {
+        "model": BRIEFING_MODEL,
+        "messages": messages,
+        "stream": False,
+        **BRIEFING_SAMPLING,
+        **BRIEFING_OUTPUT_OPTIONS,
+        **options
+    }
+
+def llm_usage_user():
+    """
+    Usuário a quem a chamada ao modelo é atribuída: o do job ou da
+    requisição ASGI em andamento (llm_usage.usage_user) ou o usuário logado.
+    """
+    user_id = current_usage_user()
+    if user_id is None and has_request_context() and current_user.is_authenticated:
+        user_id = current_user.id
+    return user_id
+
+def record_llm_call(result, prompt, messages, usage=None, content=None, seconds=None):
+    """
+    Registra uma chamada ao modelo nas métricas e no uso por usuário e por
+    dia. `result` é o CallResult da chamada e `prompt` o prompt registrado.
+    
+    Em streaming, `usage`, `content` (texto recebido) e `seconds` vêm de
+    quem consumiu o stream. Sem o uso informado pela API, os tokens são
+    contados localmente (token_counter).
+    """
+    if content is None:
+        usage = result.response.usage
+        content = result.response.choices[0].message.content
+        seconds = result.seconds
+    if usage is not None:
+        prompt_tokens, completion_tokens, cached_tokens = usage_tokens(usage)
+    else:
+        prompt_tokens = token_counter.count_messages(messages)
+        completion_tokens = token_counter.count(content)
+        cached_tokens = 0
+    record_llm_usage(result.model, prompt_tokens, completion_tokens, cached_tokens, prompt.name, prompt.version)
+    usage_recorder.record(
+        llm_usage_user(), result.model, prompt.label, prompt_tokens, completion_tokens, cached_tokens,
+        seconds=seconds or 0.0, estimated=usage is None
+    )
+
+def structure_briefing_steps(conversation, content, model, messages=None, prompt=None):
+    """
+    Converte a resposta do modelo em briefing: extrai e repara o JSON
+    localmente, valida contra o esquema e pede ao modelo só os campos que
+    faltarem. O briefing inteiro só é pedido de novo quando a resposta não
+    tem nenhum JSON aproveitável.
+    
+    `messages` são as mensagens que produziram a resposta (por padrão, as
+    de build_briefing_messages) e `prompt` o prompt registrado delas,
+    reaproveitados nos novos pedidos.
+    
+    É um gerador sem E/S, compartilhado pelo caminho síncrono
+    (structure_briefing_output) e pelo assíncrono (asgi.py): cada novo
+    pedido ao modelo sai como os argumentos de groq_caller.create/acreate,
+    e quem executa devolve o resultado com send() (ou a falha com throw()).
+    
+    Returns:
+        tuple: (briefing, modelo que respondeu por último), em StopIteration.value
+    """
+    messages = messages or build_briefing_messages(conversation)
+    prompt = prompt or BRIEFING_PROMPT
+    with timed("decode"):
+        output = parse_model_output(content)
+    result_label = "repaired" if output.repaired else "valid"
+    
+    if output.briefing is None:
+        logger.warning("Resposta sem JSON aproveitável; gerando o briefing de novo")
+        logger.debug("Conteúdo recebido: %s", content)
+        result_label = "regenerated"
+        result = yield briefing_request(messages)
+        record_llm_call(result, prompt, messages)
+        model = result.model
+        with timed("decode"):
+            output = parse_model_output(result.response.choices[0].message.content)
+        if output.briefing is None:
+            record_structured_output(model, "invalid")
+            raise ValueError("A resposta do modelo não contém um briefing em JSON")
+    
+    briefing = output.briefing
+    if output.missing:
+        if result_label != "regenerated":
+            result_label = "reprompted"
+        logger.info("Pedindo de novo os campos do briefing: %s", ", ".join(output.missing))
+        try:
+            missing_messages = build_missing_fields_messages(messages, briefing, output.missing)
+            result = yield briefing_request(missing_messages, max_tokens=MISSING_FIELDS_MAX_TOKENS)
+            record_llm_call(result, MISSING_FIELDS_PROMPT, missing_messages)
+            patch = parse_model_output(result.response.choices[0].message.content).briefing
+            if patch:
+                merge_fields(briefing, patch, output.missing)
+            if result.model != BRIEFING_MODEL:
+                model = result.model
+        except Exception as e:
+            # O briefing incompleto ainda é útil; os campos podem ser editados depois
+            logger.warning("Não foi possível completar os campos do briefing: %s", e)
+    
+    record_structured_output(model, result_label)
+    return briefing, model
+
+def structure_briefing_output(conversation, content, model, messages=None, prompt=None):
+    """
+    Executa structure_briefing_steps com as chamadas síncronas à Groq.
+    
+    Returns:
+        tuple: (briefing, modelo que respondeu por último)
+    """
+    steps = structure_briefing_steps(conversation, content, model, messages, prompt)
+    try:
+        request_args = next(steps)
+        while True:
+            try:
+                result = groq_caller.create(**request_args)
+            except Exception as e:
+                request_args = steps.throw(e)
+            else:
+                request_args = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+def extract_partial_briefing(index, chunk, total):
+    """
+    Briefing parcial de um trecho da conversa (etapa map). Campos ausentes
+    são esperados e não são pedidos de novo.
+    """
+    messages = [
+        {"role": "system", "content": CHUNK_PROMPT.text},
+        {"role": "user", "content": f"Trecho {index + 1} de {total}:\n\n{chunk}"}
+    ]
+    result = groq_caller.create(**briefing_request(messages, max_tokens=briefing_chunking.partial_max_tokens))
+    record_llm_call(result, CHUNK_PROMPT, messages)
+    with timed("decode"):
+        partial = parse_model_output(result.response.choices[0].message.content).briefing
+    return compact_partial(partial or {})
+
+def merge_messages(partials):
+    content = "\n".join(
+        f"Trecho {index + 1}: {json.dumps(partial, ensure_ascii=False)}"
+        for index, partial in enumerate(partials)
+    )
+    return [
+        {"role": "system", "content": MERGE_PROMPT.text},
+        {"role": "user", "content": content}
+    ]
+
+def merge_partials(partials):
+    messages = merge_messages(partials)
+    result = groq_caller.create(**briefing_request(messages))
+    record_llm_call(result, MERGE_PROMPT, messages)
+    with timed("decode"):
+        return parse_model_output(result.response.choices[0].message.content).briefing or {}
+
+def generate_briefing_chunked(conversation):
+    """
+    Gera o briefing de uma conversa longa em map-reduce: divide a conversa
+    em trechos nas fronteiras de mensagem, extrai um briefing parcial por
+    trecho, em paralelo, e combina os parciais no briefing final. Parciais
+    que não cabem juntos em um trecho são combinados em rodadas.
+    
+    Returns:
+        tuple: (briefing, modelo que respondeu por último)
+    """
+    policy = briefing_chunking
+    chunks = split_conversation(conversation, policy.chunk_tokens)
+    logger.info("Conversa longa (~%s tokens) dividida em %s trechos", estimate_tokens(conversation), len(chunks))
+    
+    with timed("llm_map"):
+        partials = map_chunks(chunks, lambda index, chunk: extract_partial_briefing(index, chunk, len(chunks)), policy)
+    partials = [partial for partial in partials if partial]
+    
+    with timed("llm_reduce"):
+        while True:
+            groups = pack([json.dumps(partial, ensure_ascii=False) for partial in partials], policy.chunk_tokens)
+            if len(groups) <= 1 or len(groups) == len(partials):
+                break
+            # Rodada intermediária: cada grupo de parciais vira um parcial
+            partials = map_chunks(
+                [[json.loads(item) for item in group] for group in groups],
+                lambda index, group: compact_partial(merge_partials(group)),
+                policy
+            )
+        
+        messages = merge_messages(partials)
+        result = groq_caller.create(**briefing_request(messages))
+        record_llm_call(result, MERGE_PROMPT, messages)
+        return structure_briefing_output(
+            conversation, result.response.choices[0].message.content, result.model, messages, MERGE_PROMPT
+        )
+
 def generate_briefing(conversation):
     """
     Gera um briefing a partir de uma conversa usando a API Groq.
@@ -290,145 +601,301 @@ def generate_briefing(conversation):
         dict: Um dicionário com o briefing estruturado
     """
     try:
-        print(f"Gerando briefing para conversa: {conversation[:100]}...")
+        logger.debug("Gerando briefing para conversa: %s...", conversation[:100])
         
-        # Inicializar o cliente Groq
-        try:
-            groq_api_key = os.getenv("GROQ_API_KEY")
-            if not groq_api_key:
-                raise ValueError("GROQ_API_KEY environment variable is not set")
-            
-            client = groq.Client()
-            print("Groq client initialized successfully")
-        except Exception as e:
-            print(f"Error initializing Groq client: {str(e)}")
-            raise
+        # Conversas repetidas são respondidas pelo cache, sem chamar a API
+        cached = get_cached_briefing(conversation)
+        if cached is not None:
+            logger.debug("Briefing encontrado no cache")
+            return cached
         
-        # Prompt para a API Groq
-        completion = client.chat.completions.create(
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Você é um assistente especializado em criar briefings estruturados a partir de conversas.
-                    
-Analise cuidadosamente a conversa e extraia as informações relevantes para preencher o briefing.
-Preencha TODOS os campos do briefing com informações específicas e detalhadas.
-NUNCA deixe campos vazios ou com valores genéricos.
-
-Estrutura do briefing:
-- objetivo: O objetivo principal do projeto (obrigatório)
-- publico_alvo: Descrição detalhada do público-alvo (obrigatório)
-- referencias: Lista de referências mencionadas na conversa
-- prazos: Informações sobre prazos
-  - prazo_final: Data ou período para entrega final
-  - etapas_intermediarias: Lista de etapas intermediárias com prazos
-- orcamento: Informações financeiras
-  - valor_total: Valor total do projeto
-  - descontos: Valor dos descontos aplicados
-  - valor_final: Valor final após descontos
-- observacoes: Lista de observações importantes mencionadas na conversa
-
-Retorne apenas o JSON puro, sem marcadores de código markdown.
-Se alguma informação não estiver disponível na conversa, use valores realistas baseados no contexto."""
-                },
-                {
-                    "role": "user",
-                    "content": conversation
-                }
-            ],
-            temperature=0.7,
-            max_tokens=2000,
-            top_p=1,
-            stream=False
-        )
+        # Conversas longas demais para uma chamada são divididas em trechos
+        if needs_chunking(conversation, briefing_chunking):
+            briefing, model = generate_briefing_chunked(conversation)
+            cache_generated_briefing(conversation, briefing, model)
+            return briefing
+        
+        # Prompt para a API Groq, com a política de chamadas (llm_policy.py)
+        messages = build_briefing_messages(conversation)
+        result = groq_caller.create(**briefing_request(messages))
+        completion = result.response
+        record_llm_call(result, BRIEFING_PROMPT, messages)
         
         # Extrair o conteúdo da resposta
         content = completion.choices[0].message.content
-        print(f"Resposta da API Groq: {content}")
+        logger.debug("Resposta da API Groq: %s", content)
         
-        # Converter a resposta para JSON
-        try:
-            briefing = json.loads(content)
-            print(f"Briefing gerado com sucesso: {briefing}")
-            return briefing
-        except json.JSONDecodeError as e:
-            print(f"Erro ao decodificar JSON da resposta: {str(e)}")
-            print(f"Conteúdo recebido: {content}")
-            raise
+        # Converter a resposta em briefing (JSON reparado e validado)
+        briefing, model = structure_briefing_output(conversation, content, result.model, messages)
+        logger.debug("Briefing gerado com sucesso: %s", briefing)
+        cache_generated_briefing(conversation, briefing, model)
+        return briefing
             
+    except LLMUnavailableError:
+        # Já registrado em llm_policy; as rotas respondem 503
+        raise
     except Exception as e:
-        print(f"Erro ao gerar briefing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao gerar briefing: %s", e)
         raise
 
-def init_database():
+def stream_briefing(conversation):
+    """
+    Gera um briefing em modo streaming, repassando os tokens conforme chegam.
+    
+    Args:
+        conversation (str): O texto da conversa a ser transformado em briefing
+        
+    Yields:
+        str: Pedaços do texto gerado pelo modelo
+    """
+    logger.debug("Gerando briefing (streaming) para conversa: %s...", conversation[:100])
+    
+    # Só a abertura do stream passa por novas tentativas; sem hedging, para
+    # não gerar o briefing duas vezes
+    messages = build_briefing_messages(conversation)
+    result = groq_caller.create(
+        model=BRIEFING_MODEL,
+        messages=messages,
+        stream=True,
+        hedge=False,
+        **BRIEFING_SAMPLING
+    )
+    stream = result.response
+    if has_request_context():
+        g.llm_model = result.model
+    
+    # A Groq envia o uso de tokens no último pedaço (x_groq.usage)
+    usage = None
+    parts = []
+    started = time.perf_counter()
+    with timed("llm_stream"):
+        for chunk in stream:
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(chunk, "usage", None) or getattr(x_groq, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    record_llm_call(
+        result, BRIEFING_PROMPT, messages,
+        usage=usage, content="".join(parts), seconds=result.seconds + time.perf_counter() - started
+    )
+
+def build_briefing_row(user_id, conversation, briefing, client_key=None):
+    """
+    Monta a linha da tabela briefings para um briefing novo.
+    
+    Além do `conteudo`, grava as colunas de resumo (titulo, prazo_final,
+    prazo_final_data, valor_final) usadas pelas listagens e a chave de
+    idempotência (do cabeçalho Idempotency-Key ou do conteúdo).
+    """
+    # Criar um objeto JSON com os dados do briefing
+    conteudo = {
+        'input_text': conversation,
+        'briefing_result': briefing
+    }
+    
+    return {
+        'user_id': user_id,
+        'conteudo': conteudo,
+        'idempotency_key': idempotency_key(conversation, briefing, client_key),
+        **summary_columns(conversation, briefing)
+    }
+
+def request_client_key():
+    """
+    Chave de idempotência enviada pelo cliente no cabeçalho Idempotency-Key.
+    """
+    return parse_client_key(request.headers.get('Idempotency-Key'))
+
+# Busca no histórico (ver briefing_search.create_search_from_env)
+search_backend = create_search_from_env(get_supabase_client)
+
+# Cache de leitura do detalhe e das listagens de briefings (ver read_cache.py)
+read_cache = create_read_cache_from_env()
+# Versão da aplicação no ETag das páginas, para que um deploy (templates
+# novos) não responda 304 com o HTML antigo. Sem versão configurada, usa o
+# hash dos templates e arquivos estáticos, que é o mesmo em todas as instâncias
+APP_RELEASE = (
+    os.getenv('APP_RELEASE')
+    or os.getenv('VERCEL_GIT_COMMIT_SHA')
+    or folder_digest(os.path.join(app.root_path, app.template_folder), app.static_folder)
+)
+
+def read_cache_metrics():
+    return gauge_lines(
+        "autobrief_read_cache_lookups_total",
+        "Consultas ao cache de leitura de briefings, por tipo (detail, page)",
+        [({"kind": kind, "result": result}, count) for (kind, result), count in sorted(read_cache.stats().items())],
+        metric_type="counter"
+    )
+
+registry.add_collector(read_cache_metrics)
+
+def session_metrics():
+    lines = gauge_lines(
+        "autobrief_auth_cache_lookups_total",
+        "Consultas ao cache de usuários por access token",
+        [({"result": result}, count) for result, count in sorted(auth_user_cache.stats().items())],
+        metric_type="counter"
+    )
+    if hasattr(session_interface, 'stats'):
+        lines += gauge_lines(
+            "autobrief_session_loads_total",
+            "Leituras de sessões guardadas no servidor",
+            [({"result": result}, count) for result, count in sorted(session_interface.stats().items())],
+            metric_type="counter"
+        )
+    return lines
+
+registry.add_collector(session_metrics)
+
+def conditional_page(value, render):
+    """
+    Resposta com ETag para uma página gerada a partir de `value`: se o
+    navegador já tem a mesma versão (If-None-Match), responde 304 sem
+    renderizar. Páginas com mensagens flash pendentes não recebem ETag,
+    para que a mensagem não fique na cópia do navegador.
+    """
+    if '_flashes' in session:
+        response = make_response(render())
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+    
+    etag = etag_for(current_user.id, [request.endpoint, value], APP_RELEASE)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Cookie'
+    return response
+
+def user_briefings_page():
+    """
+    Página da listagem de briefings do usuário, pelo cache de leitura.
+    """
+    after = request.args.get('after')
+    before = request.args.get('before')
+    limit = parse_page_size(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    return read_cache.get_page(
+        current_user.id, after, before, limit,
+        lambda: list_briefings_page(get_supabase_client(), current_user.id, after=after, before=before, limit=limit)
+    )
+
+def index_saved_briefings(rows):
+    """
+    Atualiza o índice de busca local (SEARCH_BACKEND=sqlite) com as linhas
+    recém-salvas. No Supabase a indexação é feita pelo próprio banco.
+    Uma falha aqui não impede o salvamento do briefing.
+    """
     try:
-        print("Inicializando banco de dados...")
-        
-        # Criar a tabela briefings se não existir
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS briefings (
-            id BIGSERIAL PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            titulo TEXT,
-            conteudo JSONB NOT NULL,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES auth.users(id)
-        );
-        """
-        
-        # Habilitar RLS e criar políticas
-        enable_rls_sql = """
-        ALTER TABLE briefings ENABLE ROW LEVEL SECURITY;
-        
-        DROP POLICY IF EXISTS "Users can read their own briefings" ON briefings;
-        CREATE POLICY "Users can read their own briefings"
-            ON briefings
-            FOR SELECT
-            USING (auth.uid() = user_id);
-        
-        DROP POLICY IF EXISTS "Users can insert their own briefings" ON briefings;
-        CREATE POLICY "Users can insert their own briefings"
-            ON briefings
-            FOR INSERT
-            WITH CHECK (auth.uid() = user_id);
-        
-        DROP POLICY IF EXISTS "Users can update their own briefings" ON briefings;
-        CREATE POLICY "Users can update their own briefings"
-            ON briefings
-            FOR UPDATE
-            USING (auth.uid() = user_id)
-            WITH CHECK (auth.uid() = user_id);
-        
-        DROP POLICY IF EXISTS "Users can delete their own briefings" ON briefings;
-        CREATE POLICY "Users can delete their own briefings"
-            ON briefings
-            FOR DELETE
-            USING (auth.uid() = user_id);
-        """
-        
-        # Executar os comandos SQL
-        supabase.table('briefings').select('*').limit(1).execute()
-        print("Tabela briefings já existe")
+        search_backend.index_briefings(rows)
     except Exception as e:
-        print(f"Erro ao verificar tabela: {str(e)}")
+        logger.warning("Erro ao indexar briefings para busca: %s", e)
+
+def unindex_deleted_briefings(ids):
+    """
+    Remove do índice de busca local os briefings excluídos.
+    """
+    try:
+        search_backend.remove_briefings(current_user.id, ids)
+    except Exception as e:
+        logger.warning("Erro ao remover briefings do índice de busca: %s", e)
+
+def after_briefings_saved(user_id, rows):
+    """
+    Efeitos de uma gravação de briefings, comuns a todos os caminhos
+    (inclusive o /generate assíncrono de asgi.py): invalida as páginas em
+    cache do usuário e indexa as linhas para a busca local.
+    """
+    read_cache.briefings_saved(user_id)
+    index_saved_briefings(rows)
+
+def persist_generated_briefing(user_id, conversation, briefing, client_key=None):
+    """
+    Salva no Supabase um briefing recém-gerado. Se a chave de idempotência
+    já existir (mesma requisição repetida), devolve a linha já salva.
+    
+    Returns:
+        dict: A linha salva, ou None se a gravação não retornou dados
+    """
+    row = save_briefings(
+        get_supabase_client(),
+        [build_briefing_row(user_id, conversation, briefing, client_key)]
+    )[0]
+    
+    if row:
+        logger.info("Briefing salvo com ID: %s", row['id'])
+        after_briefings_saved(user_id, [row])
+        return row
+    
+    logger.warning("Não foi possível salvar o briefing")
+    return None
+
+def generate_stream_response(conversation):
+    """
+    Resposta Server-Sent Events para /generate?stream=1.
+    
+    Emite um evento `field` para cada campo do briefing assim que ele fica
+    completo, e um evento `done` com o briefing final já salvo.
+    """
+    user_id = current_user.id if current_user.is_authenticated else None
+    client_key = request_client_key()
+    cached_briefing = get_cached_briefing(conversation)
+    
+    def events():
+        parser = BriefingFieldParser()
         try:
-            print("Tentando criar a tabela...")
-            supabase.query(create_table_sql).execute()
-            print("Tabela criada com sucesso")
+            briefing = cached_briefing
+            if briefing is None and needs_chunking(conversation, briefing_chunking):
+                # Conversas longas não são transmitidas: os campos são
+                # enviados quando o briefing combinado fica pronto
+                briefing = generate_briefing(conversation)
+            if briefing is not None:
+                for key, value in briefing.items():
+                    yield sse_event('field', {'key': key, 'value': value})
+            else:
+                for delta in stream_briefing(conversation):
+                    for key, value in parser.feed(delta):
+                        yield sse_event('field', {'key': key, 'value': value})
+                
+                # O JSON do streaming passa pelo mesmo reparo e validação; os
+                # campos completados depois do stream também viram eventos
+                briefing, model = structure_briefing_output(conversation, parser.buffer, g.get('llm_model', BRIEFING_MODEL))
+                for key, value in briefing.items():
+                    if parser.fields.get(key) != value:
+                        yield sse_event('field', {'key': key, 'value': value})
+                cache_generated_briefing(conversation, briefing, model)
+            
+            if isinstance(briefing, dict):
+                briefing["texto_original"] = conversation
             
-            print("Configurando políticas...")
-            supabase.query(enable_rls_sql).execute()
-            print("Políticas configuradas com sucesso")
+            # Salvar o briefing uma única vez, com o resultado final
+            if user_id:
+                row = persist_generated_briefing(user_id, conversation, briefing, client_key)
+                if not row:
+                    yield sse_event('error', {'error': 'Erro ao salvar briefing'})
+                    return
+                briefing["id"] = row["id"]
+            
+            yield sse_event('done', briefing)
         except Exception as e:
-            print(f"Erro ao criar tabela: {str(e)}")
-            import traceback
-            traceback.print_exc()
-
-# Inicializar o banco de dados quando o aplicativo iniciar
-init_database()
+            logger.exception("Erro ao gerar briefing (streaming): %s", e)
+            yield sse_event('error', {'error': str(e)})
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            'X-Cache': g.llm_cache_status
+        }
+    )
 
 @app.route('/generate', methods=['GET', 'POST'])
 @login_required
@@ -443,6 +910,10 @@ def generate():
         if not conversation:
             return jsonify({"error": "No conversation provided"}), 400
         
+        # Modo streaming: campos enviados ao navegador conforme são gerados
+        if request.args.get('stream') == '1':
+            return generate_stream_response(conversation)
+        
         # Gerar o briefing usando a API Groq
         briefing = generate_briefing(conversation)
         
@@ -452,114 +923,249 @@ def generate():
         
         # Salvar o briefing no Supabase
         if current_user.is_authenticated:
-            # Extrair o título do briefing (usando o objetivo como título)
-            titulo = "Novo Briefing"
-            if isinstance(briefing, dict) and "objetivo" in briefing and briefing["objetivo"]:
-                titulo = briefing["objetivo"]
-            else:
-                # Se não houver objetivo, use as primeiras palavras da conversa
-                titulo = conversation[:50] + "..." if len(conversation) > 50 else conversation
-            
             try:
-                # Criar um objeto JSON com os dados do briefing
-                conteudo = {
-                    'input_text': conversation,
-                    'briefing_result': briefing
-                }
-                
-                # Tentar salvar o briefing
-                result = supabase.table('briefings').insert({
-                    'user_id': current_user.id,
-                    'titulo': titulo,
-                    'conteudo': conteudo
-                }).execute()
-                
-                print(f"Resultado da inserção: {result}")
-                
-                if result.data:
-                    print(f"Briefing salvo com ID: {result.data[0]['id']}")
-                    briefing["id"] = result.data[0]["id"]
+                row = persist_generated_briefing(current_user.id, conversation, briefing, request_client_key())
+                if row:
+                    briefing["id"] = row["id"]
                 else:
-                    print("Não foi possível salvar o briefing")
                     return jsonify({"error": "Erro ao salvar briefing"}), 500
                     
             except Exception as e:
-                print(f"Erro ao salvar briefing: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("Erro ao salvar briefing: %s", e)
                 return jsonify({"error": f"Erro ao salvar briefing: {str(e)}"}), 500
         
-        return jsonify(briefing)
+        response = jsonify(briefing)
+        response.headers['X-Cache'] = g.get('llm_cache_status', 'MISS')
+        return response
+    except LLMUnavailableError as e:
+        return llm_unavailable_response(e)
     except Exception as e:
-        print(f"Erro ao gerar briefing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao gerar briefing: %s", e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/briefings')
+def llm_unavailable_response(error):
+    """
+    Resposta 503 quando a Groq está fora (tentativas esgotadas ou circuito
+    aberto), com Retry-After quando há uma estimativa.
+    """
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def persist_generated_briefings(user_id, generated):
+    """
+    Salva vários briefings com uma única inserção no Supabase. Conversas
+    repetidas (no lote ou já salvas) reaproveitam a mesma linha.
+    
+    Args:
+        generated (list): Pares (conversa, briefing)
+    
+    Returns:
+        list: As linhas salvas, na mesma ordem
+    """
+    rows = [build_briefing_row(user_id, conversation, briefing) for conversation, briefing in generated]
+    saved = save_briefings(get_supabase_client(), rows)
+    logger.info("Briefings salvos em lote: %s", len({row['id'] for row in saved if row}))
+    after_briefings_saved(user_id, [row for row in saved if row])
+    return saved
+
+@app.route('/generate/batch', methods=['POST'])
 @login_required
-def list_briefings():
+def generate_batch():
+    """
+    Gera briefings para várias conversas de uma vez.
+    
+    Aceita JSON ({"conversations": [...]}) ou um arquivo JSONL no campo `file`.
+    A resposta é NDJSON: uma linha por conversa assim que termina, e uma
+    linha final com os IDs salvos. Os briefings são salvos em inserções de
+    até BATCH_SAVE_SIZE conforme ficam prontos, e o que faltar é salvo mesmo
+    se o cliente desconectar no meio, para não perder gerações já pagas.
+    """
     try:
-        print("Listando briefings...")
-        
-        # Buscar todos os briefings do usuário
-        response = supabase.table("briefings").select("*").eq("user_id", current_user.id).order("created_at", desc=True).execute()
+        items = parse_batch_items(
+            json_data=request.get_json(silent=True),
+            upload=request.files.get('file')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not items:
+        return jsonify({"error": "No conversations provided"}), 400
+    
+    user_id = current_user.id
+    
+    def lines():
+        pending = []
+        saved = []
+        unsaved = []
+        errors = []
+        generated = 0
         
-        print(f"Resposta do Supabase: {response}")
+        def save_pending():
+            batch = sorted(pending, key=lambda pair: pair[0]['index'])
+            pending.clear()
+            try:
+                rows = persist_generated_briefings(
+                    user_id,
+                    [(item['conversation'], briefing) for item, briefing in batch]
+                )
+            except Exception as e:
+                logger.exception("Erro ao salvar lote de briefings: %s", e)
+                errors.append(f"Erro ao salvar briefings: {str(e)}")
+                rows = [None] * len(batch)
+            for (item, _), row in zip(batch, rows):
+                # Uma linha que não pôde ser lida de volta vem como None
+                target = saved if row else unsaved
+                entry = {'index': item['index'], 'ref': item['ref']}
+                if row:
+                    entry['id'] = row['id']
+                target.append(entry)
         
-        briefings = response.data
-        print(f"Briefings encontrados: {briefings}")
+        def add_generated(item, briefing):
+            if isinstance(briefing, dict):
+                briefing["texto_original"] = item['conversation']
+            pending.append((item, briefing))
+            if len(pending) >= BATCH_SAVE_SIZE:
+                save_pending()
         
-        # Processar cada briefing
-        for briefing in briefings:
-            # Inicializar campos padrão
-            briefing['input_text'] = ''
-            briefing['briefing_result'] = {}
-            briefing['titulo'] = 'Novo Brief'
+        results = run_batch(items, generate_briefing)
+        try:
+            for item, briefing, error in results:
+                status = {'index': item['index'], 'ref': item['ref']}
+                if error:
+                    status.update(status='error', error=error)
+                else:
+                    generated += 1
+                    add_generated(item, briefing)
+                    status.update(status='generated', titulo=briefing.get('objetivo') if isinstance(briefing, dict) else None)
+                yield json.dumps(status, ensure_ascii=False) + "\n"
             
-            # Processar o campo conteudo para extrair input_text e briefing_result
-            if 'conteudo' in briefing and briefing['conteudo']:
-                conteudo = briefing['conteudo']
-                print(f"Conteúdo do briefing {briefing['id']}: {conteudo}")
-                
-                # Converter para dicionário se for string
-                if isinstance(conteudo, str):
-                    try:
-                        conteudo = json.loads(conteudo)
-                        print(f"Conteúdo convertido de string para dicionário: {conteudo}")
-                    except Exception as e:
-                        print(f"Erro ao converter conteúdo para dicionário: {str(e)}")
-                        conteudo = {}
-                
-                # Extrair informações do conteudo
-                if isinstance(conteudo, dict):
-                    briefing['input_text'] = conteudo.get('input_text', '')
-                    briefing_result = conteudo.get('briefing_result', {})
-                    print(f"Briefing result extraído: {briefing_result}")
-                    
-                    # Converter briefing_result para dicionário se for string
-                    if isinstance(briefing_result, str):
-                        try:
-                            briefing_result = json.loads(briefing_result)
-                            print(f"Briefing result convertido de string para dicionário: {briefing_result}")
-                        except Exception as e:
-                            print(f"Erro ao converter briefing_result para dicionário: {str(e)}")
-                            briefing_result = {}
-                    
-                    briefing['briefing_result'] = briefing_result
-                    print(f"Briefing result final: {briefing['briefing_result']}")
-                    
-                    # Extrair título do briefing_result
-                    if isinstance(briefing['briefing_result'], dict) and 'objetivo' in briefing['briefing_result']:
-                        briefing['titulo'] = briefing['briefing_result']['objetivo']
-                        print(f"Título extraído: {briefing['titulo']}")
+            if pending:
+                save_pending()
+            summary = {
+                'status': 'done',
+                'generated': generated,
+                'failed': len(items) - generated,
+                'saved': sorted(saved, key=lambda entry: entry['index']),
+                'unsaved': sorted(unsaved, key=lambda entry: entry['index'])
+            }
+            if errors or unsaved:
+                summary.update(status='error', error=errors[0] if errors else "Alguns briefings não foram salvos")
+            yield json.dumps(summary, ensure_ascii=False) + "\n"
+        finally:
+            # Cliente desconectado no meio do lote: as gerações já enviadas ao
+            # pool terminam de qualquer forma, então são esperadas e salvas
+            for item, briefing, error in results:
+                if not error:
+                    add_generated(item, briefing)
+            if pending:
+                save_pending()
+    
+    return Response(
+        stream_with_context(lines()),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+def is_transient_job_error(error):
+    """
+    Erros que valem uma nova tentativa do job: modelo indisponível, falhas
+    de conexão e timeouts (Groq ou Supabase). Erros de validação falham direto.
+    """
+    if isinstance(error, (LLMUnavailableError, ConnectionError, TimeoutError)):
+        return True
+    import httpx
+    
+    return isinstance(error, httpx.TransportError) or is_retryable(error)
+
+# Fila de jobs para geração em segundo plano (ver jobs.py); None em produção sem store compartilhado
+job_queue = create_job_queue_from_env(production=IS_PRODUCTION, retryable=is_transient_job_error)
+JOB_MAX_WAIT = 25
+
+def run_generate_briefing_job(payload, user_id):
+    """
+    Executa um job de geração: chama a API Groq e salva o briefing.
+    """
+    conversation = payload['conversation']
+    with usage_user(user_id):
+        briefing = generate_briefing(conversation)
+    if isinstance(briefing, dict):
+        briefing["texto_original"] = conversation
+    
+    # Com a chave de idempotência, uma nova tentativa do job não duplica o briefing
+    row = persist_generated_briefing(user_id, conversation, briefing, payload.get('idempotency_key'))
+    if not row:
+        raise RuntimeError("Erro ao salvar briefing")
+    briefing["id"] = row["id"]
+    return briefing
+
+if job_queue:
+    job_queue.register('generate_briefing', run_generate_briefing_job)
+
+def job_queue_unavailable():
+    return jsonify({"error": "Fila de jobs indisponível neste ambiente"}), 503
+
+@app.route('/jobs', methods=['POST'])
+@login_required
+def create_job():
+    if not job_queue:
+        return job_queue_unavailable()
+    try:
+        data = request.get_json()
+        conversation = data.get('conversation', '')
         
-        print(f"Briefings processados para exibição: {briefings}")
-        return render_template('briefings.html', briefings=briefings)
+        if not conversation:
+            return jsonify({"error": "No conversation provided"}), 400
+        
+        payload = {'conversation': conversation}
+        if request_client_key():
+            payload['idempotency_key'] = request_client_key()
+        job = job_queue.submit('generate_briefing', current_user.id, payload)
+        logger.info("Job de geração enfileirado: %s", job['id'])
+        
+        return jsonify({
+            "job_id": job['id'],
+            "status": job['status'],
+            "status_url": url_for('get_job', job_id=job['id'])
+        }), 202
+    except Exception as e:
+        logger.exception("Erro ao enfileirar job: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/jobs/<job_id>')
+@login_required
+def get_job(job_id):
+    if not job_queue:
+        return job_queue_unavailable()
+    job = job_queue.get(job_id)
+    if not job or job['user_id'] != current_user.id:
+        return jsonify({"error": "Job não encontrado"}), 404
+    
+    # ?wait=N mantém a requisição aberta até N segundos esperando o job terminar
+    try:
+        wait = min(float(request.args.get('wait', 0)), JOB_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    if wait > 0:
+        job = job_queue.wait(job_id, wait)
+    
+    return jsonify(job_to_dict(job))
+
+@app.route('/briefings')
+@login_required
+def list_briefings():
+    try:
+        logger.debug("Listando briefings...")
+        
+        # Buscar apenas as colunas exibidas, uma página por vez, pelo cache
+        page = user_briefings_page()
+        
+        logger.debug("Briefings encontrados: %s", len(page['briefings']))
+        return conditional_page(page, lambda: render_template('briefings.html', **page))
     except Exception as e:
-        print(f"Erro ao listar briefings: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao listar briefings: %s", e)
         flash(f"Erro ao listar briefings: {str(e)}")
         return redirect(url_for('index'))
 
@@ -567,52 +1173,30 @@ def list_briefings():
 @login_required
 def view_briefing(id):
     try:
-        print(f"Buscando briefing com ID: {id} (tipo: {type(id)})")
+        logger.debug("Buscando briefing com ID: %s (tipo: %s)", id, type(id))
         
-        # Buscar o briefing específico e verificar se pertence ao usuário
-        response = supabase.table("briefings").select("*").eq("id", id).eq("user_id", current_user.id).single().execute()
+        # Buscar o briefing específico e verificar se pertence ao usuário;
+        # briefings não mudam depois de salvos, então a linha vem do cache
+        def load_briefing_row():
+            response = get_supabase_client().table("briefings").select(DETAIL_COLUMNS).eq("id", id).eq("user_id", current_user.id).single().execute()
+            logger.debug("Resposta do Supabase: %s", response)
+            return response.data
         
-        print(f"Resposta do Supabase: {response}")
+        row = read_cache.get_briefing(current_user.id, id, load_briefing_row)
         
-        if not response.data:
+        if not row:
             flash("Briefing não encontrado")
             return redirect(url_for('list_briefings'))
-            
-        briefing = response.data
-        print(f"Briefing encontrado: {briefing}")
         
-        # Processar o campo conteudo para extrair input_text e briefing_result
-        if 'conteudo' in briefing and briefing['conteudo']:
-            conteudo = briefing['conteudo']
-            print(f"Conteúdo do briefing: {conteudo}")
-            
-            # Se conteudo for uma string, tentar converter para JSON
-            if isinstance(conteudo, str):
-                try:
-                    conteudo = json.loads(conteudo)
-                except json.JSONDecodeError as e:
-                    print(f"Erro ao decodificar JSON do conteúdo: {str(e)}")
-                    conteudo = {}
-            
-            # Extrair input_text e briefing_result do conteudo
-            if isinstance(conteudo, dict):
-                briefing['input_text'] = conteudo.get('input_text', '')
-                briefing['briefing_result'] = conteudo.get('briefing_result', {})
-                
-                # Se briefing_result for uma string, tentar converter para JSON
-                if isinstance(briefing['briefing_result'], str):
-                    try:
-                        briefing['briefing_result'] = json.loads(briefing['briefing_result'])
-                    except json.JSONDecodeError as e:
-                        print(f"Erro ao decodificar JSON do briefing_result: {str(e)}")
-                        briefing['briefing_result'] = {}
-        
-        print(f"Briefing processado para exibição: {briefing}")
-        return render_template('briefing.html', briefing=briefing)
+        def render():
+            # Decodificado uma vez e reaproveitado entre requisições (ver briefing_model.py)
+            with timed("decode"):
+                briefing = briefing_from_row(row)
+            return render_template('briefing.html', briefing=briefing)
+        
+        return conditional_page([row['id'], row.get('created_at')], render)
     except Exception as e:
-        print(f"Erro ao buscar briefing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao buscar briefing: %s", e)
         flash(f"Erro ao buscar briefing: {str(e)}")
         return redirect(url_for('list_briefings'))
 
@@ -620,119 +1204,172 @@ def view_briefing(id):
 @login_required
 def history():
     try:
-        print("Listando histórico de briefings...")
+        logger.debug("Listando histórico de briefings...")
         
-        # Buscar briefings do usuário ordenados por data
-        response = supabase.table("briefings").select("*").eq("user_id", current_user.id).order("created_at", desc=True).execute()
+        # Buscar briefings do usuário ordenados por data, uma página por vez,
+        # pelo cache de leitura
+        page = user_briefings_page()
         
-        print(f"Resposta do Supabase: {response}")
-        
-        if response.data:
-            briefings = response.data
-            print(f"Briefings encontrados: {briefings}")
-            
-            # Processar os briefings para extrair informações do campo conteudo
-            for briefing in briefings:
-                # Inicializar campos padrão
-                briefing['input_text'] = ''
-                briefing['briefing_result'] = {}
-                briefing['titulo'] = "Novo Briefing"
-                
-                # Processar o campo conteudo se existir
-                if 'conteudo' in briefing and briefing['conteudo']:
-                    content = briefing['conteudo']
-                    print(f"Content do briefing {briefing['id']}: {content}")
-                    
-                    # Converter para dicionário se for string
-                    if isinstance(content, str):
-                        try:
-                            content = json.loads(content)
-                            print(f"Content convertido de string para dicionário: {content}")
-                        except Exception as e:
-                            print(f"Erro ao converter content para dicionário: {str(e)}")
-                            content = {}
-                    
-                    # Extrair informações do content
-                    if isinstance(content, dict):
-                        briefing['input_text'] = content.get('input_text', '')
-                        briefing_result = content.get('briefing_result', {})
-                        print(f"Briefing result extraído: {briefing_result}")
-                        
-                        # Converter briefing_result para dicionário se for string
-                        if isinstance(briefing_result, str):
-                            try:
-                                briefing_result = json.loads(briefing_result)
-                                print(f"Briefing result convertido de string para dicionário: {briefing_result}")
-                            except Exception as e:
-                                print(f"Erro ao converter briefing_result para dicionário: {str(e)}")
-                                briefing_result = {}
-                        
-                        briefing['briefing_result'] = briefing_result
-                        print(f"Briefing result final: {briefing['briefing_result']}")
-                        
-                        # Definir título a partir do objetivo
-                        if isinstance(briefing_result, dict) and 'objetivo' in briefing_result:
-                            briefing['titulo'] = briefing_result['objetivo']
-                            print(f"Título extraído: {briefing['titulo']}")
-            
-            print(f"Briefings processados para exibição: {briefings}")
-            return render_template('history.html', briefings=briefings)
-        else:
-            print("Nenhum briefing encontrado")
-            return render_template('history.html', briefings=[])
+        logger.debug("Briefings encontrados: %s", len(page['briefings']))
+        return conditional_page(page, lambda: render_template('history.html', **page))
             
     except Exception as e:
-        print(f"Erro ao carregar histórico de briefings: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao carregar histórico de briefings: %s", e)
         flash('Erro ao carregar histórico de briefings', 'error')
         return redirect(url_for('index'))
 
-@app.route('/delete/<id>')
+@app.route('/briefings/search')
 @login_required
-def delete_briefing(id):
+def search_history():
+    query = request.args.get('q', '')
+    try:
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        page = 1
+    
     try:
-        print(f"Tentando excluir briefing com ID: {id} (tipo: {type(id)})")
+        # Ranking, destaque e paginação feitos pelo backend de busca;
+        # só a página pedida chega à aplicação
+        with timed("search"):
+            results = search_briefings(
+                search_backend,
+                current_user.id,
+                query,
+                page=page,
+                limit=parse_page_size(request.args.get('limit', DEFAULT_PAGE_SIZE))
+            )
         
-        # Verificar se o briefing existe e pertence ao usuário
-        response = supabase.table("briefings").select("id").eq("id", id).eq("user_id", current_user.id).single().execute()
+        logger.debug("Resultados da busca: %s", len(results['results']))
+        return render_template('search.html', **results)
+    except Exception as e:
+        logger.exception("Erro ao buscar briefings: %s", e)
+        flash('Erro ao buscar briefings', 'error')
+        return redirect(url_for('history'))
+
+@app.route('/delete/<id>', methods=['GET', 'POST'])
+@login_required
+def delete_briefing(id):
+    try:
+        logger.debug("Tentando excluir briefing com ID: %s (tipo: %s)", id, type(id))
         
-        print(f"Resposta da verificação: {response}")
+        # Um único DELETE filtrado por id e user_id: se nenhuma linha voltar,
+        # o briefing não existe ou pertence a outro usuário
+        deleted = delete_briefings(get_supabase_client(), current_user.id, parse_briefing_ids([id]))
         
-        if not response.data:
+        if not deleted:
             flash('Briefing não encontrado ou você não tem permissão para excluí-lo', 'error')
             return redirect(url_for('list_briefings'))
         
-        # Excluir o briefing
-        delete_response = supabase.table("briefings").delete().eq("id", id).execute()
-        print(f"Resposta da exclusão: {delete_response}")
+        read_cache.briefings_deleted(current_user.id, deleted)
+        unindex_deleted_briefings(deleted)
         
         flash('Briefing excluído com sucesso', 'success')
         return redirect(url_for('list_briefings'))
         
     except Exception as e:
-        print(f"Erro ao excluir briefing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao excluir briefing: %s", e)
         flash('Erro ao excluir briefing', 'error')
         return redirect(url_for('list_briefings'))
 
-def save_briefing(user_id, input_text, briefing_result):
+@app.route('/briefings/export')
+@login_required
+def export_briefings():
+    """
+    Exporta o histórico inteiro do usuário (?format=jsonl, csv ou zip de
+    Markdown). A resposta é gerada enquanto as páginas são lidas do
+    Supabase (ver briefing_export.py), sem juntar as linhas em memória.
+    """
+    export_format = request.args.get('format', 'jsonl')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato inválido: {export_format}"}), 400
+    
+    user_id = current_user.id
     try:
-        conteudo = {
-            "input_text": input_text,
-            "briefing_result": briefing_result
+        # A primeira página é lida antes da resposta: uma falha aqui ainda
+        # pode virar mensagem de erro em vez de um arquivo cortado
+        rows = iter_briefings(get_supabase_client(), user_id)
+        first = next(rows, None)
+    except Exception as e:
+        logger.exception("Erro ao exportar briefings: %s", e)
+        flash('Erro ao exportar briefings', 'error')
+        return redirect(url_for('history'))
+    
+    def all_rows():
+        if first is not None:
+            yield first
+        yield from rows
+    
+    def chunks():
+        try:
+            yield from export_chunks(all_rows(), export_format)
+        except Exception as e:
+            # Com a resposta já começada, só resta interromper o arquivo: o
+            # erro sobe para o servidor, que aborta a conexão, e o cliente não
+            # recebe um arquivo cortado como se estivesse completo
+            logger.exception("Erro durante a exportação de briefings: %s", e)
+            raise
+    
+    mimetype, extension, _ = EXPORT_FORMATS[export_format]
+    filename = f"briefings-{datetime.now().strftime('%Y%m%d')}.{extension}"
+    return Response(
+        stream_with_context(chunks()),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'private, no-store',
+            'X-Accel-Buffering': 'no'
         }
-        
-        response = supabase.table('briefings').insert({
-            "user_id": user_id,
-            "titulo": briefing_result.get("objetivo", "Novo Briefing"),
-            "conteudo": conteudo
-        }).execute()
-        
-        return response.data[0]
+    )
+
+@app.route('/briefings/delete', methods=['POST'])
+@login_required
+def delete_briefings_route():
+    """
+    Exclui vários briefings de uma vez.
+    
+    Aceita o formulário do histórico (campos `ids`) ou JSON ({"ids": [...]}).
+    Em JSON, responde com os ids excluídos e os que não foram encontrados.
+    """
+    wants_json = request.is_json
+    if wants_json:
+        ids = parse_briefing_ids((request.get_json(silent=True) or {}).get('ids'))
+    else:
+        ids = parse_briefing_ids(request.form.getlist('ids'))
+    
+    if not ids or len(ids) > MAX_DELETE_IDS:
+        error = f"Informe de 1 a {MAX_DELETE_IDS} briefings para excluir"
+        if wants_json:
+            return jsonify({"error": error}), 400
+        flash(error, 'error')
+        return redirect(url_for('history'))
+    
+    try:
+        deleted = delete_briefings(get_supabase_client(), current_user.id, ids)
+        logger.info("Briefings excluídos em lote: %s de %s", len(deleted), len(ids))
+        read_cache.briefings_deleted(current_user.id, deleted)
+        unindex_deleted_briefings(deleted)
     except Exception as e:
-        print(f"Erro ao salvar briefing: {str(e)}")
+        logger.exception("Erro ao excluir briefings: %s", e)
+        if wants_json:
+            return jsonify({"error": f"Erro ao excluir briefings: {str(e)}"}), 500
+        flash('Erro ao excluir briefings', 'error')
+        return redirect(url_for('history'))
+    
+    if wants_json:
+        deleted_ids = set(deleted)
+        return jsonify({
+            "deleted": deleted,
+            "not_found": [briefing_id for briefing_id in ids if briefing_id not in deleted_ids]
+        })
+    
+    flash(f'{len(deleted)} briefing(s) excluído(s) com sucesso', 'success')
+    return redirect(url_for('history'))
+
+def save_briefing(user_id, input_text, briefing_result, client_key=None):
+    try:
+        return persist_generated_briefing(user_id, input_text, briefing_result, client_key)
+    except Exception as e:
+        logger.error("Erro ao salvar briefing: %s", e)
         raise
 
 @app.route('/save_briefing', methods=['POST'])
@@ -746,47 +1383,24 @@ def save_briefing_route():
         if not input_text or not briefing_result:
             return jsonify({"error": "Dados incompletos"}), 400
         
-        # Extrair o título do briefing (usando o objetivo como título)
-        titulo = "Novo Briefing"
-        if isinstance(briefing_result, dict) and "objetivo" in briefing_result and briefing_result["objetivo"]:
-            titulo = briefing_result["objetivo"]
-        else:
-            # Se não houver objetivo, use as primeiras palavras do input_text
-            titulo = input_text[:50] + "..." if len(input_text) > 50 else input_text
-        
-        # Criar um objeto JSON com os dados do briefing
-        conteudo = {
-            'input_text': input_text,
-            'briefing_result': briefing_result
-        }
-        
-        # Salvar o briefing no Supabase
-        result = supabase.table('briefings').insert({
-            'user_id': current_user.id,
-            'titulo': titulo,
-            'conteudo': conteudo
-        }).execute()
-        
-        print(f"Resultado da inserção: {result}")
+        # O /generate já salvou este briefing: com a mesma chave de
+        # idempotência (cabeçalho ou conteúdo), a linha existente é devolvida
+        # em vez de gravar uma duplicata
+        row = persist_generated_briefing(current_user.id, input_text, briefing_result, request_client_key())
         
-        if result.data:
-            print(f"Briefing salvo com ID: {result.data[0]['id']}")
-            return jsonify({"success": True, "id": result.data[0]['id']})
+        if row:
+            return jsonify({"success": True, "id": row['id']})
         else:
-            print("Não foi possível salvar o briefing")
+            logger.warning("Não foi possível salvar o briefing")
             return jsonify({"error": "Erro ao salvar briefing"}), 500
             
     except Exception as e:
-        print(f"Erro ao salvar briefing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao salvar briefing: %s", e)
         return jsonify({"error": f"Erro ao salvar briefing: {str(e)}"}), 500
 
 @app.errorhandler(Exception)
 def handle_error(error):
-    print(f"Unhandled error: {str(error)}")
-    import traceback
-    traceback.print_exc()
+    logger.exception("Unhandled error: %s", error)
     return jsonify({"error": "Internal server error", "message": str(error)}), 500
 
 if __name__ == '__main__':
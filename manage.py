@@ -0,0 +1,423 @@
+"""
+Comandos de manutenção, executados fora do ciclo das requisições
+(a aplicação não faz nenhuma verificação de banco ao iniciar).
+
+Uso:
+    python manage.py check-db
+    python manage.py schema-sql
+    python manage.py migrate
+    python manage.py migrations-status
+    python manage.py explain-check
+    python manage.py verify-migrations [--rows 5000] [--from-legacy]
+    python manage.py backfill-summaries [--batch-size 200] [--dry-run]
+    python manage.py reindex-search [--batch-size 200]
+    python manage.py dedup-briefings [--batch-size 200] [--dry-run]
+    python manage.py usage-report [--days 7] [--user ID] [--factor 3]
+
+Os comandos de migração usam DATABASE_URL (connection string do Postgres).
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+# Colunas que a aplicação lê e grava
+REQUIRED_COLUMNS = "id,user_id,titulo,conteudo,created_at,prazo_final,prazo_final_data,valor_final,idempotency_key"
+SUMMARY_FIELDS = ("titulo", "prazo_final", "prazo_final_data", "valor_final")
+
+
+def check_db(args):
+    """
+    Verifica se a tabela briefings existe e tem as colunas usadas pela aplicação.
+    """
+    from clients import get_supabase_client
+
+    try:
+        get_supabase_client().table('briefings').select(REQUIRED_COLUMNS).limit(1).execute()
+    except Exception as e:
+        print(f"Erro ao verificar a tabela briefings: {str(e)}")
+        print("Se a tabela ou alguma coluna não existir, execute `python manage.py migrate` "
+              "(ou aplique o SQL de `python manage.py schema-sql` no editor SQL do Supabase).")
+        return 1
+    print("Tabela briefings OK")
+    return 0
+
+
+def backfill_summaries(args):
+    """
+    Preenche as colunas de resumo das linhas gravadas antes delas existirem.
+    Percorre a tabela por id e só atualiza as linhas cujos valores mudaram:
+    como tudo é recalculado a partir do `conteudo`, rodar de novo também
+    corrige valores gravados por versões anteriores da extração (o
+    valor_final de "R$ 5.000" era gravado como 5.0 antes da correção de
+    briefing_model._number).
+    Precisa de uma SUPABASE_KEY com acesso a todas as linhas (service role).
+    """
+    from briefing_model import decode_briefing_row, summary_columns
+    from clients import get_supabase_client
+
+    client = get_supabase_client()
+    last_id = None
+    scanned = updated = 0
+    while True:
+        query = client.table('briefings').select(f"id,created_at,conteudo,{','.join(SUMMARY_FIELDS)}")
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(args.batch_size).execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            briefing = decode_briefing_row(row)
+            summary = summary_columns(briefing.input_text, briefing.briefing_result, row.get('created_at'))
+            # Títulos já gravados são mantidos; só os vazios são preenchidos
+            if row.get('titulo'):
+                summary.pop('titulo')
+            changes = {key: value for key, value in summary.items() if _differs(row.get(key), value)}
+            if changes:
+                updated += 1
+                if not args.dry_run:
+                    client.table('briefings').update(changes).eq('id', row['id']).execute()
+
+        scanned += len(rows)
+        last_id = rows[-1]['id']
+        print(f"{scanned} linhas verificadas, {updated} {'a atualizar' if args.dry_run else 'atualizadas'}")
+
+    return 0
+
+
+def reindex_search(args):
+    """
+    Reconstrói o índice de busca local (SEARCH_BACKEND=sqlite) a partir das
+    linhas do Supabase. Com o backend supabase não há nada a fazer: o
+    search_vector é uma coluna gerada pelo banco.
+    """
+    from briefing_search import SQLiteSearchBackend, create_search_from_env
+    from clients import get_supabase_client
+
+    backend = create_search_from_env(get_supabase_client)
+    if not isinstance(backend, SQLiteSearchBackend):
+        print("SEARCH_BACKEND não é sqlite; o Postgres mantém o índice de busca sozinho")
+        return 0
+
+    client = get_supabase_client()
+    last_id = None
+    indexed = 0
+    while True:
+        query = client.table('briefings').select(f"id,user_id,created_at,conteudo,{','.join(SUMMARY_FIELDS)}")
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(args.batch_size).execute().data
+        if not rows:
+            break
+        backend.index_briefings(rows)
+        indexed += len(rows)
+        last_id = rows[-1]['id']
+        print(f"{indexed} briefings indexados em {backend.path}")
+
+    return 0
+
+
+def dedup_briefings(args):
+    """
+    Junta os briefings duplicados gravados antes da chave de idempotência
+    (o /generate e o botão Salvar gravavam o mesmo briefing duas vezes).
+
+    Linhas do mesmo usuário com a mesma conversa e o mesmo briefing
+    (a chave de conteúdo de briefing_store.idempotency_key) são duplicatas:
+    fica a mais antiga, as demais são excluídas, e a que fica recebe a
+    chave, para que gravações futuras do mesmo conteúdo caiam nela.
+    Precisa de uma SUPABASE_KEY com acesso a todas as linhas (service role).
+    """
+    from briefing_model import decode_briefing_row
+    from briefing_store import delete_briefings, idempotency_key
+    from clients import get_supabase_client
+
+    client = get_supabase_client()
+    survivors = {}
+    duplicates = {}
+    missing_keys = {}
+    last_id = None
+    scanned = 0
+    while True:
+        query = client.table('briefings').select("id,user_id,conteudo,idempotency_key")
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(args.batch_size).execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            briefing = decode_briefing_row(row)
+            key = idempotency_key(briefing.input_text, briefing.briefing_result)
+            group = (row['user_id'], key)
+            if group in survivors:
+                duplicates.setdefault(row['user_id'], []).append(row['id'])
+                continue
+            survivors[group] = row['id']
+            if not row.get('idempotency_key'):
+                missing_keys[row['id']] = key
+
+        scanned += len(rows)
+        last_id = rows[-1]['id']
+        print(f"{scanned} linhas verificadas, {sum(map(len, duplicates.values()))} duplicatas")
+
+    removed = sum(map(len, duplicates.values()))
+    if args.dry_run:
+        print(f"{removed} duplicatas seriam excluídas e {len(missing_keys)} chaves preenchidas")
+        return 0
+
+    # Primeiro as exclusões: uma duplicata mais nova pode já ter a chave
+    for user_id, ids in duplicates.items():
+        delete_briefings(client, user_id, ids)
+    for row_id, key in missing_keys.items():
+        client.table('briefings').update({'idempotency_key': key}).eq('id', row_id).execute()
+
+    print(f"{removed} duplicatas excluídas, {len(missing_keys)} chaves preenchidas")
+    return 0
+
+
+def usage_report(args):
+    """
+    Uso do modelo por usuário e por dia (tabela llm_usage_daily), marcando
+    os dias fora da curva em custo ou latência (ver llm_usage.usage_outliers).
+    Usa o backend de LLM_USAGE_BACKEND; no Supabase, precisa de uma
+    SUPABASE_KEY com acesso a todas as linhas (service role).
+    """
+    from clients import get_supabase_client
+    from llm_usage import create_usage_from_env, summarize_usage, usage_outliers, usage_since
+
+    store = create_usage_from_env(get_supabase_client).store
+    if store is None:
+        print("LLM_USAGE_BACKEND=none: o uso não é gravado")
+        return 1
+
+    totals = summarize_usage(store.daily(usage_since(args.days), args.user))
+    if not totals:
+        print(f"Nenhum uso registrado nos últimos {args.days} dias")
+        return 0
+    outliers = usage_outliers(totals, args.factor)
+
+    print(f"{'dia':<10} {'usuário':<36} {'chamadas':>8} {'prompt':>9} {'cache':>8} {'resposta':>9} "
+          f"{'prompt/ch.':>10} {'s/ch.':>6} {'máx. s':>6}")
+    for (user_id, day), t in sorted(totals.items(), key=lambda item: (item[0][1], item[0][0])):
+        flag = f"  <- {', '.join(outliers[(user_id, day)])}" if (user_id, day) in outliers else ""
+        print(
+            f"{day:<10} {user_id:<36} {t.calls:>8} {t.prompt_tokens:>9} {t.cached_tokens:>8} "
+            f"{t.completion_tokens:>9} {t.prompt_tokens // max(t.calls, 1):>10} "
+            f"{t.seconds / max(t.calls, 1):>6.2f} {t.max_seconds:>6.2f}{flag}"
+        )
+    print(f"{len(outliers)} de {len(totals)} dias de usuário fora da curva ({args.factor:g}x a mediana)")
+    return 0
+
+
+def _differs(current, value):
+    if current is None or value is None:
+        return current != value
+    if isinstance(value, float):
+        return abs(float(current) - value) > 0.005
+    return str(current) != str(value)
+
+
+def schema_sql(args):
+    from db_migrations import load_migrations
+
+    for migration in load_migrations():
+        print(f"-- {migration.version}_{migration.name}")
+        print(migration.sql.strip())
+        print()
+    return 0
+
+
+def migrate(args):
+    from db_migrations import connect, migrate as apply_migrations
+
+    with connect(args.database_url) as conn:
+        applied = apply_migrations(conn)
+    print(f"{len(applied)} migração(ões) aplicada(s)" if applied else "Nenhuma migração pendente")
+    return 0
+
+
+def migrations_status(args):
+    from db_migrations import applied_migrations, connect, load_migrations
+
+    with connect(args.database_url) as conn:
+        applied = applied_migrations(conn)
+    for migration in load_migrations():
+        checksum = applied.get(migration.version)
+        if checksum is None:
+            state = "pendente"
+        elif checksum != migration.checksum:
+            state = "ALTERADA depois de aplicada"
+        else:
+            state = "aplicada"
+        print(f"{migration.version}_{migration.name}: {state}")
+    return 0
+
+
+def explain_check(args, conn=None):
+    """
+    Confirma, com EXPLAIN, que as consultas quentes usam índices.
+    """
+    from db_migrations import connect, explain_hot_queries
+
+    if conn is None:
+        with connect(args.database_url) as conn:
+            return explain_check(args, conn)
+
+    # Parâmetros de uma linha real, quando houver
+    row = conn.execute("SELECT user_id, created_at, id FROM briefings ORDER BY created_at DESC LIMIT 1").fetchone()
+    if row:
+        params = {"user_id": row[0], "created_at": row[1], "id": row[2]}
+    else:
+        params = {"user_id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc), "id": 0}
+    params["query"] = args.query if getattr(args, "query", None) else "site"
+
+    failed = 0
+    for label, ok, nodes in explain_hot_queries(conn, params):
+        failed += not ok
+        print(f"[{'ok' if ok else 'FALHOU'}] {label}: {' > '.join(nodes)}")
+    return 1 if failed else 0
+
+
+# Layout do antigo recreate_briefings_table.sql, usado por --from-legacy
+LEGACY_BRIEFINGS_SQL = """
+CREATE TABLE briefings (
+    id BIGSERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    titulo TEXT,
+    content JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+"""
+
+
+SAMPLE_WORDS = (
+    "site loja virtual marca identidade visual aplicativo campanha redes sociais logotipo "
+    "catálogo restaurante clínica escola evento lançamento vídeo institucional público"
+).split()
+
+
+def _sample_conteudo():
+    def words(count):
+        return " ".join(random.choice(SAMPLE_WORDS) for _ in range(count))
+
+    return {
+        "input_text": words(80),
+        "briefing_result": {"objetivo": words(8), "publico_alvo": words(4), "observacoes": [words(6)]},
+    }
+
+
+def verify_migrations(args):
+    """
+    Aplica as migrações em um Postgres local descartável, confere que uma
+    segunda execução não tem pendências, popula a tabela e roda o explain-check.
+    """
+    from db_migrations import SUPABASE_AUTH_SHIM, connect, load_migrations, migrate as apply_migrations
+    from db_migrations import pending_migrations, start_local_postgres
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = start_local_postgres(directory)
+        with connect(database_url) as conn:
+            conn.execute(SUPABASE_AUTH_SHIM)
+            legacy_users = [str(uuid.uuid4()) for _ in range(3)]
+            if args.from_legacy:
+                # Linhas antigas com user_id TEXT: a migração converte a coluna para UUID
+                conn.execute(LEGACY_BRIEFINGS_SQL)
+                with conn.cursor() as cursor:
+                    cursor.executemany("INSERT INTO auth.users (id) VALUES (%s)", [(user,) for user in legacy_users])
+                    cursor.executemany(
+                        "INSERT INTO briefings (user_id, titulo, content) VALUES (%s, %s, %s)",
+                        [(user.upper(), "Briefing antigo", json.dumps(_sample_conteudo())) for user in legacy_users],
+                    )
+
+            apply_migrations(conn)
+            if pending_migrations(conn):
+                print("Migrações continuam pendentes depois de aplicadas")
+                return 1
+            if args.from_legacy:
+                converted = conn.execute(
+                    "SELECT count(*) FROM briefings WHERE user_id = ANY(%s::uuid[]) AND conteudo ? 'input_text'",
+                    (legacy_users,),
+                ).fetchone()[0]
+                if converted != len(legacy_users):
+                    print(f"Só {converted} de {len(legacy_users)} linhas antigas sobreviveram à conversão")
+                    return 1
+
+            # Os arquivos também precisam ser seguros para reaplicar manualmente
+            for migration in load_migrations():
+                conn.execute(migration.sql)
+
+            users = [str(uuid.uuid4()) for _ in range(max(args.rows // 200, 1))]
+            with conn.cursor() as cursor:
+                cursor.executemany("INSERT INTO auth.users (id) VALUES (%s)", [(user,) for user in users])
+                now = datetime.now(timezone.utc)
+                cursor.executemany(
+                    "INSERT INTO briefings (user_id, titulo, conteudo, created_at) VALUES (%s, %s, %s, %s)",
+                    [
+                        (random.choice(users), f"Briefing {index}", json.dumps(_sample_conteudo()),
+                         now - timedelta(minutes=index))
+                        for index in range(args.rows)
+                    ],
+                )
+            conn.execute("ANALYZE briefings")
+            print(f"{len(load_migrations())} migrações aplicadas; {args.rows} briefings de {len(users)} usuários")
+            return explain_check(args, conn)
+
+
+def main(argv=None):
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Comandos de manutenção do AutoBrief")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("check-db", help="Verifica o acesso à tabela briefings").set_defaults(func=check_db)
+    commands.add_parser("schema-sql", help="Mostra o SQL de criação do schema").set_defaults(func=schema_sql)
+
+    for name, func, description in (
+        ("migrate", migrate, "Aplica as migrações pendentes"),
+        ("migrations-status", migrations_status, "Lista as migrações e o estado de cada uma"),
+        ("explain-check", explain_check, "Confere com EXPLAIN que as consultas quentes usam índices"),
+    ):
+        command = commands.add_parser(name, help=description)
+        command.add_argument("--database-url", help="padrão: DATABASE_URL")
+        command.set_defaults(func=func)
+        if func is explain_check:
+            command.add_argument("--query", help="termo usado na consulta de busca textual")
+
+    verify = commands.add_parser("verify-migrations", help="Testa as migrações em um Postgres local (pgserver)")
+    verify.add_argument("--rows", type=int, default=5000)
+    verify.add_argument("--from-legacy", action="store_true", help="Parte do layout antigo, com a coluna `content` e user_id TEXT")
+    verify.set_defaults(func=verify_migrations, database_url=None)
+
+    backfill = commands.add_parser("backfill-summaries", help="Preenche as colunas de resumo das linhas antigas")
+    backfill.add_argument("--batch-size", type=int, default=200)
+    backfill.add_argument("--dry-run", action="store_true", help="Só conta as linhas que seriam atualizadas")
+    backfill.set_defaults(func=backfill_summaries)
+
+    reindex = commands.add_parser("reindex-search", help="Reconstrói o índice de busca local (SEARCH_BACKEND=sqlite)")
+    reindex.add_argument("--batch-size", type=int, default=200)
+    reindex.set_defaults(func=reindex_search)
+
+    dedup = commands.add_parser("dedup-briefings", help="Exclui briefings duplicados e preenche as chaves de idempotência")
+    dedup.add_argument("--batch-size", type=int, default=200)
+    dedup.add_argument("--dry-run", action="store_true", help="Só conta as duplicatas")
+    dedup.set_defaults(func=dedup_briefings)
+
+    usage = commands.add_parser("usage-report", help="Uso do modelo por usuário e por dia, com os dias fora da curva")
+    usage.add_argument("--days", type=int, default=7)
+    usage.add_argument("--user", help="Só o uso deste usuário")
+    usage.add_argument("--factor", type=float, default=3.0, help="Vezes a mediana para marcar um dia como fora da curva")
+    usage.set_defaults(func=usage_report)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
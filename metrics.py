@@ -0,0 +1,306 @@
+"""
+Instrumentação de latência da aplicação.
+
+Cada requisição registra o tempo total e o tempo de cada fase (chamadas à
+Groq e ao Supabase, decodificação de JSON, renderização de templates).
+Os dados ficam disponíveis de duas formas:
+
+- Histogramas no formato de texto do Prometheus, em /metrics
+- Cabeçalho `Server-Timing` de cada resposta, visível no DevTools do navegador
+
+As métricas são por processo: com vários workers, cada um expõe as suas.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from jinja2 import Template
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Conjunto de métricas do processo. Além das métricas registradas, aceita
+    coletores: funções chamadas a cada leitura de /metrics que retornam
+    linhas já formatadas (usadas para expor contadores de outros módulos).
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "autobrief_request_duration_seconds",
+    "Tempo de resposta por rota",
+    ("route", "method", "status"),
+))
+PHASE_SECONDS = registry.register(Histogram(
+    "autobrief_phase_duration_seconds",
+    "Tempo gasto em cada fase das requisições",
+    ("route", "phase"),
+))
+UPSTREAM_SECONDS = registry.register(Histogram(
+    "autobrief_upstream_request_duration_seconds",
+    "Tempo até a resposta de cada chamada às APIs externas",
+    ("upstream",),
+))
+LLM_CALLS = registry.register(Counter(
+    "autobrief_llm_calls_total",
+    "Chamadas ao modelo de linguagem",
+    ("model",),
+))
+LLM_TOKENS = registry.register(Counter(
+    "autobrief_llm_tokens_total",
+    "Tokens enviados (prompt), recebidos (completion) e reaproveitados do cache de prefixo (cached)",
+    ("model", "direction"),
+))
+LLM_PROMPT_CALLS = registry.register(Counter(
+    "autobrief_llm_prompt_calls_total",
+    "Chamadas ao modelo por prompt registrado; vezes autobrief_prompt_tokens, o custo de cada prompt",
+    ("prompt", "version"),
+))
+LLM_OUTPUTS = registry.register(Counter(
+    "autobrief_llm_outputs_total",
+    "Briefings gerados pelo resultado da validação do JSON: valid, repaired, "
+    "reprompted (campos pedidos de novo), regenerated (briefing inteiro) ou invalid",
+    ("model", "result"),
+))
+LLM_ATTEMPTS = registry.register(Counter(
+    "autobrief_llm_attempts_total",
+    "Tentativas de chamada ao modelo, por resultado (ver llm_policy)",
+    ("model", "outcome"),
+))
+LLM_HEDGES = registry.register(Counter(
+    "autobrief_llm_hedges_total",
+    "Requisições extras (hedged) enviadas ao modelo e qual delas respondeu primeiro",
+    ("model", "winner"),
+))
+LLM_FALLBACKS = registry.register(Counter(
+    "autobrief_llm_fallbacks_total",
+    "Chamadas desviadas do modelo principal para o modelo reserva",
+    ("model", "fallback"),
+))
+
+
+def gauge_lines(name, documentation, samples, metric_type="gauge"):
+    """
+    Formata amostras [(labels, valor)] de uma métrica calculada na leitura.
+    """
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+    return lines
+
+
+def _current_route():
+    return (request.endpoint or "unknown") if has_request_context() else "background"
+
+
+# As threads do map-reduce (briefing_chunks) somam fases no mesmo `g`
+_server_timing_lock = threading.Lock()
+
+
+def record_phase(phase, seconds):
+    """
+    Registra o tempo de uma fase. Dentro de uma requisição, o tempo também
+    é somado ao cabeçalho Server-Timing da resposta.
+    """
+    route = _current_route()
+    PHASE_SECONDS.observe(seconds, route=route, phase=phase)
+    if has_request_context():
+        with _server_timing_lock:
+            timings = g.setdefault("_server_timing", {})
+            total, count = timings.get(phase, (0.0, 0))
+            timings[phase] = (total + seconds, count + 1)
+
+
+@contextmanager
+def timed(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+def record_upstream_call(upstream, seconds):
+    UPSTREAM_SECONDS.observe(seconds, upstream=upstream)
+    record_phase(upstream, seconds)
+
+
+def usage_tokens(usage):
+    """
+    (prompt, completion, em cache) do objeto `usage` retornado pela API.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(usage, "completion_tokens", 0) or 0,
+        getattr(details, "cached_tokens", 0) or 0,
+    )
+
+
+def record_llm_usage(model, prompt_tokens, completion_tokens, cached_tokens=0, prompt=None, version=None):
+    """
+    Conta uma chamada ao modelo, os tokens de entrada e saída (os de entrada
+    reaproveitados do cache de prefixo do provedor em `cached`) e o prompt
+    registrado que a originou (ver prompts.py).
+    """
+    LLM_CALLS.inc(model=model)
+    LLM_TOKENS.inc(prompt_tokens, model=model, direction="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, direction="completion")
+    LLM_TOKENS.inc(cached_tokens, model=model, direction="cached")
+    if prompt:
+        LLM_PROMPT_CALLS.inc(prompt=prompt, version=version)
+
+
+def record_structured_output(model, result):
+    LLM_OUTPUTS.inc(model=model, result=result)
+
+
+def server_timing_header(timings, total=None):
+    parts = []
+    for phase, (seconds, count) in timings.items():
+        part = f"{phase};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="{count} chamadas"'
+        parts.append(part)
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimedTemplate(Template):
+    """Template Jinja que registra o tempo de renderização (fase `render`)."""
+
+    def render(self, *args, **kwargs):
+        with timed("render"):
+            return super().render(*args, **kwargs)
+
+
+def instrument_app(app):
+    """
+    Mede o tempo de cada requisição e de cada renderização de template e
+    adiciona o cabeçalho Server-Timing às respostas.
+
+    Em respostas streaming o tempo registrado vai até o início do envio.
+    """
+    app.jinja_env.template_class = TimedTemplate
+
+    @app.before_request
+    def start_request_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_timing(response):
+        started = g.pop("_request_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(
+            elapsed,
+            route=request.endpoint or "unknown",
+            method=request.method,
+            status=response.status_code,
+        )
+        response.headers["Server-Timing"] = server_timing_header(g.get("_server_timing", {}), elapsed)
+        return response
+
+    return app
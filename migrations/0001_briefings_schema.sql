@@ -0,0 +1,138 @@
+-- Schema único da tabela briefings, usado pela aplicação:
+--   id BIGSERIAL, user_id (usuário do Supabase Auth), titulo, conteudo JSONB
+--   ({"input_text", "briefing_result"}) e created_at.
+--
+-- Substitui os scripts antigos (supabase_schema.sql, update_schema.sql,
+-- recreate_briefings_table.sql, update_briefings_schema.sql), que definiam
+-- layouts diferentes. Em bancos já existentes a tabela é mantida e as
+-- divergências conhecidas são convertidas explicitamente:
+--   - user_id TEXT (recreate_briefings_table.sql, supabase_schema.sql) vira
+--     UUID, se todos os valores forem ids de usuários existentes;
+--   - id INTEGER vira BIGINT;
+--   - coluna `content` (ou input_text + briefing_result) vira `conteudo`.
+-- Layouts que não dá para converter sem perder dados ou links (id UUID de
+-- supabase_schema.sql, user_id com valores que não são usuários) interrompem
+-- a migração com a explicação, sem alterar nada.
+CREATE TABLE IF NOT EXISTS briefings (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    titulo TEXT,
+    conteudo JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+DO $$
+DECLARE
+    id_type TEXT;
+    user_id_type TEXT;
+    invalid_rows BIGINT;
+    existing RECORD;
+    constraint_name TEXT;
+BEGIN
+    SELECT data_type INTO id_type FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'briefings' AND column_name = 'id';
+    SELECT data_type INTO user_id_type FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'briefings' AND column_name = 'user_id';
+
+    IF id_type = 'integer' THEN
+        ALTER TABLE briefings ALTER COLUMN id TYPE BIGINT;
+        ALTER SEQUENCE IF EXISTS briefings_id_seq AS BIGINT;
+    ELSIF id_type IS DISTINCT FROM 'bigint' THEN
+        RAISE EXCEPTION 'briefings.id é %, mas a aplicação usa ids BIGINT', id_type
+            USING HINT = 'Renumere a tabela antes de migrar (ver "Bancos antigos" no README): '
+                         'os ids mudam, e links antigos para /briefing/<id> deixam de valer.';
+    END IF;
+
+    IF user_id_type IN ('text', 'character varying') THEN
+        SELECT count(*) INTO invalid_rows FROM briefings b
+        WHERE b.user_id !~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+           OR NOT EXISTS (SELECT 1 FROM auth.users u WHERE u.id::text = lower(b.user_id));
+        IF invalid_rows > 0 THEN
+            RAISE EXCEPTION 'briefings.user_id é %, e % linha(s) não têm o id de um usuário existente', user_id_type, invalid_rows
+                USING HINT = 'Corrija ou exclua essas linhas e rode a migração de novo; '
+                             'nada foi alterado.';
+        END IF;
+
+        -- Políticas e chaves estrangeiras impedem a troca de tipo; as
+        -- políticas são recriadas abaixo e a chave logo em seguida
+        FOR existing IN SELECT policyname FROM pg_policies WHERE schemaname = 'public' AND tablename = 'briefings' LOOP
+            EXECUTE format('DROP POLICY %I ON briefings', existing.policyname);
+        END LOOP;
+        FOR constraint_name IN
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = 'public.briefings'::regclass AND contype = 'f'
+              AND conkey = ARRAY[(SELECT attnum FROM pg_attribute
+                                  WHERE attrelid = 'public.briefings'::regclass AND attname = 'user_id')]
+        LOOP
+            EXECUTE format('ALTER TABLE briefings DROP CONSTRAINT %I', constraint_name);
+        END LOOP;
+
+        ALTER TABLE briefings ALTER COLUMN user_id TYPE UUID USING user_id::uuid;
+        ALTER TABLE briefings ADD CONSTRAINT briefings_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE;
+    ELSIF user_id_type IS DISTINCT FROM 'uuid' THEN
+        RAISE EXCEPTION 'briefings.user_id é %, mas a aplicação usa o UUID do Supabase Auth', user_id_type;
+    END IF;
+
+    -- Bancos criados por recreate_briefings_table.sql/update_schema.sql usam `content`
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'briefings' AND column_name = 'conteudo'
+    ) THEN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'briefings' AND column_name = 'content'
+        ) THEN
+            ALTER TABLE briefings RENAME COLUMN content TO conteudo;
+        ELSIF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'briefings' AND column_name = 'input_text'
+        ) THEN
+            -- supabase_schema.sql gravava a conversa e o briefing (texto JSON) em colunas próprias
+            ALTER TABLE briefings ADD COLUMN conteudo JSONB;
+            UPDATE briefings SET conteudo = jsonb_build_object('input_text', input_text, 'briefing_result', briefing_result);
+            ALTER TABLE briefings ALTER COLUMN conteudo SET NOT NULL;
+            ALTER TABLE briefings ALTER COLUMN input_text DROP NOT NULL;
+            ALTER TABLE briefings ALTER COLUMN briefing_result DROP NOT NULL;
+        ELSE
+            ALTER TABLE briefings ADD COLUMN conteudo JSONB NOT NULL DEFAULT '{}'::jsonb;
+            ALTER TABLE briefings ALTER COLUMN conteudo DROP DEFAULT;
+        END IF;
+    ELSIF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'briefings' AND column_name = 'content'
+    ) THEN
+        -- update_briefings_schema.sql criou `content` NOT NULL ao lado de `conteudo`;
+        -- a aplicação não grava essa coluna
+        ALTER TABLE briefings ALTER COLUMN content DROP NOT NULL;
+    END IF;
+END $$;
+
+ALTER TABLE briefings ADD COLUMN IF NOT EXISTS titulo TEXT;
+
+ALTER TABLE briefings ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can read their own briefings" ON briefings;
+CREATE POLICY "Users can read their own briefings"
+    ON briefings
+    FOR SELECT
+    USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can insert their own briefings" ON briefings;
+CREATE POLICY "Users can insert their own briefings"
+    ON briefings
+    FOR INSERT
+    WITH CHECK (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can update their own briefings" ON briefings;
+CREATE POLICY "Users can update their own briefings"
+    ON briefings
+    FOR UPDATE
+    USING (auth.uid() = user_id)
+    WITH CHECK (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can delete their own briefings" ON briefings;
+CREATE POLICY "Users can delete their own briefings"
+    ON briefings
+    FOR DELETE
+    USING (auth.uid() = user_id);
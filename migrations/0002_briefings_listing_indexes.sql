@@ -0,0 +1,8 @@
+-- Índices das consultas quentes:
+-- - listagens (/briefings, /history): WHERE user_id = ? ORDER BY created_at DESC, id DESC,
+--   com o cursor (created_at, id) da paginação por keyset
+-- - detalhe e exclusão: WHERE id = ? AND user_id = ?
+CREATE INDEX IF NOT EXISTS briefings_user_created_at_idx
+    ON briefings (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS briefings_user_id_idx
+    ON briefings (user_id, id);
@@ -0,0 +1,13 @@
+-- Colunas de resumo extraídas do conteudo na gravação (ver briefing_model.summary_columns).
+-- Permitem listar, filtrar e ordenar briefings sem abrir o JSON do conteudo.
+-- Depois de aplicar, preencha as linhas antigas com:
+--     python manage.py backfill-summaries
+ALTER TABLE briefings ADD COLUMN IF NOT EXISTS prazo_final TEXT;
+ALTER TABLE briefings ADD COLUMN IF NOT EXISTS prazo_final_data DATE;
+ALTER TABLE briefings ADD COLUMN IF NOT EXISTS valor_final NUMERIC(14, 2);
+
+-- Índices para filtrar e ordenar por prazo e por valor dentro dos briefings de cada usuário
+CREATE INDEX IF NOT EXISTS briefings_user_prazo_final_data_idx
+    ON briefings (user_id, prazo_final_data);
+CREATE INDEX IF NOT EXISTS briefings_user_valor_final_idx
+    ON briefings (user_id, valor_final);
@@ -0,0 +1,90 @@
+-- Busca textual no histórico de cada usuário (/briefings/search).
+--
+-- search_vector é uma coluna gerada com os campos pesquisáveis do briefing,
+-- com pesos para o ranking: título e objetivo (A), público-alvo e
+-- observações (B), conversa original (C).
+--
+-- Adicionar a coluna reescreve a tabela; em bancos grandes, aplique fora do
+-- horário de pico.
+
+-- conteudo como objeto, mesmo nas linhas antigas gravadas como texto JSON
+-- (o conteudo inteiro ou só o briefing_result); ver briefing_model.decode_briefing_row
+CREATE OR REPLACE FUNCTION briefings_conteudo(conteudo JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+DECLARE
+    result JSONB := conteudo;
+BEGIN
+    IF jsonb_typeof(result) = 'string' THEN
+        result := (result #>> '{}')::jsonb;
+    END IF;
+    IF jsonb_typeof(result -> 'briefing_result') = 'string' THEN
+        result := jsonb_set(result, '{briefing_result}', (result ->> 'briefing_result')::jsonb);
+    END IF;
+    RETURN result;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN conteudo;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION briefings_search_vector(titulo TEXT, conteudo JSONB)
+RETURNS TSVECTOR
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT
+        setweight(to_tsvector('portuguese'::regconfig, concat_ws(' ',
+            titulo,
+            c #>> '{briefing_result,objetivo}')), 'A') ||
+        setweight(to_tsvector('portuguese'::regconfig, concat_ws(' ',
+            c #>> '{briefing_result,publico_alvo}',
+            c #>> '{briefing_result,observacoes}')), 'B') ||
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(c ->> 'input_text', '')), 'C')
+    FROM briefings_conteudo(conteudo) AS c
+$$;
+
+ALTER TABLE briefings ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (briefings_search_vector(titulo, conteudo)) STORED;
+
+CREATE INDEX IF NOT EXISTS briefings_search_vector_idx
+    ON briefings USING GIN (search_vector);
+
+-- Chamado via RPC pelo PostgREST: ranking, trecho destacado e paginação no
+-- banco, sem trazer o conteudo para a aplicação. O destaque (ts_headline) é
+-- calculado só para as linhas da página. Os marcadores ⟦ ⟧ são convertidos
+-- em <mark> pela aplicação depois de escapar o texto.
+CREATE OR REPLACE FUNCTION search_briefings(
+    p_user_id UUID,
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    id BIGINT,
+    titulo TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    prazo_final TEXT,
+    prazo_final_data DATE,
+    valor_final NUMERIC,
+    rank REAL,
+    headline TEXT
+)
+LANGUAGE sql STABLE SECURITY INVOKER AS $$
+    WITH query AS (
+        SELECT websearch_to_tsquery('portuguese'::regconfig, p_query) AS q
+    ), matches AS (
+        SELECT b.id, b.titulo, b.created_at, b.prazo_final, b.prazo_final_data, b.valor_final,
+               b.conteudo, ts_rank_cd(b.search_vector, query.q) AS rank, query.q
+        FROM briefings b, query
+        WHERE b.user_id = p_user_id AND b.search_vector @@ query.q
+        ORDER BY rank DESC, b.created_at DESC, b.id DESC
+        LIMIT p_limit OFFSET p_offset
+    )
+    SELECT m.id, m.titulo, m.created_at, m.prazo_final, m.prazo_final_data, m.valor_final, m.rank,
+           ts_headline('portuguese'::regconfig,
+                       concat_ws(' … ', c #>> '{briefing_result,objetivo}',
+                                 c #>> '{briefing_result,publico_alvo}',
+                                 c ->> 'input_text'),
+                       m.q,
+                       'StartSel=⟦, StopSel=⟧, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "')
+    FROM matches m, briefings_conteudo(m.conteudo) AS c
+    ORDER BY m.rank DESC, m.created_at DESC, m.id DESC
+$$;
@@ -0,0 +1,11 @@
+-- Chave de idempotência de cada briefing salvo (ver briefing_store.idempotency_key).
+-- A gravação é um INSERT ... ON CONFLICT (user_id, idempotency_key) DO NOTHING:
+-- repetir a mesma geração ou salvar de novo o briefing exibido não cria outra linha.
+--
+-- Linhas antigas ficam com a chave nula (nulos não conflitam entre si). Depois
+-- de aplicar, junte as duplicatas existentes e preencha as chaves com:
+--     python manage.py dedup-briefings
+ALTER TABLE briefings ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS briefings_user_idempotency_key_idx
+    ON briefings (user_id, idempotency_key);
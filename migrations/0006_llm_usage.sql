@@ -0,0 +1,61 @@
+-- Uso do modelo por usuário e por dia (ver llm_usage.py): chamadas, tokens
+-- de prompt, de resposta e reaproveitados do cache de prefixo do provedor,
+-- e o tempo das chamadas, por modelo e por prompt registrado ("briefing:v2").
+--
+-- A aplicação soma as chamadas em memória e grava os totais de tempos em
+-- tempos com a função record_llm_usage, que acumula sobre a linha do dia.
+-- Para ver quem está fora da curva:
+--     python manage.py usage-report --days 7
+CREATE TABLE IF NOT EXISTS llm_usage_daily (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    model TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    cached_tokens BIGINT NOT NULL DEFAULT 0,
+    -- Chamadas sem o uso informado pela API, com tokens contados localmente
+    estimated_calls INTEGER NOT NULL DEFAULT 0,
+    seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    max_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    max_prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, model, prompt)
+);
+
+CREATE INDEX IF NOT EXISTS llm_usage_daily_day_idx ON llm_usage_daily (day);
+
+ALTER TABLE llm_usage_daily ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can read their own usage" ON llm_usage_daily;
+CREATE POLICY "Users can read their own usage"
+    ON llm_usage_daily
+    FOR SELECT
+    USING (auth.uid()::text = user_id::text);
+
+-- Chamado via RPC pelo PostgREST com os totais acumulados desde a última
+-- gravação, no máximo uma linha por (user_id, day, model, prompt)
+CREATE OR REPLACE FUNCTION record_llm_usage(p_rows JSONB)
+RETURNS VOID
+LANGUAGE sql VOLATILE SECURITY INVOKER AS $$
+    INSERT INTO llm_usage_daily AS u (
+        user_id, day, model, prompt, calls, prompt_tokens, completion_tokens, cached_tokens,
+        estimated_calls, seconds, max_seconds, max_prompt_tokens
+    )
+    SELECT r.user_id, r.day, r.model, r.prompt, r.calls, r.prompt_tokens, r.completion_tokens, r.cached_tokens,
+           r.estimated_calls, r.seconds, r.max_seconds, r.max_prompt_tokens
+    FROM jsonb_to_recordset(p_rows) AS r(
+        user_id UUID, day DATE, model TEXT, prompt TEXT, calls INTEGER, prompt_tokens BIGINT,
+        completion_tokens BIGINT, cached_tokens BIGINT, estimated_calls INTEGER, seconds DOUBLE PRECISION,
+        max_seconds DOUBLE PRECISION, max_prompt_tokens INTEGER
+    )
+    ON CONFLICT (user_id, day, model, prompt) DO UPDATE SET
+        calls = u.calls + EXCLUDED.calls,
+        prompt_tokens = u.prompt_tokens + EXCLUDED.prompt_tokens,
+        completion_tokens = u.completion_tokens + EXCLUDED.completion_tokens,
+        cached_tokens = u.cached_tokens + EXCLUDED.cached_tokens,
+        estimated_calls = u.estimated_calls + EXCLUDED.estimated_calls,
+        seconds = u.seconds + EXCLUDED.seconds,
+        max_seconds = GREATEST(u.max_seconds, EXCLUDED.max_seconds),
+        max_prompt_tokens = GREATEST(u.max_prompt_tokens, EXCLUDED.max_prompt_tokens)
+$$;
@@ -0,0 +1,144 @@
+"""
+Registro dos prompts usados nas chamadas ao modelo.
+
+Cada prompt tem nome e versão e é compilado uma única vez, na importação:
+o texto é normalizado (espaços no fim das linhas não viram tokens) e a
+impressão digital do texto entra na chave do cache de briefings, para que
+uma mudança no texto nunca reaproveite respostas do prompt antigo.
+/metrics expõe o tamanho de cada prompt em autobrief_prompt_tokens,
+contado com o TokenCounter de llm_usage na primeira leitura (e não na
+importação, que não pode depender do vocabulário do tokenizador).
+
+Ordem pensada para o cache de prefixo do provedor, que reaproveita o
+processamento do início do prompt quando ele se repete entre chamadas:
+
+1. A parte fixa vem primeiro e é a mesma em todos os prompts de briefing
+   (papel, estrutura do briefing e formato da resposta).
+2. A instrução de cada etapa (briefing, trecho, combinação) vem depois.
+3. O conteúdo variável (conversa, trecho, parciais) fica sempre na
+   mensagem do usuário, no fim.
+
+O pedido dos campos que faltaram repete as mensagens originais e só
+acrescenta o pedido no fim, reaproveitando o prefixo da primeira chamada.
+"""
+import hashlib
+from dataclasses import dataclass
+
+from metrics import gauge_lines
+
+BRIEFING_STRUCTURE = """Estrutura do briefing:
+- objetivo: O objetivo principal do projeto (obrigatório)
+- publico_alvo: Descrição detalhada do público-alvo (obrigatório)
+- referencias: Lista de referências mencionadas na conversa
+- prazos: Informações sobre prazos
+  - prazo_final: Data ou período para entrega final
+  - etapas_intermediarias: Lista de etapas intermediárias com prazos
+- orcamento: Informações financeiras
+  - valor_total: Valor total do projeto
+  - descontos: Valor dos descontos aplicados
+  - valor_final: Valor final após descontos
+- observacoes: Lista de observações importantes mencionadas na conversa"""
+
+# Prefixo comum a todos os prompts de briefing
+BRIEFING_PREFIX = f"""Você é um assistente especializado em criar briefings estruturados a partir de conversas.
+
+{BRIEFING_STRUCTURE}
+
+Retorne apenas o JSON puro, sem marcadores de código markdown."""
+
+BRIEFING_PROMPT = f"""{BRIEFING_PREFIX}
+
+Analise cuidadosamente a conversa e extraia as informações relevantes para preencher o briefing.
+Preencha TODOS os campos do briefing com informações específicas e detalhadas.
+NUNCA deixe campos vazios ou com valores genéricos.
+Se alguma informação não estiver disponível na conversa, use valores realistas baseados no contexto."""
+
+CHUNK_PROMPT = f"""{BRIEFING_PREFIX}
+
+Você vai receber um trecho de uma conversa longa. Extraia SOMENTE as informações presentes neste trecho.
+Use null (ou listas vazias) para o que não aparecer no trecho; não invente valores."""
+
+MERGE_PROMPT = f"""{BRIEFING_PREFIX}
+
+Você vai receber briefings parciais, em JSON, extraídos de trechos consecutivos de uma mesma conversa, em ordem.
+Combine-os em um único briefing:
+- Junte as listas sem repetir itens equivalentes.
+- Quando os trechos se contradizem (prazo, valores), vale o trecho mais recente.
+- Escreva objetivo e publico_alvo considerando a conversa inteira.
+Se alguma informação não estiver em nenhum parcial, use valores realistas baseados no contexto."""
+
+MISSING_FIELDS_PROMPT = """O briefing acima está incompleto. Preencha somente estes campos: {fields}.
+Responda apenas com um objeto JSON contendo esses campos, na mesma estrutura aninhada do briefing
+(por exemplo {{"prazos": {{"prazo_final": "..."}}}})."""
+
+
+@dataclass(frozen=True)
+class Prompt:
+    name: str
+    version: str
+    text: str
+    fingerprint: str
+
+    @property
+    def tag(self):
+        """Versão e impressão digital, usadas na chave do cache."""
+        return f"{self.version}-{self.fingerprint}"
+
+    @property
+    def label(self):
+        """Nome e versão, gravados no uso por usuário e por dia."""
+        return f"{self.name}:{self.version}"
+
+    def format(self, **values):
+        return self.text.format(**values)
+
+
+class PromptRegistry:
+    def __init__(self, counter):
+        self.counter = counter
+        self._prompts = {}
+        self._tokens = {}
+
+    def register(self, name, version, text):
+        text = "\n".join(line.rstrip() for line in text.strip().splitlines())
+        prompt = Prompt(
+            name=name,
+            version=version,
+            text=text,
+            fingerprint=hashlib.sha256(text.encode("utf-8")).hexdigest()[:12],
+        )
+        self._prompts[name] = prompt
+        return prompt
+
+    def get(self, name):
+        return self._prompts[name]
+
+    def __iter__(self):
+        return iter(self._prompts.values())
+
+    def tokens(self, prompt):
+        """Tokens do texto do prompt, contados uma vez por versão."""
+        key = (prompt.name, prompt.tag)
+        if key not in self._tokens:
+            self._tokens[key] = self.counter.count(prompt.text)
+        return self._tokens[key]
+
+    def collect(self):
+        samples = [({"prompt": prompt.name, "version": prompt.version}, self.tokens(prompt)) for prompt in self]
+        return gauge_lines(
+            "autobrief_prompt_tokens",
+            f"Tokens de cada prompt registrado, enviados em toda chamada que o usa (contagem: {self.counter.name})",
+            samples,
+        )
+
+
+def create_prompt_registry(counter):
+    """
+    Registra os prompts da aplicação. Mudou o texto, suba a versão.
+    """
+    prompts = PromptRegistry(counter)
+    prompts.register("briefing", "v2", BRIEFING_PROMPT)
+    prompts.register("briefing_chunk", "v2", CHUNK_PROMPT)
+    prompts.register("briefing_merge", "v2", MERGE_PROMPT)
+    prompts.register("missing_fields", "v1", MISSING_FIELDS_PROMPT)
+    return prompts
@@ -0,0 +1,188 @@
+"""
+Cache de leitura dos briefings de cada usuário (detalhe e listagens).
+
+Briefings não mudam depois de salvos, então o detalhe (/briefing/<id>) e as
+páginas das listagens (/briefings, /history) podem ser servidos do cache
+sem consultar o Supabase. As chaves levam sempre o id do usuário.
+
+Invalidação, feita pelas rotas que gravam e excluem:
+
+- Novo briefing (`briefings_saved`): entra no topo da listagem, então só
+  a primeira página e as páginas "voltar" (cursor `before`) mudam; as
+  páginas "avançar" (cursor `after`) continuam iguais e ficam no cache.
+- Exclusão (`briefings_deleted`): remove o detalhe de cada briefing
+  excluído e invalida todas as páginas do usuário.
+
+As páginas são invalidadas por geração: a chave de cada página inclui um
+token por usuário (um para todas as páginas, outro para as do topo) que
+muda a cada gravação ou exclusão; as páginas antigas deixam de ser lidas
+e saem pelo LRU. Com um backend compartilhado (sqlite, redis), os tokens
+ficam no próprio backend e a invalidação vale para todos os processos.
+
+Os backends são os de llm_cache: memory (LRU com limite de memória),
+sqlite e redis.
+"""
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+
+from llm_cache import MemoryBackend, RedisBackend, SQLiteBackend
+
+logger = logging.getLogger("autobrief.read_cache")
+
+DEFAULT_TTL = 60 * 60
+# O backend memory é de um processo só: a invalidação não chega às outras
+# instâncias, então as entradas valem pouco tempo
+DEFAULT_MEMORY_TTL = 30
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ReadCache:
+    """
+    Leitura pelo cache (read-through): `get_*` devolve o valor em cache ou
+    chama `load()`, guarda e devolve o resultado. Falhas do backend nunca
+    impedem a leitura, só fazem a consulta ir ao Supabase.
+    """
+
+    def __init__(self, backend=None, backend_factory=None):
+        self._backend = backend
+        self._backend_factory = backend_factory
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend_factory is not None:
+            with self._lock:
+                if self._backend_factory is not None:
+                    self._backend = self._backend_factory()
+                    self._backend_factory = None
+        return self._backend
+
+    def _count(self, kind, result):
+        with self._lock:
+            self.counts[(kind, result)] = self.counts.get((kind, result), 0) + 1
+
+    def _get(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning("Erro ao ler o cache de leitura: %s", e)
+            return None
+
+    def _set(self, key, value):
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            logger.warning("Erro ao gravar o cache de leitura: %s", e)
+
+    def _delete(self, key):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logger.warning("Erro ao invalidar o cache de leitura: %s", e)
+
+    def _generation(self, scope, user_id):
+        """Token da geração atual das páginas do usuário; criado na primeira leitura."""
+        key = f"gen:{scope}:{user_id}"
+        token = self._get(key)
+        if token is None:
+            token = secrets.token_hex(4)
+            self._set(key, token)
+        return token
+
+    def _read_through(self, kind, key, load):
+        if self.backend is None:
+            return load()
+        value = self._get(key)
+        if value is not None:
+            self._count(kind, "hit")
+            return json.loads(value)
+        self._count(kind, "miss")
+        value = load()
+        if value is not None:
+            self._set(key, json.dumps(value, ensure_ascii=False, default=str))
+        return value
+
+    def get_briefing(self, user_id, briefing_id, load):
+        """Linha do briefing (DETAIL_COLUMNS), ou None se não existir."""
+        return self._read_through("detail", f"briefing:{user_id}:{briefing_id}", load)
+
+    def page_key(self, user_id, after=None, before=None, limit=None):
+        if self.backend is None:
+            return None
+        generation = self._generation("all", user_id)
+        if after:
+            return f"page:{user_id}:{generation}:after:{after}:{limit}"
+        head = self._generation("head", user_id)
+        return f"page:{user_id}:{generation}.{head}:before:{before or ''}:{limit}"
+
+    def get_page(self, user_id, after, before, limit, load):
+        """Página da listagem (resultado de briefing_store.list_briefings_page)."""
+        # Com os dois cursores, a listagem usa só `after`
+        return self._read_through("page", self.page_key(user_id, after, None if after else before, limit), load)
+
+    def briefings_saved(self, user_id):
+        if self.backend is not None:
+            self._set(f"gen:head:{user_id}", secrets.token_hex(4))
+
+    def briefings_deleted(self, user_id, ids):
+        if self.backend is None:
+            return
+        for briefing_id in ids:
+            self._delete(f"briefing:{user_id}:{briefing_id}")
+        self._set(f"gen:all:{user_id}", secrets.token_hex(4))
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def etag_for(user_id, value, release=""):
+    """
+    ETag fraco das páginas geradas a partir de `value`: muda com o usuário
+    (a página mostra quem está logado), com os dados e com a versão da
+    aplicação (templates).
+    """
+    material = json.dumps([str(user_id), release, value], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:20]
+
+
+def create_read_cache_from_env():
+    """
+    Cria o cache de leitura a partir das variáveis de ambiente:
+
+    READ_CACHE_BACKEND: memory (padrão), sqlite, redis ou none
+    READ_CACHE_TTL: validade das entradas em segundos (3600 nos backends
+    compartilhados, 30 no memory)
+    READ_CACHE_MAX_BYTES: limite de memória do backend memory (32 MB)
+    READ_CACHE_MAX_ENTRIES: limite de entradas (memory e sqlite)
+    READ_CACHE_PATH: arquivo do backend sqlite
+    READ_CACHE_URL: URL do backend redis (o limite de memória fica com o
+    servidor, ex.: maxmemory-policy allkeys-lru)
+    """
+    backend_name = os.getenv("READ_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("READ_CACHE_TTL", DEFAULT_TTL))
+    memory_ttl = float(os.getenv("READ_CACHE_TTL", DEFAULT_MEMORY_TTL))
+    max_entries = int(os.getenv("READ_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+    max_bytes = int(os.getenv("READ_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+    if backend_name == "none":
+        return ReadCache(None)
+
+    def build_backend():
+        try:
+            if backend_name == "sqlite":
+                return SQLiteBackend(os.getenv("READ_CACHE_PATH", "read_cache.sqlite3"), ttl=ttl, max_entries=max_entries)
+            if backend_name == "redis":
+                return RedisBackend(os.getenv("READ_CACHE_URL", "redis://localhost:6379/0"), ttl=ttl, prefix="autobrief:read:")
+            return MemoryBackend(max_entries=max_entries, ttl=memory_ttl, max_bytes=max_bytes)
+        except Exception as e:
+            logger.warning("Erro ao configurar o cache de leitura (%s), usando memória: %s", backend_name, e)
+            return MemoryBackend(max_entries=max_entries, ttl=memory_ttl, max_bytes=max_bytes)
+
+    return ReadCache(backend_factory=build_backend)
@@ -0,0 +1,390 @@
+"""
+Sessão e autenticação.
+
+- Cookie compacto (SESSION_BACKEND=cookie, o padrão): a sessão continua
+  num cookie assinado, mas com nomes curtos para as chaves do Flask-Login
+  e da aplicação ("_user_id" vira "u") e um identificador de 16 caracteres
+  no lugar do sha512 de 128 do Flask-Login. Cookies no formato antigo
+  continuam sendo lidos. O serializador assinado é criado uma vez, e não
+  a cada requisição.
+- Sessão no servidor (SESSION_BACKEND=memory, sqlite ou redis): o cookie
+  leva só o id assinado e os dados ficam no backend (os de llm_cache), com
+  validade de SESSION_TTL segundos. A sessão só é regravada quando muda ou
+  quando passou da metade da validade; as expiradas são removidas a cada
+  SESSION_SWEEP_INTERVAL segundos.
+- Identificador da sessão (session_protection='strong'): o hash de IP e
+  User-Agent é calculado uma vez por par e reaproveitado.
+- regenerate_session: no login e no logout a sessão é limpa e, no
+  servidor, ganha um id novo (o antigo é excluído).
+- AuthUserCache: usuário do Supabase por access token, para que a mesma
+  verificação não volte ao Supabase enquanto o token for válido.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from flask import request, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+from itsdangerous import BadSignature, Signer
+
+from llm_cache import MemoryBackend, RedisBackend, SQLiteBackend
+
+logger = logging.getLogger("autobrief.sessions")
+
+# Nomes curtos das chaves gravadas na sessão pelo Flask-Login e pela aplicação
+KEY_ALIASES = {
+    "_user_id": "u",
+    "_fresh": "f",
+    "_id": "i",
+    "_remember": "r",
+    "_flashes": "m",
+    "next": "n",
+    "user_email": "e",
+}
+_KEY_NAMES = {alias: name for name, alias in KEY_ALIASES.items()}
+
+DEFAULT_SWEEP_INTERVAL = 300
+DEFAULT_MAX_SESSIONS = 100000
+DEFAULT_AUTH_CACHE_TTL = 300
+
+
+class CompactSerializer(TaggedJSONSerializer):
+    """JSON do Flask (com tags para tuplas, datas etc.) com as chaves abreviadas."""
+
+    def dumps(self, value):
+        return super().dumps({KEY_ALIASES.get(key, key): item for key, item in value.items()})
+
+    def loads(self, value):
+        return {_KEY_NAMES.get(key, key): item for key, item in super().loads(value).items()}
+
+
+@lru_cache(maxsize=4096)
+def _identifier(remote_addr, user_agent):
+    digest = hashlib.blake2b(f"{remote_addr}|{user_agent}".encode("utf-8", "replace"), digest_size=12).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")
+
+
+def session_identifier():
+    """
+    Substitui o gerador do Flask-Login (mesma entrada: primeiro endereço do
+    X-Forwarded-For, ou o IP, e o User-Agent).
+    """
+    address = request.headers.get("X-Forwarded-For", request.remote_addr)
+    if address is not None:
+        address = address.split(",")[0].strip()
+    return _identifier(address, request.headers.get("User-Agent"))
+
+
+class CompactCookieSessionInterface(SecureCookieSessionInterface):
+    serializer = CompactSerializer()
+
+    def __init__(self):
+        self._signing = None
+
+    def get_signing_serializer(self, app):
+        if not app.secret_key:
+            return None
+        signing = self._signing
+        if signing is None or signing[0] != app.secret_key:
+            signing = self._signing = (app.secret_key, super().get_signing_serializer(app))
+        return signing[1]
+
+
+class StoredSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, saved_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.saved_at = saved_at
+        # Id anterior, excluído do backend na gravação (ver regenerate)
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Troca o id da sessão na próxima gravação."""
+        if self.sid is not None:
+            self.previous_sid = self.previous_sid or self.sid
+        self.sid = None
+        self.saved_at = None
+        self.modified = True
+
+
+def regenerate_session():
+    """
+    Limpa a sessão e, com a sessão no servidor, troca o id: o registro
+    antigo é excluído e a resposta leva um id novo. Chamado no login e no
+    logout, para que um id conhecido antes da troca de usuário (fixação de
+    sessão) não continue valendo depois dela.
+    """
+    session.clear()
+    regenerate = getattr(session, "regenerate", None)
+    if regenerate is not None:
+        regenerate()
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Sessão guardada no `backend` (get/set/delete de llm_cache); o cookie
+    leva o id da sessão assinado com a SECRET_KEY. Falhas do backend não
+    derrubam a requisição: a sessão só não é lida (usuário deslogado) ou
+    não é gravada.
+    """
+
+    salt = "server-session"
+    serializer = CompactSerializer()
+
+    def __init__(self, backend=None, backend_factory=None, ttl=7 * 24 * 3600, sweep_interval=DEFAULT_SWEEP_INTERVAL):
+        self._backend = backend
+        self._backend_factory = backend_factory
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.counts = {}
+        self._signer = None
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend_factory is not None:
+            with self._lock:
+                if self._backend_factory is not None:
+                    self._backend = self._backend_factory()
+                    self._backend_factory = None
+        return self._backend
+
+    def _count(self, result):
+        with self._lock:
+            self.counts[result] = self.counts.get(result, 0) + 1
+
+    def get_signer(self, app):
+        signer = self._signer
+        if signer is None or signer[0] != app.secret_key:
+            signer = self._signer = (app.secret_key, Signer(app.secret_key, salt=self.salt))
+        return signer[1]
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        value = request.cookies.get(self.get_cookie_name(app))
+        if not value:
+            return StoredSession()
+        try:
+            sid = self.get_signer(app).unsign(value).decode("ascii")
+        except BadSignature:
+            return StoredSession()
+        try:
+            stored = self.backend.get(f"session:{sid}")
+        except Exception as e:
+            logger.warning("Erro ao ler a sessão: %s", e)
+            self._count("error")
+            return StoredSession()
+        if stored is None:
+            self._count("miss")
+            return StoredSession()
+        self._count("hit")
+        saved_at, _, payload = stored.partition("|")
+        return StoredSession(self.serializer.loads(payload), sid=sid, saved_at=float(saved_at))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if session.previous_sid:
+            self._delete(session.previous_sid)
+
+        if not session:
+            if session.modified:
+                if session.sid:
+                    self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly)
+                response.vary.add("Cookie")
+            return
+
+        now = time.time()
+        # Sessão sem mudanças só é regravada para renovar a validade
+        stale = session.saved_at is None or now - session.saved_at > self.ttl / 2
+        if not session.modified and not stale:
+            return
+
+        new = session.sid is None
+        sid = session.sid or secrets.token_urlsafe(24)
+        try:
+            self.backend.set(f"session:{sid}", f"{now:.0f}|{self.serializer.dumps(dict(session))}")
+        except Exception as e:
+            logger.warning("Erro ao gravar a sessão: %s", e)
+            self._count("error")
+            return
+        self._sweep()
+
+        if new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self.get_signer(app).sign(sid).decode("ascii"),
+                expires=self.get_expiration_time(app, session),
+                httponly=httponly,
+                domain=domain,
+                path=path,
+                secure=secure,
+                samesite=samesite,
+            )
+            response.vary.add("Cookie")
+
+    def _delete(self, sid):
+        try:
+            self.backend.delete(f"session:{sid}")
+        except Exception as e:
+            logger.warning("Erro ao excluir a sessão: %s", e)
+
+    def _sweep(self):
+        """Remove as sessões expiradas do backend, no máximo uma vez por intervalo."""
+        sweep = getattr(self.backend, "sweep", None)
+        if sweep is None:
+            return
+        with self._lock:
+            if time.monotonic() - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = time.monotonic()
+        try:
+            removed = sweep()
+            logger.debug("Sessões expiradas removidas: %s", removed)
+        except Exception as e:
+            logger.warning("Erro ao remover sessões expiradas: %s", e)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def init_sessions_from_env(app, login_manager):
+    """
+    Configura a sessão a partir das variáveis de ambiente:
+
+    SESSION_BACKEND: cookie (padrão), memory, sqlite ou redis
+    SESSION_TTL: validade das sessões no servidor, em segundos (padrão:
+    PERMANENT_SESSION_LIFETIME)
+    SESSION_MAX_ENTRIES: limite de sessões (memory e sqlite)
+    SESSION_PATH: arquivo do backend sqlite
+    SESSION_URL: URL do backend redis
+    SESSION_SWEEP_INTERVAL: segundos entre as remoções de sessões expiradas (300)
+
+    O backend memory só serve para um único processo (desenvolvimento).
+    """
+    # O Flask-Login não tem opção pública para o gerador do identificador
+    login_manager._session_identifier_generator = session_identifier
+
+    backend_name = os.getenv("SESSION_BACKEND", "cookie").lower()
+    if backend_name == "cookie":
+        app.session_interface = CompactCookieSessionInterface()
+        return app.session_interface
+
+    ttl = float(os.getenv("SESSION_TTL", app.permanent_session_lifetime.total_seconds()))
+    max_entries = int(os.getenv("SESSION_MAX_ENTRIES", DEFAULT_MAX_SESSIONS))
+
+    def build_backend():
+        try:
+            if backend_name == "sqlite":
+                return SQLiteBackend(os.getenv("SESSION_PATH", "sessions.sqlite3"), ttl=ttl, max_entries=max_entries)
+            if backend_name == "redis":
+                return RedisBackend(os.getenv("SESSION_URL", "redis://localhost:6379/0"), ttl=ttl, prefix="autobrief:")
+            return MemoryBackend(max_entries=max_entries, ttl=ttl)
+        except Exception as e:
+            logger.warning("Erro ao configurar a sessão no servidor (%s), usando memória: %s", backend_name, e)
+            return MemoryBackend(max_entries=max_entries, ttl=ttl)
+
+    app.session_interface = ServerSessionInterface(
+        backend_factory=build_backend,
+        ttl=ttl,
+        sweep_interval=float(os.getenv("SESSION_SWEEP_INTERVAL", DEFAULT_SWEEP_INTERVAL)),
+    )
+    return app.session_interface
+
+
+def token_expiry(access_token):
+    """
+    Claim `exp` do JWT, sem verificar a assinatura (quem valida o token é o
+    Supabase, na primeira consulta); só limita o tempo no cache.
+    """
+    try:
+        payload = access_token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class AuthUserCache:
+    """
+    Usuário do Supabase (auth.get_user) por access token, até a expiração do
+    token ou `ttl` segundos, o que vier primeiro. A chave é o hash do token;
+    o token em si não fica guardado. Consultas que falham não são guardadas.
+    """
+
+    def __init__(self, ttl=DEFAULT_AUTH_CACHE_TTL, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counts = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, result):
+        self.counts[result] = self.counts.get(result, 0) + 1
+
+    def get_user(self, access_token, load):
+        """
+        Args:
+            access_token (str): Token recebido no callback de autenticação
+            load: Consulta ao Supabase; retorna {"id", "email"} ou None
+
+        Returns:
+            dict: {"id", "email"}, ou None se o token não for válido
+        """
+        if self.ttl <= 0:
+            return load()
+        key = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > now:
+                self._entries.move_to_end(key)
+                self._count("hit")
+                return dict(item[1])
+            self._entries.pop(key, None)
+            self._count("miss")
+
+        user = load()
+        expires_at = min(now + self.ttl, token_expiry(access_token) or float("inf"))
+        if user and expires_at > now:
+            with self._lock:
+                self._entries[key] = (expires_at, dict(user))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def create_auth_cache_from_env():
+    """
+    AUTH_CACHE_TTL: segundos que o usuário de um access token fica no cache
+    (300; 0 desliga)
+    AUTH_CACHE_MAX_ENTRIES: limite de tokens no cache (10000)
+    """
+    return AuthUserCache(
+        ttl=float(os.getenv("AUTH_CACHE_TTL", DEFAULT_AUTH_CACHE_TTL)),
+        max_entries=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")),
+    )